@@ -0,0 +1,250 @@
+import argparse
+import gzip
+import hashlib
+import json
+import math
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import carga_dados
+import localidades
+import pipeline
+import ranking
+import recarga
+import score
+
+# Indicadores publicados em cada registro: coluna -> nome do campo
+CAMPOS_INDICADORES = {
+    'Taxa_mortalidade_ajustada': 'taxa_mortalidade_ajustada',
+    'Taxa_bruta': 'taxa_bruta',
+    'Obitos': 'obitos',
+    'Percentual_nunca_fez_exame': 'percentual_nunca_fez_exame',
+    'Ate_30_dias_%': 'laudos_ate_30_dias_pct',
+    '31_60_dias_%': 'laudos_31_60_dias_pct',
+    'Mais_60_dias_%': 'laudos_mais_60_dias_pct',
+    'Utilizacao_%': 'utilizacao_mamografos_pct',
+    'Mamografos_SUS': 'mamografos_sus',
+    'Numero_casos': 'numero_casos',
+    'Casos_por_obito': 'casos_por_obito',
+}
+
+# Respostas pré-serializadas da versão atual (trocadas de uma vez quando a versão muda)
+_estado = {'respostas': None}
+
+def resposta(conteudo):
+    """Serializa um conteúdo uma única vez: corpo JSON, corpo gzip e uma ETag forte para cada um.
+
+    Os dois corpos são representações diferentes (bytes diferentes), por isso a ETag do gzip
+    leva o sufixo -gzip. NaN/infinito não são JSON válido: chegam aqui já trocados por None.
+    """
+    corpo = json.dumps(conteudo, ensure_ascii=False, separators=(",", ":"), allow_nan=False).encode("utf-8")
+    hash_corpo = hashlib.sha256(corpo).hexdigest()[:32]
+    return {
+        'corpo': corpo,
+        'gzip': gzip.compress(corpo, compresslevel=6, mtime=0),
+        'etag': f'"{hash_corpo}"',
+        'etag_gzip': f'"{hash_corpo}-gzip"',
+    }
+
+def aceita_gzip(accept_encoding):
+    """Se o cabeçalho Accept-Encoding admite gzip, respeitando os valores q (gzip;q=0 recusa)"""
+    qualidades = {}
+    for item in accept_encoding.split(","):
+        codificacao, *parametros = (parte.strip() for parte in item.split(";"))
+        qualidade = 1.0
+        for parametro in parametros:
+            nome, _, valor = parametro.partition("=")
+            if nome.strip().lower() == "q":
+                try:
+                    qualidade = float(valor)
+                except ValueError:
+                    qualidade = 0.0
+        if codificacao:
+            qualidades[codificacao.lower()] = qualidade
+    return qualidades.get('gzip', qualidades.get('*', 0.0)) > 0
+
+def _valor_json(valor):
+    """None no lugar de NaN/infinito, que não têm representação em JSON"""
+    if isinstance(valor, float) and not math.isfinite(valor):
+        return None
+    return valor
+
+def _registros(dados_score):
+    """Registros publicados (ordem do ranking nacional), com valores float32 já convertidos e NaN como None"""
+    dados = carga_dados.para_float64(dados_score)
+    registros = []
+    for posicao, linha in enumerate(dados.to_dict('records'), start=1):
+        registros.append({
+            'posicao': posicao,
+            'uf': linha['UF'],
+            'sigla': linha['Sigla'],
+            'cod_ibge': int(linha['Cod_IBGE']),
+            'regiao': linha['Regiao'],
+            'score': _valor_json(linha['Score_Consolidado']),
+            'criticidade': _valor_json(linha['Criticidade']),
+            'scores_componentes': {coluna: _valor_json(linha[coluna]) for coluna in score.COLUNAS_SCORE},
+            'indicadores': {campo: _valor_json(linha[coluna]) for coluna, campo in CAMPOS_INDICADORES.items()},
+        })
+    return registros
+
+def montar_respostas(base_path=carga_dados.DIRETORIO_DADOS, versao=None, estado=None):
+    """Serializa todas as respostas da versão.
+
+    Com estado (pipeline.construir_estado) usa o ranking e os índices já mantidos pelo pipeline;
+    sem ele, calcula os scores com o mesmo motor do dashboard.
+    """
+    if estado is not None:
+        versao, dados_score, indices = estado['versao'], pipeline.ranking_estado(estado), estado['indices_ranking']
+    else:
+        versao = carga_dados.hash_fontes(base_path) if versao is None else versao
+        dados_score = score.calcular_score_criticidade(carga_dados.carregar_dados(base_path, versao))
+        indices = ranking.construir_indices(dados_score)
+    registros = _registros(dados_score)
+
+    rankings = {'': resposta({'versao': versao, 'regiao': None, 'estados': registros})}
+    for regiao in indices['bitmaps']['regiao']:
+        posicoes = ranking.resolver_filtros(indices, {'regiao': regiao})
+        estados = [{**registros[i], 'posicao_regiao': n} for n, i in enumerate(posicoes, start=1)]
+        conteudo = resposta({'versao': versao, 'regiao': regiao, 'estados': estados})
+        rankings[regiao] = rankings[localidades.normalizar_nome(regiao)] = conteudo
+
+    # Cada estado é encontrado por sigla, nome ou código IBGE (exatos ou normalizados)
+    estados = {}
+    for registro in registros:
+        conteudo = resposta({'versao': versao, **registro})
+        for chave in (registro['sigla'], registro['uf'], str(registro['cod_ibge'])):
+            estados[chave] = estados[localidades.normalizar_nome(chave)] = conteudo
+
+    return {
+        'versao': versao,
+        'scores': resposta({
+            'versao': versao,
+            'scores': [{campo: registro[campo] for campo in ('posicao', 'uf', 'sigla', 'cod_ibge', 'score', 'criticidade')}
+                       for registro in registros],
+        }),
+        'estados': estados,
+        'rankings': rankings,
+        'regioes': sorted(indices['bitmaps']['regiao']),
+    }
+
+def buscar(tabela, chave):
+    """Busca exata (caminho rápido) e, se falhar, pela chave normalizada (acentos, caixa)"""
+    conteudo = tabela.get(chave)
+    if conteudo is None:
+        conteudo = tabela.get(localidades.normalizar_nome(chave))
+    return conteudo
+
+def preparar_respostas(estado):
+    """Preparador do observador de arquivos: serializa as respostas de cada nova versão antes da troca"""
+    _estado['respostas'] = montar_respostas(estado=estado)
+
+def respostas_atuais(base_path=carga_dados.DIRETORIO_DADOS):
+    """Respostas da versão ativa; as novas versões são montadas em segundo plano pelo observador"""
+    respostas = _estado['respostas']
+    if respostas is None:
+        observador = recarga.observar(base_path, preparar=preparar_respostas)
+        respostas = _estado['respostas']
+        if respostas is None:
+            raise ValueError(observador['erro'] or "nenhuma versão carregada")
+    return respostas
+
+class ManipuladorAPI(BaseHTTPRequestHandler):
+    """GET/HEAD somente leitura sobre as respostas pré-serializadas"""
+    protocol_version = "HTTP/1.1"
+    server_version = "CancerMamaAPI/1.0"
+    base_path = carga_dados.DIRETORIO_DADOS
+    registrar_acessos = False
+    # Cabeçalhos e corpo saem em escritas separadas: sem TCP_NODELAY o keep-alive trava no ACK atrasado
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self._responder(enviar_corpo=True)
+
+    def do_HEAD(self):
+        self._responder(enviar_corpo=False)
+
+    def _responder(self, enviar_corpo):
+        try:
+            respostas = respostas_atuais(self.base_path)
+        except (OSError, ValueError) as e:
+            return self._erro(503, f"Dados indisponíveis: {e}", enviar_corpo)
+
+        url = urlsplit(self.path)
+        partes = [parte for parte in url.path.split("/") if parte]
+
+        if partes == ['scores']:
+            conteudo = respostas['scores']
+        elif len(partes) == 2 and partes[0] == 'states':
+            uf = unquote(partes[1])
+            conteudo = buscar(respostas['estados'], uf)
+            if conteudo is None:
+                return self._erro(404, f"UF não encontrada: {uf}", enviar_corpo)
+        elif partes == ['rankings']:
+            regiao = parse_qs(url.query).get('regiao', [''])[0]
+            conteudo = buscar(respostas['rankings'], regiao)
+            if conteudo is None:
+                return self._erro(404, f"Região não encontrada: {regiao} (use {', '.join(respostas['regioes'])})",
+                                  enviar_corpo)
+        else:
+            return self._erro(404, "Rotas: /scores, /states/{uf}, /rankings?regiao=", enviar_corpo)
+
+        # A ETag é a da representação enviada (gzip ou não), como exige o Vary: Accept-Encoding
+        comprimir = aceita_gzip(self.headers.get('Accept-Encoding', ""))
+        etag = conteudo['etag_gzip'] if comprimir else conteudo['etag']
+        cabecalhos = {
+            'ETag': etag,
+            'Cache-Control': "no-cache",
+            'Vary': "Accept-Encoding",
+            'X-Dataset-Version': respostas['versao'],
+        }
+        etags = self.headers.get('If-None-Match', "")
+        if etag in (valor.strip() for valor in etags.split(",")) or etags.strip() == "*":
+            return self._enviar(304, cabecalhos, b"", enviar_corpo=False)
+
+        corpo = conteudo['corpo']
+        if comprimir:
+            corpo = conteudo['gzip']
+            cabecalhos['Content-Encoding'] = "gzip"
+        cabecalhos['Content-Type'] = "application/json; charset=utf-8"
+        self._enviar(200, cabecalhos, corpo, enviar_corpo)
+
+    def _erro(self, status, mensagem, enviar_corpo):
+        corpo = json.dumps({'erro': mensagem}, ensure_ascii=False).encode("utf-8")
+        self._enviar(status, {'Content-Type': "application/json; charset=utf-8"}, corpo, enviar_corpo)
+
+    def _enviar(self, status, cabecalhos, corpo, enviar_corpo):
+        self.send_response(status)
+        for nome, valor in cabecalhos.items():
+            self.send_header(nome, valor)
+        # 304 nunca tem corpo; Content-Length 0 seria lido como o tamanho da representação em cache
+        if status != 304:
+            self.send_header('Content-Length', str(len(corpo)))
+        self.end_headers()
+        if enviar_corpo and corpo:
+            self.wfile.write(corpo)
+
+    def log_message(self, formato, *args):
+        if self.registrar_acessos:
+            super().log_message(formato, *args)
+
+def criar_servidor(host="127.0.0.1", porta=8502, base_path=carga_dados.DIRETORIO_DADOS, registrar_acessos=False):
+    """Cria o servidor HTTP (ainda não iniciado); as respostas são montadas já na criação"""
+    respostas_atuais(base_path)
+    manipulador = type("Manipulador", (ManipuladorAPI,), {'base_path': base_path, 'registrar_acessos': registrar_acessos})
+    return ThreadingHTTPServer((host, porta), manipulador)
+
+# Executar API
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="API JSON somente leitura com scores e indicadores por UF")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--porta", type=int, default=8502)
+    parser.add_argument("--dados", default=carga_dados.DIRETORIO_DADOS, help="Diretório dos CSVs")
+    parser.add_argument("--log", action="store_true", help="Registra cada requisição no stderr")
+    args = parser.parse_args()
+
+    servidor = criar_servidor(args.host, args.porta, args.dados, args.log)
+    print(f"API em http://{args.host}:{args.porta} (versão dos dados {_estado['respostas']['versao']})")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        servidor.server_close()
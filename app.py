@@ -1,9 +1,28 @@
+import functools
+
 import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 import numpy as np
 
+import carga_dados
+import exportacao
+import figuras
+import incerteza
+import instrumentacao
+import mapas
+import pipeline
+import ranking
+import recarga
+import score
+import series
+
+# Copy-on-write: as sessões compartilham o mesmo DataFrame e só copiam o que alterarem
+# (comportamento padrão a partir do pandas 3)
+if int(pd.__version__.split(".")[0]) < 3:
+    pd.set_option("mode.copy_on_write", True)
+
 # Configuração da página
 st.set_page_config(
     page_title="Dashboard Câncer de Mama - Brasil",
@@ -12,114 +31,156 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Versões dos dados mantidas em cada cache por versão: a ativa e a anterior (sessões que
+# começaram a execução antes de uma troca); versões mais antigas são descartadas
+VERSOES_EM_CACHE = 2
+
 # Carregar dados - VERSÃO FINAL CORRIGIDA
-@st.cache_data
-def carregar_dados():
+@st.cache_resource
+def iniciar_recarga():
+    """Observador dos CSVs (um por processo): novas versões são montadas em segundo plano"""
+    return recarga.observar()
+
+def versao_dados():
+    """Versão ativa dos dados (trocada atomicamente pelo observador); None se os CSVs não carregaram.
+
+    Lida uma vez por execução: todos os caches da execução usam a mesma versão, mesmo que
+    uma troca aconteça no meio dela.
+    """
+    iniciar_recarga()
+    return recarga.versao_ativa()
+
+@instrumentacao.instrumentar("carregar_dados", cache=True)
+@st.cache_resource(max_entries=VERSOES_EM_CACHE)
+def carregar_dados(versao=None):
+    instrumentacao.marcar_miss("carregar_dados")
+    estado = recarga.estado_da_versao(versao)
+    if estado is not None:
+        # Versão ativa: consolidado já montado pelo observador (sem reler snapshot nem CSVs)
+        return estado['dados'].drop(columns=pipeline.COLUNAS_NO_SCORE)
     try:
-        # Carregar arquivos do mesmo diretório
-        mortalidade = pd.read_csv("mortalidade_tabela2.csv")
-        nunca_mamografia = pd.read_csv("nunca_mamografia_fig15.csv")
-        mamografos_uf = pd.read_csv("mamografos_regiao_tabela10_total.csv")
-        mamografos_sus = pd.read_csv("mamografos_regiao_tabela11_SUS.csv")
-        tempo_laudo = pd.read_csv("tempo_laudo_rastreamento_tabela9.csv")
-        
-        # CORREÇÃO: Converter a coluna Utilização(%) para numérico
-        mamografos_uf['Utilizacao_%'] = mamografos_uf['Utilização(%)'].astype(float)
-        
-        # Consolidar dados principais usando UF
-        dados = mortalidade.merge(nunca_mamografia, on='UF', how='left')
-        dados = dados.merge(tempo_laudo, on='UF', how='left')
-        dados = dados.merge(mamografos_uf[['UF', 'Utilizacao_%']], on='UF', how='left')
-        dados = dados.merge(mamografos_sus, on='UF', how='left')
-        
-        return dados
+        # Snapshot colunar (Feather) reaproveitado enquanto os CSVs não mudam;
+        # a versão entra na chave do cache para invalidá-lo quando um arquivo muda.
+        # cache_resource: uma única cópia, somente leitura, para todas as sessões
+        return carga_dados.carregar_dados(versao=versao)
         
     except Exception as e:
         st.error(f"Erro ao carregar dados: {e}")
         return None
 
-def calcular_score_criticidade(dados):
-    """Calcula score de criticidade para cada estado"""
-    dados_score = dados.copy()
-    
-    # Normalizar cada métrica para escala 0-100
-    dados_score['Score_Mortalidade'] = (dados_score['Taxa_mortalidade_ajustada'] / dados_score['Taxa_mortalidade_ajustada'].max() * 100).round(1)
-    dados_score['Score_Nao_Rastreadas'] = (dados_score['Percentual_nunca_fez_exame'] / dados_score['Percentual_nunca_fez_exame'].max() * 100).round(1)
-    dados_score['Score_Laudos_Lentos'] = (dados_score['Mais_60_dias_%'] / dados_score['Mais_60_dias_%'].max() * 100).round(1)
-    
-    # Score consolidado com pesos
-    dados_score['Score_Consolidado'] = (
-        dados_score['Score_Mortalidade'] * 0.35 +      # Peso 35%
-        dados_score['Score_Nao_Rastreadas'] * 0.35 +   # Peso 35%
-        dados_score['Score_Laudos_Lentos'] * 0.30      # Peso 30%
-    ).round(1)
-    
-    # Classificar por criticidade
-    dados_score = dados_score.sort_values('Score_Consolidado', ascending=False)
-    
-    return dados_score
+@st.cache_resource(max_entries=VERSOES_EM_CACHE)
+def carregar_dados_score(versao=None):
+    """Dados com os scores de criticidade, na ordem original (compartilhado entre sessões)"""
+    estado = recarga.estado_da_versao(versao)
+    if estado is not None:
+        return estado['dados']
+    return score.aplicar_score(carregar_dados(versao))
+
+@instrumentacao.instrumentar("calcular_score_criticidade", cache=True)
+@st.cache_resource(max_entries=VERSOES_EM_CACHE)
+def carregar_ranking(versao=None):
+    """Dados ordenados por Score_Consolidado (compartilhado entre sessões)"""
+    instrumentacao.marcar_miss("calcular_score_criticidade")
+    estado = recarga.estado_da_versao(versao)
+    if estado is not None:
+        return pipeline.ranking_estado(estado)
+    return score.calcular_score_criticidade(carregar_dados(versao))
+
+@st.cache_resource(max_entries=VERSOES_EM_CACHE)
+def carregar_indices_ranking(versao=None):
+    """Índices bitmap (região, faixa de criticidade) do ranking, construídos uma vez por versão"""
+    estado = recarga.estado_da_versao(versao)
+    if estado is not None:
+        return estado['indices_ranking']
+    return ranking.construir_indices(carregar_ranking(versao))
+
+@st.cache_resource(max_entries=VERSOES_EM_CACHE)
+def carregar_posicoes(versao=None):
+    """Posições nacionais e por região de cada indicador (arrays por versão; consulta O(1) por UF)"""
+    estado = recarga.estado_da_versao(versao)
+    if estado is not None:
+        return estado['posicoes']
+    return ranking.carregar_posicoes(carregar_dados_score(versao), versao)
+
+@st.cache_resource(max_entries=VERSOES_EM_CACHE)
+def carregar_indice_estados(versao=None):
+    """Índice UF -> registro (com scores), compartilhado entre sessões (somente leitura)"""
+    return carga_dados.construir_indice_estados(carregar_dados_score(versao))
+
+@st.cache_resource(max_entries=VERSOES_EM_CACHE)
+def carregar_agregados(versao=None):
+    """Médias e somas nacionais e médias regionais, calculadas uma vez por versão"""
+    estado = recarga.estado_da_versao(versao)
+    if estado is not None:
+        return estado['agregados']
+    return carga_dados.carregar_agregados(carregar_dados_score(versao), versao)
+
+def versao_series():
+    """Atualiza as partições (ano x indicador) que mudaram e retorna a versão das séries; None se falhar"""
+    try:
+        return series.atualizar_series()
+    except (OSError, ValueError):
+        return None
+
+@st.cache_data
+def carregar_tendencia(versao_serie, indicador, coluna, codigo, anos):
+    """Série anual do estado e da média BR; só as partições dos anos selecionados são lidas"""
+    return series.tendencia(indicador, coluna, codigo, list(anos))
+
+@st.cache_resource
+def carregar_geometrias(nivel):
+    """GeoJSON das UFs no nível de detalhe pedido, decodificado uma vez por processo"""
+    return mapas.carregar_geojson('uf', nivel)
+
+@st.cache_data(max_entries=VERSOES_EM_CACHE)
+def calcular_sensibilidade(versao=None, n_cenarios=10_000):
+    """Análise de sensibilidade do ranking aos pesos (uma vez por versão dos dados)"""
+    return score.sensibilidade_ranking(carregar_dados(versao), n_cenarios)
 
-def criar_tabela_criticidade(dados_score, estado_selecionado=None):
+@st.cache_data(max_entries=VERSOES_EM_CACHE)
+def calcular_incerteza(versao=None, n_replicas=incerteza.N_REPLICAS):
+    """Intervalos de 95% do score e da posição por bootstrap (uma vez por versão dos dados)"""
+    return incerteza.bootstrap_criticidade(carregar_dados(versao), n_replicas)
+
+# Linhas por página da tabela de ranking
+LINHAS_POR_PAGINA = 50
+
+@instrumentacao.instrumentar("criar_tabela_criticidade")
+def criar_tabela_criticidade(dados_score, estado_selecionado=None, intervalos=None):
     """Cria tabela com ranking de criticidade"""
     
     st.header("🔎 Ranking de Criticidade por Estado")
     st.markdown("**Classificação baseada na combinação de mortalidade, mulheres não rastreadas e laudos lentos**")
     
     # Criar tabela formatada
-    tabela_display = dados_score[[
-        'UF', 'Regiao', 'Score_Consolidado', 
-        'Taxa_mortalidade_ajustada', 'Percentual_nunca_fez_exame', 'Mais_60_dias_%', 'Obitos'
-    ]].copy()
-    
-    # Renomear colunas
-    tabela_display.columns = [
-        'UF', 'Região', 'Score Crítico', 
-        'Mortalidade', '% Não Rastreadas', '% Laudos >60d', 'Óbitos'
-    ]
-    
-    # Formatar valores
-    tabela_display['Mortalidade'] = tabela_display['Mortalidade'].round(1)
-    tabela_display['% Não Rastreadas'] = tabela_display['% Não Rastreadas'].round(1)
-    tabela_display['% Laudos >60d'] = tabela_display['% Laudos >60d'].round(1)
-    
-    # Adicionar ranking
-    tabela_display.insert(0, 'Posição', range(1, len(tabela_display) + 1))
-    
-    # Estilizar a tabela
-    def color_score(val):
-        if val >= 80:
-            return 'background-color: #ff4d4d; color: white; font-weight: bold'
-        elif val >= 60:
-            return 'background-color: #ff9999; color: black; font-weight: bold'
-        elif val >= 40:
-            return 'background-color: #ffcc99; color: black;'
-        elif val >= 20:
-            return 'background-color: #ffff99; color: black;'
-        else:
-            return 'background-color: #ccffcc; color: black;'
+    tabela_display = ranking.montar_tabela(dados_score, estado_selecionado, intervalos)
     
-    def color_estado_selecionado(row):
-        if estado_selecionado and row['UF'] == estado_selecionado:
-            return ['background-color: #EE82EE; font-weight: bold;'] * len(row)
-        else:
-            return [''] * len(row)
-    
-    # Aplicar estilos
-    styled_table = tabela_display.style.apply(color_estado_selecionado, axis=1)\
-                                      .applymap(color_score, subset=['Score Crítico'])\
-                                      .format({
-                                          'Score Crítico': '{:.1f}',
-                                          'Mortalidade': '{:.1f}',
-                                          '% Não Rastreadas': '{:.1f}%',
-                                          '% Laudos >60d': '{:.1f}%',
-                                          'Óbitos': '{:.0f}'
-                                      })
-    
-    # Exibir tabela
+    # Paginação: só a página visível é serializada para o navegador
+    tabela_pagina = tabela_display
+    if len(tabela_display) > LINHAS_POR_PAGINA:
+        n_paginas = (len(tabela_display) - 1) // LINHAS_POR_PAGINA + 1
+        pagina = st.number_input(f"Página (de {n_paginas})", min_value=1, max_value=n_paginas, value=1)
+        inicio = (pagina - 1) * LINHAS_POR_PAGINA
+        tabela_pagina = tabela_display.iloc[inicio:inicio + LINHAS_POR_PAGINA]
+    
+    # Exibir tabela com formatação nativa das colunas (sem Styler)
     st.dataframe(
-        styled_table,
+        tabela_pagina,
         use_container_width=True,
-        height=800
+        height=min(800, 38 + 35 * len(tabela_pagina)),
+        hide_index=True,
+        column_config={
+            'Posição': st.column_config.NumberColumn(format="%dº"),
+            '📍': st.column_config.TextColumn(width="small", help="Estado selecionado"),
+            'Score Crítico': st.column_config.ProgressColumn(format="%.1f", min_value=0, max_value=100),
+            'IC 95% Posição': st.column_config.TextColumn(
+                help="Intervalo de 95% da posição nacional, por reamostragem de óbitos (Poisson) e proporções (binomial)"
+            ),
+            'Mortalidade': st.column_config.NumberColumn(format="%.1f"),
+            '% Não Rastreadas': st.column_config.NumberColumn(format="%.1f%%"),
+            '% Laudos >60d': st.column_config.NumberColumn(format="%.1f%%"),
+            'Óbitos': st.column_config.NumberColumn(format="%d"),
+        }
     )
     
     # Legenda
@@ -137,15 +198,57 @@ def criar_tabela_criticidade(dados_score, estado_selecionado=None):
     
     return tabela_display
 
-def criar_visao_mortalidade(dados, estado_selecionado):
+def exibir_tendencia(versao_serie, indicador, coluna, estado_data, estado_selecionado, titulo, eixo_y):
+    """Gráfico de evolução anual, com o período limitado aos anos do próprio indicador.
+
+    Só é exibido com ao menos dois anos no período: um único ponto não forma tendência.
+    """
+    if not versao_serie:
+        return
+    anos = series.anos_disponiveis(indicador)
+    if len(anos) < 2:
+        st.caption(f"Evolução histórica indisponível: há dados apenas de {anos[0]}. "
+                   f"Anos anteriores entram pela pasta `{series.DIRETORIO_HISTORICO}/`.")
+        return
+    
+    st.subheader("📈 Evolução Histórica")
+    inicio, fim = st.select_slider("Período:", options=anos, value=(anos[0], anos[-1]), key=f"periodo_{indicador}")
+    anos = [ano for ano in anos if inicio <= ano <= fim]
+    if len(anos) < 2:
+        st.caption("Selecione um período com ao menos dois anos para ver a evolução.")
+        return
+    
+    tendencia = carregar_tendencia(versao_serie, indicador, coluna, int(estado_data['Cod_IBGE']), tuple(anos))
+    exibir_figura(versao_serie, f"tendencia_{indicador}_{anos[0]}_{anos[-1]}", estado_selecionado,
+                  lambda: figuras.figura_tendencia(tendencia, estado_selecionado, titulo, eixo_y))
+
+def exibir_figura(versao, visao, estado, construir):
+    """Exibe uma figura Plotly reaproveitando a do cache LRU por (versão, visão, estado)"""
+    etapa = f"plotly_{visao}"
+    
+    def construir_medido():
+        instrumentacao.marcar_miss(etapa)
+        return construir()
+    
+    with instrumentacao.medir(etapa, cache=versao is not None):
+        if versao is None:
+            figura = construir()
+        else:
+            figura = figuras.obter_figura(versao, visao, estado, construir_medido)
+        st.plotly_chart(figura, use_container_width=True)
+
+@instrumentacao.instrumentar("criar_visao_mortalidade")
+def criar_visao_mortalidade(dados, indice, agregados, posicoes, estado_selecionado, versao=None, versao_serie=None):
     """Cria visualização focada em mortalidade"""
     st.header("🪦 Análise de Mortalidade por Câncer de Mama")
     
+    estado_data = indice['registro'][estado_selecionado]
+    
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        taxa_estado = dados[dados['UF'] == estado_selecionado]['Taxa_mortalidade_ajustada'].iloc[0]
-        media_br = dados['Taxa_mortalidade_ajustada'].mean()
+        taxa_estado = estado_data['Taxa_mortalidade_ajustada']
+        media_br = agregados['media']['Taxa_mortalidade_ajustada']
         diff = taxa_estado - media_br
         st.metric(
             "Taxa de Mortalidade Ajustada",
@@ -155,8 +258,8 @@ def criar_visao_mortalidade(dados, estado_selecionado):
         )
     
     with col2:
-        obitos_estado = dados[dados['UF'] == estado_selecionado]['Obitos'].iloc[0]
-        total_br = dados['Obitos'].sum()
+        obitos_estado = estado_data['Obitos']
+        total_br = agregados['soma']['Obitos']
         participacao = (obitos_estado / total_br * 100)
         st.metric(
             "Óbitos Registrados (2022)",
@@ -165,7 +268,7 @@ def criar_visao_mortalidade(dados, estado_selecionado):
         )
     
     with col3:
-        taxa_bruta = dados[dados['UF'] == estado_selecionado]['Taxa_bruta'].iloc[0]
+        taxa_bruta = estado_data['Taxa_bruta']
         st.metric(
             "Taxa Bruta de Mortalidade",
             f"{taxa_bruta:.1f}",
@@ -173,49 +276,40 @@ def criar_visao_mortalidade(dados, estado_selecionado):
         )
     
     with col4:
-        ranking = dados['Taxa_mortalidade_ajustada'].rank(ascending=False)
-        posicao = int(ranking[dados['UF'] == estado_selecionado].iloc[0])
+        posicao = int(ranking.posicao_entidade(posicoes, 'Taxa_mortalidade_ajustada', estado_selecionado))
+        posicao_regiao = int(ranking.posicao_entidade(posicoes, 'Taxa_mortalidade_ajustada', estado_selecionado, True))
+        total_regiao = ranking.total_comparado(posicoes, 'Taxa_mortalidade_ajustada', estado_selecionado, True)
         st.metric(
             "Posição no Ranking",
             f"{posicao}º lugar",
-            f"de {len(dados)} estados"
+            f"de {posicoes['n']} estados",
+            help=f"{posicao_regiao}º de {total_regiao} na região {estado_data['Regiao']}"
         )
     
-    # Gráfico de comparação
-    fig = go.Figure()
-    
-    dados_ordenados = dados.sort_values('Taxa_mortalidade_ajustada', ascending=True)
-    
-    # Barras para todos os estados
-    fig.add_trace(go.Bar(
-        y=dados_ordenados['UF'],
-        x=dados_ordenados['Taxa_mortalidade_ajustada'],
-        orientation='h',
-        marker_color=['red' if uf == estado_selecionado else 'lightgray' for uf in dados_ordenados['UF']],
-        name='Taxa de Mortalidade'
-    ))
-    
-    fig.add_vline(x=media_br, line_dash="dash", line_color="blue", annotation_text="Média BR")
-    fig.add_vline(x=13.0, line_dash="dash", line_color="red", annotation_text="Limite Crítico")
-    
-    fig.update_layout(
-        height=400,
-        title="Comparação da Taxa de Mortalidade entre Estados",
-        xaxis_title="Taxa de Mortalidade Ajustada (por 100 mil mulheres)",
-        showlegend=False
+    st.caption(
+        f"Casos novos por óbito: **{estado_data['Casos_por_obito']:.2f}** "
+        f"(média BR {agregados['media']['Casos_por_obito']:.2f}; {estado_data['Numero_casos']:.0f} casos)"
     )
     
-    st.plotly_chart(fig, use_container_width=True)
+    # Gráfico de comparação
+    exibir_figura(versao, 'mortalidade', estado_selecionado,
+                  lambda: figuras.figura_mortalidade(dados, agregados, estado_selecionado))
+    
+    exibir_tendencia(versao_serie, 'mortalidade', 'Taxa_mortalidade_ajustada', estado_data, estado_selecionado,
+                     "Evolução da Taxa de Mortalidade Ajustada", "Taxa por 100 mil mulheres")
 
-def criar_visao_rastreamento(dados, estado_selecionado):
+@instrumentacao.instrumentar("criar_visao_rastreamento")
+def criar_visao_rastreamento(dados, indice, agregados, estado_selecionado):
     """Cria visualização focada em rastreamento"""
     st.header("☂️ Cobertura de Rastreamento por Mamografia")
     
+    estado_data = indice['registro'][estado_selecionado]
+    
     col1, col2, col3 = st.columns(3)
     
     with col1:
-        nao_rastreadas = dados[dados['UF'] == estado_selecionado]['Percentual_nunca_fez_exame'].iloc[0]
-        media_br = dados['Percentual_nunca_fez_exame'].mean()
+        nao_rastreadas = estado_data['Percentual_nunca_fez_exame']
+        media_br = agregados['media']['Percentual_nunca_fez_exame']
         diff = nao_rastreadas - media_br
         st.metric(
             "Mulheres Não Rastreadas",
@@ -254,11 +348,12 @@ def criar_visao_rastreamento(dados, estado_selecionado):
     else:
         st.success("**BOM**: Menos de 20% de não rastreadas - situação satisfatória")
 
-def criar_visao_infraestrutura(dados, estado_selecionado):
+@instrumentacao.instrumentar("criar_visao_infraestrutura")
+def criar_visao_infraestrutura(dados, indice, estado_selecionado):
     """Cria visualização focada em infraestrutura"""
     st.header("🖥️ Infraestrutura de Mamógrafos")
     
-    estado_data = dados[dados['UF'] == estado_selecionado].iloc[0]
+    estado_data = indice['registro'][estado_selecionado]
     utilizacao_estado = estado_data['Utilizacao_%']
     mamografos_sus = estado_data['Mamografos_SUS']
     
@@ -298,17 +393,18 @@ def criar_visao_infraestrutura(dados, estado_selecionado):
     # Informação adicional
     st.info(f"**Observação - {estado_selecionado}:** Utilização de {utilizacao_estado:.1f}%, com {mamografos_sus} mamógrafos pelo SUS")
 
-def criar_visao_tempo_laudo(dados, estado_selecionado):
+@instrumentacao.instrumentar("criar_visao_tempo_laudo")
+def criar_visao_tempo_laudo(dados, indice, agregados, estado_selecionado, versao=None, versao_serie=None):
     """Cria visualização focada no tempo de laudo"""
     st.header("⏱️ Tempo para Emissão de Laudos")
     
-    estado_data = dados[dados['UF'] == estado_selecionado].iloc[0]
+    estado_data = indice['registro'][estado_selecionado]
     
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
         mais_60 = estado_data['Mais_60_dias_%']
-        media_br = dados['Mais_60_dias_%'].mean()
+        media_br = agregados['media']['Mais_60_dias_%']
         diff = mais_60 - media_br
         st.metric(
             "Laudos > 60 Dias",
@@ -348,23 +444,11 @@ def criar_visao_tempo_laudo(dados, estado_selecionado):
         )
     
     # Gráfico de pizza
-    fig = go.Figure()
-    
-    fig.add_trace(go.Pie(
-        labels=['Até 30 dias', '31-60 dias', 'Mais de 60 dias'],
-        values=[ate_30, entre_31_60, mais_60],
-        marker_colors=['green', 'orange', 'red'],
-        hole=0.4,
-        textinfo='percent+label'
-    ))
-    
-    fig.update_layout(
-        height=400,
-        title="Distribuição do Tempo para Emissão de Laudos",
-        annotations=[dict(text='Tempo<br>Laudo', x=0.5, y=0.5, font_size=20, showarrow=False)]
-    )
+    exibir_figura(versao, 'tempo_laudo', estado_selecionado,
+                  lambda: figuras.figura_tempo_laudo(estado_data))
     
-    st.plotly_chart(fig, use_container_width=True)
+    exibir_tendencia(versao_serie, 'tempo_laudo', 'Mais_60_dias_%', estado_data, estado_selecionado,
+                     "Evolução dos Laudos com Mais de 60 Dias", "% dos laudos")
     
     # Análise crítica
     st.subheader("🌎 Impacto dos Laudos com Mais de 60 Dias")
@@ -393,18 +477,15 @@ def criar_visao_tempo_laudo(dados, estado_selecionado):
         deterioração do serviço.
         """)
 
-def criar_visao_consolidada(dados, estado_selecionado):
+@instrumentacao.instrumentar("criar_visao_consolidada")
+def criar_visao_consolidada(dados, indice, agregados, estado_selecionado, versao=None):
     """Cria visão consolidada com todos os indicadores"""
     st.header("📊 Visão Consolidada do Estado")
     
-    estado_data = dados[dados['UF'] == estado_selecionado].iloc[0]
+    estado_data = indice['registro'][estado_selecionado]
     
-    # Calcular score de criticidade
-    score = (
-        (estado_data['Taxa_mortalidade_ajustada'] / 20 * 30) +  # Peso 30%
-        (estado_data['Percentual_nunca_fez_exame'] / 100 * 35) +  # Peso 35%
-        (estado_data['Mais_60_dias_%'] / 100 * 35)  # Peso 35%
-    )
+    # Mesmo score do ranking (motor único em score.py)
+    score_estado = estado_data['Score_Consolidado']
     
     col1, col2 = st.columns([1, 2])
     
@@ -412,71 +493,154 @@ def criar_visao_consolidada(dados, estado_selecionado):
         st.subheader("Índice de Criticidade")
         st.metric(
             "Score Consolidado",
-            f"{score:.1f}/100",
+            f"{score_estado:.1f}/100",
             "quanto maior, mais crítico"
         )
         
-        if score > 70:
+        if score_estado > 70:
             st.error("**PRIORIDADE MÁXIMA** - Necessidade de intervenção urgente")
-        elif score > 50:
+        elif score_estado > 50:
             st.warning("**PRIORIDADE ALTA** - Necessidade de atenção especial")
-        elif score > 30:
+        elif score_estado > 30:
             st.info("**PRIORIDADE MÉDIA** - Situação requer monitoramento")
         else:
             st.success("**PRIORIDADE BAIXA** - Situação relativamente estável")
     
     with col2:
         # Radar chart com os principais indicadores
-        categorias = ['Mortalidade', 'Não Rastreadas', 'Laudos Lentos']
-        valores = [
-            min(estado_data['Taxa_mortalidade_ajustada'] / 20 * 100, 100),
-            estado_data['Percentual_nunca_fez_exame'],
-            estado_data['Mais_60_dias_%']
-        ]
-        
-        fig = go.Figure()
-        
-        fig.add_trace(go.Scatterpolar(
-            r=valores + [valores[0]],  # Fechar o radar
-            theta=categorias + [categorias[0]],
-            fill='toself',
-            name=estado_selecionado,
-            line=dict(color='red')
-        ))
-        
-        # Adicionar média BR como referência
-        valores_media = [
-            min(dados['Taxa_mortalidade_ajustada'].mean() / 20 * 100, 100),
-            dados['Percentual_nunca_fez_exame'].mean(),
-            dados['Mais_60_dias_%'].mean()
-        ]
-        
-        fig.add_trace(go.Scatterpolar(
-            r=valores_media + [valores_media[0]],
-            theta=categorias + [categorias[0]],
-            fill='toself',
-            name='Média Brasil',
-            line=dict(color='blue')
-        ))
-        
-        fig.update_layout(
-            polar=dict(
-                radialaxis=dict(
-                    visible=True,
-                    range=[0, 100]
-                )),
-            showlegend=True,
-            height=300
+        exibir_figura(versao, 'consolidada', estado_selecionado,
+                      lambda: figuras.figura_consolidada(estado_data, agregados, estado_selecionado))
+
+# Indicadores disponíveis no mapa
+INDICADORES_MAPA = {
+    'Score_Consolidado': "Score de criticidade",
+    'Taxa_mortalidade_ajustada': "Mortalidade ajustada (por 100 mil)",
+    'Percentual_nunca_fez_exame': "% nunca fez mamografia",
+    'Mais_60_dias_%': "% laudos > 60 dias",
+    'Utilizacao_%': "% utilização de mamógrafos",
+}
+
+@instrumentacao.instrumentar("criar_visao_mapa")
+def criar_visao_mapa(dados_score, estado_selecionado, versao=None):
+    """Cria o mapa coroplético dos indicadores por UF"""
+    st.header("🗺️ Mapa da Desigualdade Regional")
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        coluna = st.selectbox("Indicador do mapa:", list(INDICADORES_MAPA), format_func=INDICADORES_MAPA.get)
+    
+    # Geometrias pré-simplificadas; sem elas o mapa é desenhado em grade
+    niveis = mapas.niveis_disponiveis('uf')
+    geojson = nivel = None
+    if niveis:
+        with col2:
+            nivel = st.select_slider("Detalhe dos contornos:", options=niveis,
+                                     value='medio' if 'medio' in niveis else niveis[0])
+        geojson = carregar_geometrias(nivel)
+    else:
+        st.caption("Contornos não gerados: exibindo o mapa em grade das UFs. "
+                   "Gere-os com `python mapas.py --origem <malha_uf.geojson>`.")
+    
+    # O coroplético não depende do estado selecionado: uma entrada de cache por indicador e nível
+    exibir_figura(versao, f"mapa_{coluna}_{nivel or 'grade'}", estado_selecionado if geojson is None else None,
+                  lambda: mapas.figura_mapa(dados_score, coluna, INDICADORES_MAPA[coluna], geojson, estado_selecionado))
+
+def criar_abas(rotulos):
+    """Cria as abas com rastreamento de estado, para que só a aba ativa seja calculada"""
+    try:
+        return st.tabs(rotulos, key="aba_ativa", on_change="rerun")
+    except TypeError:
+        # Versões antigas do Streamlit não têm abas lazy: todas são calculadas
+        return st.tabs(rotulos)
+
+def aba_aberta(aba):
+    """True se a aba está selecionada (ou se o estado das abas não é rastreado)"""
+    return getattr(aba, 'open', None) is not False
+
+@st.fragment
+def secao_ranking(dados, versao, estado_selecionado):
+    """Aba de ranking; como fragmento, os filtros só re-executam esta seção"""
+    instrumentacao.iniciar_fragmento("secao_ranking")
+    
+    # Scores de criticidade (calculados uma vez por versão)
+    dados_score = carregar_ranking(versao)
+    
+    st.subheader("📊 Filtros da Tabela")
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        # Filtro por região
+        regioes = ['Todas'] + list(dados['Regiao'].unique())
+        regiao_filtro = st.selectbox("Filtrar por região:", regioes)
+    
+    with col2:
+        # Filtro por nível de criticidade
+        nivel_criticidade = st.selectbox("Filtrar por criticidade:", ranking.NIVEIS_FILTRO)
+    
+    # Aplicar filtros pela interseção dos índices bitmap (sem varrer nem copiar o DataFrame compartilhado)
+    dados_filtrados = ranking.filtrar_ranking(dados_score, regiao_filtro, nivel_criticidade,
+                                              carregar_indices_ranking(versao))
+    
+    intervalos = calcular_incerteza(versao)
+    criar_tabela_criticidade(dados_filtrados, estado_selecionado, intervalos)
+    
+    # Exportação da tabela filtrada: o arquivo só é gerado no clique, em blocos (exportacao.py)
+    formatos = exportacao.formatos_disponiveis()
+    for coluna, formato in zip(st.columns(len(formatos)), formatos):
+        with coluna:
+            st.download_button(
+                f"⬇️ Exportar {formato.upper()}",
+                functools.partial(exportacao.exportar_bytes, dados_filtrados, formato, intervalos),
+                exportacao.nome_arquivo(formato, regiao_filtro, nivel_criticidade),
+                mime=exportacao.FORMATOS[formato]['mime'],
+                on_click="ignore",
+                use_container_width=True,
+            )
+    
+    with st.expander("🎲 Estabilidade do ranking (10 mil combinações de pesos)"):
+        st.markdown("Posições de cada estado quando os pesos dos três indicadores são sorteados aleatoriamente")
+        st.dataframe(
+            calcular_sensibilidade(versao),
+            use_container_width=True,
+            hide_index=True
         )
-        
-        st.plotly_chart(fig, use_container_width=True)
+
+def painel_depuracao(dados):
+    """Painel opcional (?debug=1) com as medições desta execução e exportação"""
+    with st.sidebar:
+        st.markdown("---")
+        st.header("🛠️ Depuração")
+        registros = instrumentacao.registros_execucao()
+        if registros:
+            tabela = pd.DataFrame(registros)[['etapa', 'segundos', 'memoria_delta_mb', 'cache']]
+            tabela['segundos'] *= 1000
+            st.dataframe(
+                tabela,
+                hide_index=True,
+                column_config={
+                    'segundos': st.column_config.NumberColumn("ms", format="%.1f"),
+                    'memoria_delta_mb': st.column_config.NumberColumn("Δ RSS (MB)", format="%.1f"),
+                }
+            )
+        st.caption(f"Cache de figuras: {figuras.estatisticas_cache()}")
+        st.caption(f"Memória do conjunto de dados: {carga_dados.memoria_mb(dados):.3f} MB")
+        situacao = recarga.situacao()
+        if situacao:
+            st.caption(f"Versão ativa: {situacao['versao']} ({situacao['trocas']} trocas)")
+            if situacao['erro']:
+                st.caption(f"Última recarga falhou (versão anterior mantida): {situacao['erro']}")
+        st.download_button("Exportar JSON lines", instrumentacao.exportar_jsonl(), "metricas.jsonl")
+        st.download_button("Exportar Prometheus", instrumentacao.exportar_prometheus(), "metricas.prom")
 
 def main():
+    instrumentacao.iniciar_execucao()
+    
     st.title("🎀 Câncer de Mama no Brasil 🎀 ")
     st.markdown("### Análise Integrada: Mortalidade, Rastreamento e Infraestrutura")
     
     # Carregar dados
-    dados = carregar_dados()
+    versao = versao_dados()
+    dados = carregar_dados(versao)
     
     if dados is None:
         st.error("Não foi possível carregar os dados. Verifique se todos os arquivos CSV estão no mesmo diretório:")
@@ -489,8 +653,12 @@ def main():
         """)
         return
     
-    # Calcular scores de criticidade
-    dados_score = calcular_score_criticidade(dados)
+    # Índice por UF para as visões por estado
+    indice = carregar_indice_estados(versao)
+    agregados = carregar_agregados(versao)
+    
+    # Séries históricas: só as partições dos anos selecionados em cada visão são lidas
+    versao_serie = versao_series()
     
     # Sidebar para controles
     with st.sidebar:
@@ -503,19 +671,6 @@ def main():
             index=24  # SP como padrão
         )
         
-        st.markdown("---")
-        st.header("📊 Filtros da Tabela")
-        
-        # Filtro por região
-        regioes = ['Todas'] + list(dados['Regiao'].unique())
-        regiao_filtro = st.selectbox("Filtrar por região:", regioes)
-        
-        # Filtro por nível de criticidade
-        nivel_criticidade = st.selectbox(
-            "Filtrar por criticidade:",
-            ['Todos', 'Crítico (≥80)', 'Alto (60-79)', 'Médio (40-59)', 'Baixo (20-39)', 'Muito Baixo (<20)']
-        )
-        
         st.markdown("---")
         st.info("""
         **Fontes dos Dados:**
@@ -526,48 +681,45 @@ def main():
         - ⏱️ Tabela 9: Tempo de laudo
         """)
     
-    # Layout principal
-    tab1, tab2, tab3, tab4, tab5 = st.tabs([
+    # Layout principal: só a aba ativa é calculada
+    tab1, tab2, tab3, tab4, tab5, tab6 = criar_abas([
         "🚑 Ranking Crítico", 
         "🪦 Mortalidade", 
         "🩺 Rastreamento", 
         "⏱️ Tempo Laudo", 
-        "📊 Visão Consolidada"
+        "📊 Visão Consolidada",
+        "🗺️ Mapa"
     ])
     
-    with tab1:
-        # Aplicar filtros
-        dados_filtrados = dados_score.copy()
-        
-        if regiao_filtro != 'Todas':
-            dados_filtrados = dados_filtrados[dados_filtrados['Regiao'] == regiao_filtro]
-        
-        if nivel_criticidade != 'Todos':
-            if nivel_criticidade == 'Crítico (≥80)':
-                dados_filtrados = dados_filtrados[dados_filtrados['Score_Consolidado'] >= 80]
-            elif nivel_criticidade == 'Alto (60-79)':
-                dados_filtrados = dados_filtrados[dados_filtrados['Score_Consolidado'].between(60, 79.9)]
-            elif nivel_criticidade == 'Médio (40-59)':
-                dados_filtrados = dados_filtrados[dados_filtrados['Score_Consolidado'].between(40, 59.9)]
-            elif nivel_criticidade == 'Baixo (20-39)':
-                dados_filtrados = dados_filtrados[dados_filtrados['Score_Consolidado'].between(20, 39.9)]
-            elif nivel_criticidade == 'Muito Baixo (<20)':
-                dados_filtrados = dados_filtrados[dados_filtrados['Score_Consolidado'] < 20]
-        
-        criar_tabela_criticidade(dados_filtrados, estado_selecionado)
+    if aba_aberta(tab1):
+        with tab1:
+            secao_ranking(dados, versao, estado_selecionado)
     
-    with tab2:
-        criar_visao_mortalidade(dados, estado_selecionado)
+    if aba_aberta(tab2):
+        with tab2:
+            criar_visao_mortalidade(dados, indice, agregados, carregar_posicoes(versao), estado_selecionado, versao,
+                                    versao_serie)
     
-    with tab3:
-        criar_visao_rastreamento(dados, estado_selecionado)
+    if aba_aberta(tab3):
+        with tab3:
+            criar_visao_rastreamento(dados, indice, agregados, estado_selecionado)
     
-    with tab4:
-        criar_visao_tempo_laudo(dados, estado_selecionado)
+    if aba_aberta(tab4):
+        with tab4:
+            criar_visao_tempo_laudo(dados, indice, agregados, estado_selecionado, versao,
+                                    versao_serie)
     
-    with tab5:
-        criar_visao_consolidada(dados, estado_selecionado)
-        criar_visao_infraestrutura(dados, estado_selecionado)
+    if aba_aberta(tab5):
+        with tab5:
+            criar_visao_consolidada(dados, indice, agregados, estado_selecionado, versao)
+            criar_visao_infraestrutura(dados, indice, estado_selecionado)
+    
+    if aba_aberta(tab6):
+        with tab6:
+            criar_visao_mapa(carregar_dados_score(versao), estado_selecionado, versao)
+    
+    if st.query_params.get("debug") == "1":
+        painel_depuracao(dados)
     
     # Footer
     st.markdown("---")
@@ -576,4 +728,7 @@ def main():
     st.markdown("*Desenvolvido por Tiago Alves - Cientista de Dados - https://www.linkedin.com/in/tiagoalvesds/*")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    try:
+        main()
+    finally:
+        instrumentacao.finalizar_execucao()
\ No newline at end of file
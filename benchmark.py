@@ -0,0 +1,207 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+import carga_dados
+import ranking
+import score
+
+# Escalas padrão: UF, município e registro (10 milhões via --linhas 10000000)
+TAMANHOS_PADRAO = [27, 5_570, 500_000]
+REGIOES = ['Norte', 'Nordeste', 'Sudeste', 'Sul', 'Centro-oeste']
+CAMINHO_BASELINE = os.path.join(carga_dados.DIRETORIO_DADOS, "benchmarks", "baseline.json")
+# Destino padrão dos resultados quando há comparação (a baseline nunca é sobrescrita pela própria comparação)
+CAMINHO_ATUAL = os.path.join(carga_dados.DIRETORIO_DADOS, "benchmarks", "atual.json")
+
+def gerar_dados_sinteticos(n_linhas, destino, seed=0):
+    """Grava em destino os CSVs de origem com n_linhas entidades, seguindo os esquemas reais.
+
+    Retorna a dimensão de localidades sintética (mesmas colunas de localidades.tabela_localidades).
+    """
+    rng = np.random.default_rng(seed)
+    ufs = pd.Series(np.arange(n_linhas)).map("Entidade_{:07d}".format)
+    regioes = np.asarray(REGIOES)[rng.integers(0, len(REGIOES), n_linhas)]
+    dimensao = pd.DataFrame({
+        'Cod_IBGE': np.arange(1_000_000, 1_000_000 + n_linhas, dtype='int32'),
+        'Sigla': pd.Series(np.arange(n_linhas)).map("E{:07d}".format),
+        'UF': ufs,
+        'Regiao': regioes,
+    })
+
+    existentes = rng.integers(5, 1500, n_linhas)
+    em_uso = np.minimum(existentes, (existentes * rng.uniform(0.8, 1.05, n_linhas)).astype(int))
+    ate_30 = rng.uniform(15, 90, n_linhas).round(1)
+    entre_31_60 = ((100 - ate_30) * rng.uniform(0.2, 0.8, n_linhas)).round(1)
+
+    tabelas = {
+        'mortalidade': pd.DataFrame({
+            'UF': ufs, 'Regiao': regioes,
+            'Obitos': rng.integers(20, 5000, n_linhas),
+            'Taxa_bruta': rng.uniform(6, 26, n_linhas).round(1),
+            'Taxa_mortalidade_ajustada': rng.uniform(7, 16, n_linhas).round(1),
+        }),
+        'nunca_mamografia': pd.DataFrame({
+            'UF': ufs, 'Regiao': regioes,
+            'Percentual_nunca_fez_exame': rng.uniform(12, 54, n_linhas).round(1),
+        }),
+        'mamografos_uf': pd.DataFrame({
+            'UF': ufs,
+            'Mamografos_existentes': existentes,
+            'Mamografos_em_uso': em_uso,
+            'Utilização(%)': (em_uso / existentes * 100).round(2),
+        }),
+        'mamografos_sus': pd.DataFrame({
+            'UF': ufs,
+            'Mamografos_SUS': (existentes * rng.uniform(0.2, 0.8, n_linhas)).astype(int),
+        }),
+        'tempo_laudo': pd.DataFrame({
+            'UF': ufs, 'Regiao': regioes,
+            # Padrão brasileiro, como no arquivo real: "2.381" = 2381 exames
+            'Total_exames': pd.Series(rng.integers(2_000, 550_000, n_linhas)).map("{:,}".format).str.replace(",", "."),
+            'Ate_30_dias_%': ate_30,
+            '31_60_dias_%': entre_31_60,
+            'Mais_60_dias_%': (100 - ate_30 - entre_31_60).round(1),
+        }),
+        'casos': pd.DataFrame({
+            'UF': ufs, 'Regiao': regioes,
+            'Numero_casos': rng.integers(60, 20_000, n_linhas),
+        }),
+    }
+
+    # Como nos arquivos reais, as fontes não compartilham a mesma ordem de linhas
+    tabelas['nunca_mamografia'] = tabelas['nunca_mamografia'].sample(frac=1, random_state=seed)
+
+    for nome, tabela in tabelas.items():
+        tabela.to_csv(os.path.join(destino, carga_dados.ARQUIVOS_FONTE[nome]), index=False)
+
+    return dimensao
+
+def medir(etapa, funcao, resultados, repeticoes=3):
+    """Mede o menor tempo de parede entre as repetições e o pico de memória alocada.
+
+    O pico vem de uma execução separada, porque o tracemalloc distorce o tempo.
+    """
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        retorno = funcao()
+        tempos.append(time.perf_counter() - inicio)
+
+    tracemalloc.start()
+    funcao()
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    resultados[etapa] = {'segundos': min(tempos), 'pico_mb': pico / 2**20}
+    return retorno
+
+def memoria_tabelas(destino, dimensao):
+    """Memória (MB) de cada fonte e do consolidado, com o esquema declarado e com inferência de tipos"""
+    fontes = carga_dados.ler_fontes(destino)
+    inferidas = {
+        nome: pd.read_csv(os.path.join(destino, arquivo)) for nome, arquivo in carga_dados.ARQUIVOS_FONTE.items()
+    }
+    return {
+        'esquema': carga_dados.relatorio_memoria({**fontes, 'consolidado': carga_dados.consolidar_dados(fontes, dimensao)}),
+        'inferido': carga_dados.relatorio_memoria(inferidas),
+    }
+
+def executar_benchmark(n_linhas, seed=0):
+    """Mede as etapas do pipeline sobre dados sintéticos de n_linhas entidades.
+
+    Retorna (tempos e picos por etapa, memória por tabela).
+    """
+    resultados = {}
+    with tempfile.TemporaryDirectory() as destino:
+        dimensao = gerar_dados_sinteticos(n_linhas, destino, seed)
+
+        dados = medir(
+            'carregar_dados_csv',
+            lambda: carga_dados.consolidar_dados(carga_dados.ler_fontes(destino), dimensao),
+            resultados
+        )
+        medir('salvar_snapshot', lambda: carga_dados.salvar_snapshot(dados, "benchmark", destino), resultados)
+        dados = medir('carregar_snapshot', lambda: carga_dados.carregar_snapshot("benchmark", destino), resultados)
+
+        dados_score = medir('calcular_score_criticidade', lambda: score.calcular_score_criticidade(dados), resultados)
+        scores = score.aplicar_score(dados)
+        medir('top_k_criticidade', lambda: ranking.top_k_criticidade(scores), resultados)
+        medir('posicoes_ranking', lambda: ranking.construir_posicoes(scores), resultados)
+        indices = medir('indices_ranking', lambda: ranking.construir_indices(dados_score), resultados)
+        medir('filtros_ranking', lambda: ranking.filtrar_ranking(dados_score, 'Sul', 'Alto (60-79)', indices), resultados)
+        medir('tabela_criticidade', lambda: ranking.montar_tabela(dados_score, dados_score['UF'].iloc[0]), resultados)
+
+        memoria = memoria_tabelas(destino, dimensao)
+
+    return resultados, memoria
+
+def comparar(atual, baseline, tolerancia, folga=0.005):
+    """Lista as etapas cujo tempo excede tolerancia x o tempo da baseline (e a folga absoluta, em s)"""
+    regressoes = []
+    for n_linhas, etapas in atual.items():
+        for etapa, medida in etapas.items():
+            referencia = baseline.get(n_linhas, {}).get(etapa)
+            if referencia and medida['segundos'] > max(referencia['segundos'] * tolerancia, referencia['segundos'] + folga):
+                regressoes.append((n_linhas, etapa, referencia['segundos'], medida['segundos']))
+    return regressoes
+
+# Executar benchmark
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark do pipeline com dados sintéticos")
+    parser.add_argument("--linhas", type=int, nargs="+", default=TAMANHOS_PADRAO)
+    parser.add_argument("--saida", default=None,
+                        help="JSON onde os resultados são gravados (padrão: a baseline; com --comparar, benchmarks/atual.json)")
+    parser.add_argument("--comparar", default=None, help="JSON de baseline para detectar regressões")
+    parser.add_argument("--tolerancia", type=float, default=1.5)
+    args = parser.parse_args()
+
+    # A baseline é lida antes da execução, e nunca é o arquivo de saída (senão se compararia consigo mesma)
+    baseline = None
+    if args.comparar:
+        args.saida = args.saida or CAMINHO_ATUAL
+        if os.path.abspath(args.saida) == os.path.abspath(args.comparar):
+            parser.error("--saida e --comparar apontam para o mesmo arquivo")
+        baseline = carga_dados.ler_json(args.comparar).get('resultados')
+        if not baseline:
+            parser.error(f"Baseline sem resultados ou inexistente: {args.comparar}")
+    args.saida = args.saida or CAMINHO_BASELINE
+
+    resultados, memoria = {}, {}
+    for n_linhas in args.linhas:
+        print(f"⏱️  {n_linhas:,} linhas...")
+        resultados[str(n_linhas)], memoria[str(n_linhas)] = executar_benchmark(n_linhas)
+        for etapa, medida in resultados[str(n_linhas)].items():
+            print(f"   {etapa:.<30} {medida['segundos'] * 1000:>10.1f} ms | pico {medida['pico_mb']:>8.1f} MB")
+        for nome, mb in memoria[str(n_linhas)]['esquema'].items():
+            inferido = memoria[str(n_linhas)]['inferido'].get(nome)
+            comparacao = f" (inferido: {inferido:.1f} MB)" if inferido is not None else ""
+            print(f"   memória {nome:.<22} {mb:>10.1f} MB{comparacao}")
+
+    saida = {
+        'ambiente': {
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+            'plataforma': platform.platform(),
+        },
+        'resultados': resultados,
+        'memoria_mb': memoria,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.saida)), exist_ok=True)
+    with open(args.saida, "w", encoding="utf-8") as f:
+        json.dump(saida, f, indent=2)
+    print(f"Resultados salvos em {args.saida}")
+
+    if baseline is not None:
+        regressoes = comparar(resultados, baseline, args.tolerancia)
+        for n_linhas, etapa, antes, depois in regressoes:
+            print(f"🚨 REGRESSÃO {n_linhas} linhas / {etapa}: {antes * 1000:.1f} ms -> {depois * 1000:.1f} ms")
+        sys.exit(1 if regressoes else 0)
@@ -0,0 +1,382 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+import localidades
+
+try:
+    import pyarrow.feather as feather
+except ImportError:  # pyarrow é opcional: sem ele o snapshot é desativado e os CSVs são lidos sempre
+    feather = None
+
+# Versão do esquema do DataFrame consolidado: entra no hash para invalidar snapshots e agregados
+VERSAO_ESQUEMA = "4"
+
+# Diretórios configuráveis por variável de ambiente
+DIRETORIO_DADOS = os.environ.get("CANCER_MAMA_DADOS", os.path.dirname(os.path.abspath(__file__)))
+DIRETORIO_CACHE = os.environ.get("CANCER_MAMA_CACHE")
+
+# Arquivos de origem do DataFrame consolidado
+ARQUIVOS_FONTE = {
+    'mortalidade': "mortalidade_tabela2.csv",
+    'nunca_mamografia': "nunca_mamografia_fig15.csv",
+    'mamografos_uf': "mamografos_regiao_tabela10_total.csv",
+    'mamografos_sus': "mamografos_regiao_tabela11_SUS.csv",
+    'tempo_laudo': "tempo_laudo_rastreamento_tabela9.csv",
+    'casos': "numero_casos_tabela1.csv",
+}
+
+# Esquema declarado de cada fonte: tipo de cada coluna, aplicado na própria leitura (sem inferência)
+ESQUEMAS = {
+    'mortalidade': {
+        'UF': 'str', 'Regiao': 'category', 'Obitos': 'int32',
+        'Taxa_bruta': 'float32', 'Taxa_mortalidade_ajustada': 'float32',
+    },
+    'nunca_mamografia': {
+        'UF': 'str', 'Regiao': 'category', 'Percentual_nunca_fez_exame': 'float32',
+    },
+    'mamografos_uf': {
+        'UF': 'str', 'Mamografos_existentes': 'int32', 'Mamografos_em_uso': 'int32',
+        'Utilização(%)': 'float32',
+    },
+    'mamografos_sus': {
+        'UF': 'str', 'Mamografos_SUS': 'int32',
+    },
+    'tempo_laudo': {
+        'UF': 'str', 'Regiao': 'category', 'Total_exames': 'int32',
+        'Ate_30_dias_%': 'float32', '31_60_dias_%': 'float32', 'Mais_60_dias_%': 'float32',
+    },
+    'casos': {
+        'UF': 'str', 'Regiao': 'category', 'Numero_casos': 'int32',
+    },
+}
+
+# Colunas que cada fonte fornece ao DataFrame consolidado, na ordem em que entram
+# (UF e Regiao vêm da dimensão de localidades)
+COLUNAS_CONSOLIDADO = {
+    'mortalidade': ['Obitos', 'Taxa_bruta', 'Taxa_mortalidade_ajustada'],
+    'nunca_mamografia': ['Percentual_nunca_fez_exame'],
+    'tempo_laudo': ['Total_exames', 'Ate_30_dias_%', '31_60_dias_%', 'Mais_60_dias_%'],
+    'mamografos_uf': ['Utilizacao_%'],
+    'mamografos_sus': ['Mamografos_SUS'],
+    'casos': ['Numero_casos'],
+}
+
+# Colunas renomeadas ao entrar no consolidado
+RENOMEAR_COLUNAS = {'Utilização(%)': 'Utilizacao_%'}
+
+def casos_por_obito(dados):
+    """Casos novos por óbito (razão incidência/mortalidade), com 2 casas"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        razao = dados['Numero_casos'].to_numpy(dtype=float) / dados['Obitos'].to_numpy(dtype=float)
+    return np.where(np.isfinite(razao), razao, np.nan).round(2).astype('float32')
+
+# Colunas derivadas do consolidado: colunas de que dependem e função que as calcula
+COLUNAS_DERIVADAS = {
+    'Casos_por_obito': {'depende': ['Numero_casos', 'Obitos'], 'calcular': casos_por_obito},
+}
+
+# Colunas gravadas no padrão brasileiro, com '.' como separador de milhar ("2.381" = 2381)
+COLUNAS_MILHAR = {
+    'tempo_laudo': ['Total_exames'],
+}
+
+def diretorio_cache(base_path=DIRETORIO_DADOS):
+    """Retorna o diretório onde ficam os snapshots e o manifesto"""
+    return DIRETORIO_CACHE or os.path.join(base_path, ".cache")
+
+def _converter_milhar(tabela, colunas, esquema):
+    """Converte colunas lidas como texto no padrão "2.381" para o tipo declarado"""
+    for coluna in colunas:
+        if coluna in tabela:
+            numeros = pd.to_numeric(tabela[coluna].str.replace(".", "", regex=False))
+            tabela[coluna] = numeros.astype(esquema[coluna]) if numeros.notna().all() else numeros
+    return tabela
+
+def ler_csv(caminho, fonte, tamanho_bloco=None, anulavel=False):
+    """Lê um CSV de origem aplicando o esquema declarado da fonte.
+
+    Colunas fora do esquema são ignoradas. Com anulavel=True os inteiros usam o tipo
+    com suporte a ausentes (Int32), para que a validação consiga contar os vazios.
+    Com tamanho_bloco retorna um iterador de blocos.
+    """
+    esquema = ESQUEMAS[fonte]
+    milhar = COLUNAS_MILHAR.get(fonte, [])
+    tipos = {
+        coluna: 'string' if coluna in milhar else tipo.capitalize() if anulavel and tipo.startswith('int') else tipo
+        for coluna, tipo in esquema.items()
+    }
+    leitura = pd.read_csv(caminho, dtype=tipos, usecols=lambda coluna: coluna in esquema, chunksize=tamanho_bloco)
+    if tamanho_bloco is None:
+        return _converter_milhar(leitura, milhar, esquema)
+    return (_converter_milhar(bloco, milhar, esquema) for bloco in leitura)
+
+def ler_fontes(base_path=DIRETORIO_DADOS):
+    """Lê os CSVs de origem (com o esquema declarado) e retorna um dicionário nome -> DataFrame"""
+    return {
+        nome: ler_csv(os.path.join(base_path, arquivo), nome)
+        for nome, arquivo in ARQUIVOS_FONTE.items()
+    }
+
+def para_float64(dados):
+    """Converte as colunas float32 para float64 pelo decimal mais próximo (8.4, e não 8.3999996).
+
+    Usado onde os valores saem para cálculo ou exibição; em memória os dados ficam em float32.
+    Os valores são arredondados a 6 algarismos significativos, a precisão garantida do float32.
+    """
+    convertidas = {}
+    for coluna in dados.columns[(dados.dtypes == 'float32').to_numpy()]:
+        valores = dados[coluna].to_numpy(dtype='float64')
+        with np.errstate(divide='ignore', invalid='ignore'):
+            casas = 5 - np.floor(np.log10(np.abs(valores)))
+        escala = 10.0 ** np.where(np.isfinite(casas), casas, 0)
+        convertidas[coluna] = np.round(valores * escala) / escala
+    return dados.assign(**convertidas) if convertidas else dados
+
+def memoria_mb(tabela):
+    """Memória ocupada por um DataFrame em MB (incluindo o conteúdo dos textos)"""
+    return float(tabela.memory_usage(deep=True).sum()) / 2**20
+
+def relatorio_memoria(tabelas):
+    """Memória (MB) de cada tabela de um dicionário nome -> DataFrame"""
+    return {nome: memoria_mb(tabela) for nome, tabela in tabelas.items()}
+
+def codificar_fontes(fontes, tabela_localidades=None):
+    """Troca UF/Regiao de cada fonte pelo código IBGE inteiro (Cod_IBGE).
+
+    Levanta ValueError listando, por fonte, os nomes que não estão na dimensão de
+    localidades, em vez de deixá-los virar NaN silenciosamente nos merges.
+    """
+    codificadas, divergencias = {}, {}
+    for nome, tabela in fontes.items():
+        codigos, desconhecidas = localidades.codificar_localidades(tabela['UF'], tabela_localidades)
+        if desconhecidas:
+            divergencias[nome] = desconhecidas
+        codificadas[nome] = tabela.drop(columns=['UF', 'Regiao'], errors='ignore').assign(Cod_IBGE=codigos)
+
+    if divergencias:
+        detalhes = "; ".join(f"{nome}: {', '.join(nomes)}" for nome, nomes in divergencias.items())
+        raise ValueError(f"Localidades não reconhecidas - {detalhes}")
+
+    return {nome: tabela.astype({'Cod_IBGE': 'int32'}) for nome, tabela in codificadas.items()}
+
+def derivar_colunas(dados, colunas=None):
+    """Calcula as colunas derivadas (todas, ou só as pedidas) sobre o consolidado"""
+    colunas = COLUNAS_DERIVADAS if colunas is None else colunas
+    return dados.assign(**{coluna: COLUNAS_DERIVADAS[coluna]['calcular'](dados) for coluna in colunas})
+
+def consolidar_dados(fontes, tabela_localidades=None):
+    """Junta as tabelas de origem no DataFrame usado pelo dashboard.
+
+    Os merges usam a chave inteira Cod_IBGE; nome, sigla e região vêm da dimensão
+    de localidades, na ordem de linhas da tabela de mortalidade.
+    """
+    if tabela_localidades is None:
+        tabela_localidades = localidades.tabela_localidades()
+    tabela_localidades = tabela_localidades.astype({'Regiao': 'category'})
+    fontes = codificar_fontes(fontes, tabela_localidades)
+
+    # Consolidar pelo código IBGE (validate detecta localidades duplicadas)
+    dados = fontes['mortalidade'][['Cod_IBGE']].merge(tabela_localidades, on='Cod_IBGE', how='left')
+    for nome, colunas in COLUNAS_CONSOLIDADO.items():
+        tabela = fontes[nome].rename(columns=RENOMEAR_COLUNAS)[['Cod_IBGE', *colunas]]
+        dados = dados.merge(tabela, on='Cod_IBGE', how='left', validate='one_to_one')
+
+    return derivar_colunas(dados)
+
+def ler_json(caminho):
+    """Lê um arquivo JSON; retorna {} se não existir ou estiver corrompido"""
+    try:
+        with open(caminho, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _gravar_atomico(caminho, escrever):
+    """Grava via arquivo temporário + os.replace para nunca expor arquivo parcial"""
+    temporario = f"{caminho}.{os.getpid()}.tmp"
+    try:
+        escrever(temporario)
+        os.replace(temporario, caminho)
+    finally:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+
+def hash_arquivo(caminho):
+    """Hash de conteúdo de um CSV (16 caracteres)"""
+    h = hashlib.sha256()
+    with open(caminho, "rb") as f:
+        for bloco in iter(lambda: f.read(1 << 20), b""):
+            h.update(bloco)
+    return h.hexdigest()[:16]
+
+def versao_conteudo(hashes):
+    """Versão dos dados: hash do esquema e dos hashes de cada fonte ({fonte: hash_arquivo}).
+
+    É a única definição de versão: hash_fontes e o pipeline incremental chegam ao mesmo id,
+    e snapshots, agregados e posições em cache são compartilhados entre eles.
+    """
+    conteudo = VERSAO_ESQUEMA + "".join(f"{nome}={hashes[nome]};" for nome in sorted(hashes))
+    return hashlib.sha256(conteudo.encode("utf-8")).hexdigest()[:16]
+
+def hash_fontes(base_path=DIRETORIO_DADOS):
+    """Calcula a versão (versao_conteudo) dos CSVs de origem.
+
+    O hash só é recalculado quando mtime ou tamanho de algum arquivo muda;
+    caso contrário é reaproveitado do manifesto em cache.
+    """
+    assinatura = {}
+    for nome, arquivo in sorted(ARQUIVOS_FONTE.items()):
+        info = os.stat(os.path.join(base_path, arquivo))
+        assinatura[nome] = [info.st_mtime_ns, info.st_size]
+
+    cache = diretorio_cache(base_path)
+    caminho_manifesto = os.path.join(cache, "manifesto.json")
+    manifesto = ler_json(caminho_manifesto)
+    if manifesto.get('assinatura') == assinatura and manifesto.get('esquema') == VERSAO_ESQUEMA:
+        return manifesto['hash']
+
+    versao = versao_conteudo({
+        nome: hash_arquivo(os.path.join(base_path, arquivo)) for nome, arquivo in ARQUIVOS_FONTE.items()
+    })
+
+    try:
+        os.makedirs(cache, exist_ok=True)
+
+        def escrever(caminho):
+            with open(caminho, "w", encoding="utf-8") as f:
+                json.dump({'hash': versao, 'assinatura': assinatura, 'esquema': VERSAO_ESQUEMA}, f)
+
+        _gravar_atomico(caminho_manifesto, escrever)
+    except OSError:
+        pass  # Diretório somente leitura: segue sem manifesto
+
+    return versao
+
+def caminho_snapshot(versao, base_path=DIRETORIO_DADOS):
+    """Caminho do snapshot Feather de uma versão dos dados"""
+    return os.path.join(diretorio_cache(base_path), f"dados_{versao}.feather")
+
+def salvar_snapshot(dados, versao, base_path=DIRETORIO_DADOS):
+    """Persiste o DataFrame consolidado em Feather (Arrow IPC) sem compressão e remove versões antigas"""
+    if feather is None:
+        return None
+
+    cache = diretorio_cache(base_path)
+    caminho = caminho_snapshot(versao, base_path)
+    try:
+        os.makedirs(cache, exist_ok=True)
+        # Sem compressão para permitir leitura por memory-mapping
+        _gravar_atomico(caminho, lambda tmp: feather.write_feather(dados, tmp, compression="uncompressed"))
+        for arquivo in os.listdir(cache):
+            if arquivo.startswith("dados_") and arquivo.endswith(".feather") and arquivo != os.path.basename(caminho):
+                os.remove(os.path.join(cache, arquivo))
+    except OSError:
+        return None
+
+    return caminho
+
+def carregar_snapshot(versao, base_path=DIRETORIO_DADOS):
+    """Lê o snapshot de uma versão via memory-mapping; retorna None se não existir.
+
+    As colunas numéricas sem nulos são views somente leitura sobre o arquivo
+    mapeado (sem cópia), compartilhadas via page cache entre processos.
+    """
+    if feather is None:
+        return None
+
+    caminho = caminho_snapshot(versao, base_path)
+    if not os.path.exists(caminho):
+        return None
+
+    try:
+        tabela = feather.read_table(caminho, memory_map=True)
+    except OSError:
+        return None
+    return tabela.to_pandas(split_blocks=True)
+
+def carregar_dados(base_path=DIRETORIO_DADOS, versao=None):
+    """Carrega o DataFrame consolidado, usando o snapshot colunar quando válido"""
+    if versao is None:
+        versao = hash_fontes(base_path)
+
+    dados = carregar_snapshot(versao, base_path)
+    if dados is not None:
+        return dados
+
+    dados = consolidar_dados(ler_fontes(base_path))
+    if salvar_snapshot(dados, versao, base_path):
+        # Relê o snapshot para que todos os processos compartilhem o mesmo mapeamento
+        return carregar_snapshot(versao, base_path)
+    return dados
+
+def construir_indice_estados(dados, chave='UF'):
+    """Constrói o índice de acesso O(1) por UF.
+
+    Retorna {'posicao': {uf: linha}, 'registro': {uf: {coluna: valor}}}, montado
+    uma vez por versão dos dados para substituir as buscas dados[dados['UF'] == uf].
+    """
+    registros = para_float64(dados).to_dict('records')
+    return {
+        'posicao': {registro[chave]: linha for linha, registro in enumerate(registros)},
+        'registro': {registro[chave]: registro for registro in registros},
+    }
+
+# Colunas numéricas com médias e somas pré-calculadas (posições e percentis: ranking.construir_posicoes)
+COLUNAS_AGREGADAS = [
+    'Obitos', 'Taxa_bruta', 'Taxa_mortalidade_ajustada', 'Percentual_nunca_fez_exame',
+    'Ate_30_dias_%', '31_60_dias_%', 'Mais_60_dias_%', 'Utilizacao_%', 'Mamografos_SUS',
+    'Numero_casos', 'Casos_por_obito', 'Score_Consolidado',
+]
+
+def calcular_agregados(dados, chave='UF', regiao='Regiao'):
+    """Calcula médias e somas nacionais e médias por região de uma vez"""
+    colunas = [coluna for coluna in COLUNAS_AGREGADAS if coluna in dados.columns]
+    numericas = para_float64(dados[colunas]).set_index(dados[chave])
+    regioes = dados[regiao].to_numpy()
+
+    return {
+        'n': len(dados),
+        'media': numericas.mean().to_dict(),
+        'soma': numericas.sum().to_dict(),
+        'media_regiao': numericas.groupby(regioes).mean().to_dict(),
+    }
+
+def caminho_agregados(versao, base_path=DIRETORIO_DADOS):
+    """Arquivo JSON com os agregados de uma versão.
+
+    Os agregados incluem o Score_Consolidado: a chave leva também a assinatura dos pesos e faixas
+    do score, para que mudar PESOS_PADRAO não reaproveite médias calculadas com os pesos antigos.
+    """
+    import score  # score importa carga_dados: importado só aqui para evitar o ciclo
+    return os.path.join(diretorio_cache(base_path), f"agregados_{versao}_{score.assinatura_parametros()}.json")
+
+def carregar_agregados(dados, versao, base_path=DIRETORIO_DADOS):
+    """Retorna os agregados da versão, lendo-os do cache em disco ou calculando e persistindo"""
+    agregados = ler_json(caminho_agregados(versao, base_path))
+    if agregados:
+        return agregados
+
+    agregados = calcular_agregados(dados)
+    salvar_agregados(agregados, versao, base_path)
+    return agregados
+
+def salvar_agregados(agregados, versao, base_path=DIRETORIO_DADOS):
+    """Persiste agregados já calculados (ex.: os mantidos pelo pipeline) e remove versões antigas"""
+    caminho = caminho_agregados(versao, base_path)
+    try:
+        os.makedirs(diretorio_cache(base_path), exist_ok=True)
+
+        def escrever(temporario):
+            with open(temporario, "w", encoding="utf-8") as f:
+                json.dump(agregados, f, ensure_ascii=False)
+
+        _gravar_atomico(caminho, escrever)
+        for arquivo in os.listdir(diretorio_cache(base_path)):
+            if arquivo.startswith("agregados_") and arquivo != os.path.basename(caminho):
+                os.remove(os.path.join(diretorio_cache(base_path), arquivo))
+    except OSError:
+        pass  # Sem cache em disco: os agregados ainda ficam em memória
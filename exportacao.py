@@ -0,0 +1,140 @@
+import argparse
+import io
+import re
+import time
+
+import openpyxl
+
+import carga_dados
+import incerteza
+import localidades
+import ranking
+import score
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Sem pyarrow a exportação em Parquet fica indisponível
+    pa = pq = None
+
+# Linhas por bloco: a tabela exportada nunca é montada inteira, só um bloco por vez
+LINHAS_POR_BLOCO = 50_000
+
+# Colunas da tabela de exibição que não fazem sentido fora do dashboard
+COLUNAS_OMITIDAS = ['📍']
+
+# Nome da planilha no XLSX
+PLANILHA_RANKING = "Ranking"
+
+def blocos_ranking(dados_score, intervalos=None, linhas_por_bloco=LINHAS_POR_BLOCO):
+    """Tabela do ranking (ranking.montar_tabela) em blocos de linhas, com as posições contínuas entre blocos.
+
+    Sempre gera ao menos um bloco (vazio se não houver linhas), para o cabeçalho ser gravado.
+    """
+    for inicio in range(0, max(len(dados_score), 1), linhas_por_bloco):
+        bloco = ranking.montar_tabela(dados_score.iloc[inicio:inicio + linhas_por_bloco], intervalos=intervalos,
+                                      primeira_posicao=inicio + 1)
+        yield bloco.drop(columns=COLUNAS_OMITIDAS)
+
+def escrever_csv(blocos, destino):
+    """CSV em UTF-8 com BOM (acentos corretos ao abrir no Excel), anexando um bloco por vez"""
+    destino.write("\ufeff".encode("utf-8"))
+    for n, bloco in enumerate(blocos):
+        destino.write(carga_dados.para_float64(bloco).to_csv(index=False, header=n == 0).encode("utf-8"))
+
+def escrever_xlsx(blocos, destino):
+    """XLSX no modo write-only do openpyxl: as linhas vão para o arquivo à medida que são anexadas"""
+    planilhas = openpyxl.Workbook(write_only=True)
+    planilha = planilhas.create_sheet(PLANILHA_RANKING)
+    planilha.freeze_panes = "A2"
+    for n, bloco in enumerate(blocos):
+        if n == 0:
+            planilha.append(list(bloco.columns))
+        # Células vazias no lugar de NaN (o Excel não aceita NaN como número)
+        valores = carga_dados.para_float64(bloco).astype(object)
+        for linha in valores.where(valores.notna(), None).itertuples(index=False, name=None):
+            planilha.append(linha)
+    planilhas.save(destino)
+
+def escrever_parquet(blocos, destino):
+    """Parquet com um row group por bloco; o esquema (tipos originais, float32 incluído) vem do primeiro bloco"""
+    escritor = None
+    try:
+        for bloco in blocos:
+            tabela = pa.Table.from_pandas(bloco, schema=None if escritor is None else escritor.schema,
+                                          preserve_index=False)
+            if escritor is None:
+                escritor = pq.ParquetWriter(destino, tabela.schema)
+            escritor.write_table(tabela)
+    finally:
+        if escritor is not None:
+            escritor.close()
+
+# Formatos de exportação: extensão, tipo MIME e função de escrita (blocos, arquivo binário)
+FORMATOS = {
+    'csv': {'extensao': "csv", 'mime': "text/csv", 'escrever': escrever_csv},
+    'xlsx': {
+        'extensao': "xlsx",
+        'mime': "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        'escrever': escrever_xlsx,
+    },
+    'parquet': {'extensao': "parquet", 'mime': "application/vnd.apache.parquet", 'escrever': escrever_parquet},
+}
+
+def formatos_disponiveis():
+    """Formatos que podem ser exportados neste ambiente (Parquet exige pyarrow)"""
+    return [formato for formato in FORMATOS if formato != 'parquet' or pq is not None]
+
+def exportar_ranking(dados_score, formato, destino, intervalos=None, linhas_por_bloco=LINHAS_POR_BLOCO):
+    """Grava a tabela do ranking (já filtrada) em destino: caminho (gravação atômica) ou arquivo binário aberto"""
+    if formato not in formatos_disponiveis():
+        raise ValueError(f"Formato indisponível: {formato} (use {', '.join(formatos_disponiveis())})")
+    escrever = FORMATOS[formato]['escrever']
+    blocos = blocos_ranking(dados_score, intervalos, linhas_por_bloco)
+
+    if not isinstance(destino, str):
+        return escrever(blocos, destino)
+
+    def gravar(temporario):
+        with open(temporario, "wb") as arquivo:
+            escrever(blocos, arquivo)
+    carga_dados._gravar_atomico(destino, gravar)
+
+def exportar_bytes(dados_score, formato, intervalos=None):
+    """Conteúdo exportado em memória (para o botão de download do dashboard)"""
+    buffer = io.BytesIO()
+    exportar_ranking(dados_score, formato, buffer, intervalos)
+    return buffer.getvalue()
+
+def nome_arquivo(formato, regiao_filtro='Todas', nivel_criticidade='Todos'):
+    """Nome do arquivo exportado, com os filtros aplicados (ex.: ranking_criticidade_sul_alto.xlsx)"""
+    partes = ["ranking_criticidade"]
+    if regiao_filtro != 'Todas':
+        partes.append(regiao_filtro)
+    if nivel_criticidade != 'Todos':
+        partes.append(nivel_criticidade.split(" (")[0])
+    nome = re.sub(r"[^a-z0-9]+", "_", localidades.normalizar_nome(" ".join(partes)))
+    return f"{nome}.{FORMATOS[formato]['extensao']}"
+
+# Exportar o ranking filtrado
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Exporta o ranking de criticidade filtrado em CSV, XLSX ou Parquet")
+    parser.add_argument("--formato", choices=list(FORMATOS), default="xlsx")
+    parser.add_argument("--regiao", default="Todas", help="Região (Norte, Nordeste, ...) ou Todas")
+    parser.add_argument("--criticidade", choices=ranking.NIVEIS_FILTRO, default="Todos")
+    parser.add_argument("--incerteza", action="store_true", help="Inclui o intervalo de 95%% da posição (bootstrap)")
+    parser.add_argument("--dados", default=carga_dados.DIRETORIO_DADOS, help="Diretório dos CSVs")
+    parser.add_argument("--saida", default=None, help="Arquivo de saída (padrão: nome com os filtros)")
+    parser.add_argument("--bloco", type=int, default=LINHAS_POR_BLOCO, help="Linhas por bloco")
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    dados = carga_dados.carregar_dados(args.dados)
+    dados_score = ranking.filtrar_ranking(score.calcular_score_criticidade(dados), args.regiao, args.criticidade)
+    intervalos = None
+    if args.incerteza:
+        intervalos = incerteza.bootstrap_criticidade(dados)
+
+    saida = args.saida or nome_arquivo(args.formato, args.regiao, args.criticidade)
+    exportar_ranking(dados_score, args.formato, saida, intervalos, args.bloco)
+    print(f"{len(dados_score)} linhas exportadas em {saida} ({time.perf_counter() - inicio:.2f} s)")
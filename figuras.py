@@ -0,0 +1,177 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import plotly.graph_objects as go
+
+import carga_dados
+
+# Tamanho máximo do cache de figuras (entradas); as menos usadas são descartadas
+TAMANHO_CACHE_FIGURAS = 256
+
+_cache_figuras = OrderedDict()
+_estatisticas = {'hits': 0, 'misses': 0, 'descartes': 0}
+_trava = threading.Lock()
+
+def figura_mortalidade(dados, agregados, estado_selecionado):
+    """Barras horizontais com a taxa de mortalidade ajustada de todos os estados"""
+    fig = go.Figure()
+
+    dados_ordenados = carga_dados.para_float64(dados[['UF', 'Taxa_mortalidade_ajustada']]).sort_values(
+        'Taxa_mortalidade_ajustada', ascending=True
+    )
+    ufs = dados_ordenados['UF'].to_numpy()
+
+    # Barras para todos os estados
+    fig.add_trace(go.Bar(
+        y=ufs,
+        x=dados_ordenados['Taxa_mortalidade_ajustada'].to_numpy(),
+        orientation='h',
+        marker_color=np.where(ufs == estado_selecionado, 'red', 'lightgray'),
+        name='Taxa de Mortalidade'
+    ))
+
+    fig.add_vline(x=agregados['media']['Taxa_mortalidade_ajustada'], line_dash="dash", line_color="blue", annotation_text="Média BR")
+    fig.add_vline(x=13.0, line_dash="dash", line_color="red", annotation_text="Limite Crítico")
+
+    fig.update_layout(
+        height=400,
+        title="Comparação da Taxa de Mortalidade entre Estados",
+        xaxis_title="Taxa de Mortalidade Ajustada (por 100 mil mulheres)",
+        showlegend=False
+    )
+
+    return fig
+
+def figura_tempo_laudo(estado_data):
+    """Pizza com a distribuição do tempo para emissão de laudos do estado"""
+    fig = go.Figure()
+
+    fig.add_trace(go.Pie(
+        labels=['Até 30 dias', '31-60 dias', 'Mais de 60 dias'],
+        values=[estado_data['Ate_30_dias_%'], estado_data['31_60_dias_%'], estado_data['Mais_60_dias_%']],
+        marker_colors=['green', 'orange', 'red'],
+        hole=0.4,
+        textinfo='percent+label'
+    ))
+
+    fig.update_layout(
+        height=400,
+        title="Distribuição do Tempo para Emissão de Laudos",
+        annotations=[dict(text='Tempo<br>Laudo', x=0.5, y=0.5, font_size=20, showarrow=False)]
+    )
+
+    return fig
+
+def figura_consolidada(estado_data, agregados, estado_selecionado):
+    """Radar com os principais indicadores do estado e a média Brasil"""
+    categorias = ['Mortalidade', 'Não Rastreadas', 'Laudos Lentos']
+    valores = [
+        min(estado_data['Taxa_mortalidade_ajustada'] / 20 * 100, 100),
+        estado_data['Percentual_nunca_fez_exame'],
+        estado_data['Mais_60_dias_%']
+    ]
+
+    fig = go.Figure()
+
+    fig.add_trace(go.Scatterpolar(
+        r=valores + [valores[0]],  # Fechar o radar
+        theta=categorias + [categorias[0]],
+        fill='toself',
+        name=estado_selecionado,
+        line=dict(color='red')
+    ))
+
+    # Adicionar média BR como referência
+    valores_media = [
+        min(agregados['media']['Taxa_mortalidade_ajustada'] / 20 * 100, 100),
+        agregados['media']['Percentual_nunca_fez_exame'],
+        agregados['media']['Mais_60_dias_%']
+    ]
+
+    fig.add_trace(go.Scatterpolar(
+        r=valores_media + [valores_media[0]],
+        theta=categorias + [categorias[0]],
+        fill='toself',
+        name='Média Brasil',
+        line=dict(color='blue')
+    ))
+
+    fig.update_layout(
+        polar=dict(
+            radialaxis=dict(
+                visible=True,
+                range=[0, 100]
+            )),
+        showlegend=True,
+        height=300
+    )
+
+    return fig
+
+def figura_tendencia(tendencia, estado_selecionado, titulo, eixo_y):
+    """Linhas com a evolução anual do estado e da média Brasil"""
+    fig = go.Figure()
+
+    fig.add_trace(go.Scatter(
+        x=tendencia['Ano'], y=tendencia['Estado'],
+        mode='lines+markers', name=estado_selecionado, line=dict(color='red')
+    ))
+    fig.add_trace(go.Scatter(
+        x=tendencia['Ano'], y=tendencia['Media_BR'],
+        mode='lines+markers', name='Média Brasil', line=dict(color='blue', dash='dash')
+    ))
+
+    fig.update_layout(
+        height=350,
+        title=titulo,
+        xaxis=dict(title="Ano", dtick=1),
+        yaxis_title=eixo_y
+    )
+
+    return fig
+
+def obter_figura(versao, visao, estado, construir):
+    """Retorna a figura (versao, visao, estado), construindo-a só em caso de miss.
+
+    O cache é LRU e limitado a TAMANHO_CACHE_FIGURAS entradas, compartilhado
+    entre sessões do processo. Guarda o próprio go.Figure, já validado na
+    construção: o st.plotly_chart só o serializa, sem revalidar como faria
+    com um dict/JSON. A figura é compartilhada e não deve ser alterada.
+    """
+    chave = (versao, visao, estado)
+    with _trava:
+        figura = _cache_figuras.get(chave)
+        if figura is not None:
+            _cache_figuras.move_to_end(chave)
+            _estatisticas['hits'] += 1
+            return figura
+        _estatisticas['misses'] += 1
+
+    figura = construir()
+
+    with _trava:
+        _cache_figuras[chave] = figura
+        _cache_figuras.move_to_end(chave)
+        while len(_cache_figuras) > TAMANHO_CACHE_FIGURAS:
+            _cache_figuras.popitem(last=False)
+            _estatisticas['descartes'] += 1
+
+    return figura
+
+def estatisticas_cache():
+    """Contadores de hits/misses e ocupação do cache de figuras"""
+    with _trava:
+        consultas = _estatisticas['hits'] + _estatisticas['misses']
+        return {
+            **_estatisticas,
+            'entradas': len(_cache_figuras),
+            'taxa_acerto': _estatisticas['hits'] / consultas if consultas else 0.0,
+        }
+
+def limpar_cache():
+    """Esvazia o cache de figuras e zera os contadores"""
+    with _trava:
+        _cache_figuras.clear()
+        for contador in _estatisticas:
+            _estatisticas[contador] = 0
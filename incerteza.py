@@ -0,0 +1,138 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import carga_dados
+import score
+
+# Tamanho amostral efetivo assumido por UF na PNS 2019 (mulheres de 50 a 69 anos). A tabela
+# publicada traz só o percentual, então o erro amostral é aproximado por uma binomial com este n
+AMOSTRA_PNS = 600
+
+# Replicações padrão e quantas são avaliadas de uma vez (uma matriz replicações x entidades por lote)
+N_REPLICAS = 20_000
+TAMANHO_LOTE = 2_000
+
+# Acima deste total de elementos (replicações x entidades) os lotes são divididos entre processos
+LIMIAR_PROCESSOS = 5_000_000
+
+# Histograma dos scores: 0 a 100 em passos de 0,1 (mesma resolução exibida no dashboard)
+PASSOS_SCORE = 1001
+
+# Nível dos intervalos (95%)
+QUANTIS = {'p025': 0.025, 'mediana': 0.5, 'p975': 0.975}
+
+def indicadores_base(dados, amostra_pns=AMOSTRA_PNS):
+    """Contagens e taxas observadas de onde as replicações são sorteadas (arrays por entidade)"""
+    valores = carga_dados.para_float64(dados[[
+        'Obitos', 'Taxa_mortalidade_ajustada', 'Percentual_nunca_fez_exame', 'Total_exames', 'Mais_60_dias_%',
+    ]])
+    return {
+        'obitos': valores['Obitos'].to_numpy(),
+        'taxa': valores['Taxa_mortalidade_ajustada'].to_numpy(),
+        'nunca': valores['Percentual_nunca_fez_exame'].to_numpy() / 100,
+        'amostra_pns': np.full(len(valores), amostra_pns, dtype=np.int64),
+        'exames': valores['Total_exames'].to_numpy().astype(np.int64),
+        'lentos': valores['Mais_60_dias_%'].to_numpy() / 100,
+    }
+
+def reamostrar(base, n_replicas, rng):
+    """Sorteia n_replicas conjuntos de indicadores (replicações x entidades x indicadores de score.INDICADORES_SCORE).
+
+    Óbitos ~ Poisson(óbitos observados), com a taxa ajustada escalada na mesma proporção;
+    proporções da PNS e de laudos >60 dias ~ Binomial(n, p) / n.
+    """
+    forma = (n_replicas, len(base['obitos']))
+    obitos = rng.poisson(base['obitos'], size=forma)
+    mortalidade = base['taxa'] * obitos / np.maximum(base['obitos'], 1)
+    nunca = rng.binomial(base['amostra_pns'], base['nunca'], size=forma) / base['amostra_pns'] * 100
+    lentos = rng.binomial(base['exames'], base['lentos'], size=forma) / np.maximum(base['exames'], 1) * 100
+    return np.stack([mortalidade, nunca, lentos], axis=2)
+
+def _replicar(base, lotes, pesos=score.PESOS_PADRAO):
+    """Avalia uma lista de lotes [(tamanho, semente)] e acumula os histogramas de posições e de scores.
+
+    Cada lote tem sua própria semente, então o resultado não depende de quantos processos dividem o trabalho.
+    O histograma de posições é limitado a score.MAX_CLASSES_POSICAO classes por entidade.
+    """
+    n_entidades = len(base['obitos'])
+    deslocamento_score = np.arange(n_entidades) * PASSOS_SCORE
+    contagem_posicoes, largura = score.histograma_posicoes(n_entidades)
+    contagem_scores = np.zeros(n_entidades * PASSOS_SCORE, dtype=np.int64)
+
+    for tamanho, semente in lotes:
+        indicadores = reamostrar(base, tamanho, np.random.default_rng(semente))
+        # Normalização pelo máximo de cada replicação, como no score pontual
+        normalizados = indicadores / np.nanmax(indicadores, axis=1, keepdims=True) * 100
+        scores = normalizados @ np.asarray(pesos, dtype=float)
+        posicoes = score.ranquear(scores)
+
+        score.acumular_posicoes(contagem_posicoes, posicoes, largura)
+        passos = np.clip(np.rint(scores * 10), 0, PASSOS_SCORE - 1).astype(np.int64)
+        contagem_scores += np.bincount((deslocamento_score + passos).ravel(), minlength=contagem_scores.size)
+
+    return contagem_posicoes, contagem_scores.reshape(n_entidades, PASSOS_SCORE)
+
+def quantis_histograma(contagem, total, probabilidade):
+    """Índice (base 0) do quantil de cada linha de um histograma acumulado"""
+    return (contagem.cumsum(axis=1) >= probabilidade * total).argmax(axis=1)
+
+def bootstrap_criticidade(dados, n_replicas=N_REPLICAS, seed=0, processos=None, pesos=score.PESOS_PADRAO,
+                          amostra_pns=AMOSTRA_PNS, tamanho_lote=TAMANHO_LOTE):
+    """Intervalos de confiança do score e da posição de cada entidade por reamostragem paramétrica.
+
+    Todos os scores e posições de um lote são recalculados numa única operação matricial.
+    Com mais de LIMIAR_PROCESSOS elementos, os lotes são divididos entre processos (processos=1 desliga).
+    Retorna DataFrame na ordem do ranking pontual com Score, Posicao_atual e os quantis de ambos.
+    Acima de score.MAX_CLASSES_POSICAO entidades os quantis de posição são aproximados por classes
+    (score.quantil_posicoes), com intervalos conservadores.
+    """
+    base = indicadores_base(dados, amostra_pns)
+    n_entidades = len(base['obitos'])
+
+    tamanhos = [min(tamanho_lote, n_replicas - inicio) for inicio in range(0, n_replicas, tamanho_lote)]
+    lotes = list(zip(tamanhos, np.random.SeedSequence(seed).spawn(len(tamanhos))))
+
+    processos = processos or os.cpu_count() or 1
+    if n_replicas * n_entidades > LIMIAR_PROCESSOS and processos > 1 and len(lotes) > 1:
+        partes = [lotes[i::processos] for i in range(min(processos, len(lotes)))]
+        with ProcessPoolExecutor(max_workers=len(partes)) as executor:
+            resultados = list(executor.map(_replicar, [base] * len(partes), partes, [pesos] * len(partes)))
+    else:
+        resultados = [_replicar(base, lotes, pesos)]
+
+    contagem_posicoes = sum(resultado[0] for resultado in resultados)
+    contagem_scores = sum(resultado[1] for resultado in resultados)
+    largura = score.largura_classe_posicao(n_entidades)
+
+    scores_atuais, posicoes_atuais = score.calcular_scores(
+        carga_dados.para_float64(dados[score.INDICADORES_SCORE]).to_numpy(), pesos, arredondar=True
+    )
+    tabela = pd.DataFrame({
+        'UF': dados['UF'].to_numpy(),
+        'Score': scores_atuais[0],
+        **{f'Score_{nome}': quantis_histograma(contagem_scores, n_replicas, p) / 10 for nome, p in QUANTIS.items()},
+        'Posicao_atual': posicoes_atuais[0],
+        **{f'Posicao_{nome}': score.quantil_posicoes(contagem_posicoes, n_replicas, p, largura)
+           for nome, p in QUANTIS.items()},
+    })
+    return tabela.sort_values('Posicao_atual', ignore_index=True)
+
+# Executar bootstrap
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Intervalos de confiança (bootstrap) do score e do ranking por UF")
+    parser.add_argument("--replicas", type=int, default=N_REPLICAS)
+    parser.add_argument("--processos", type=int, default=None)
+    parser.add_argument("--amostra-pns", type=int, default=AMOSTRA_PNS, help="n assumido por UF na PNS 2019")
+    parser.add_argument("--dados", default=carga_dados.DIRETORIO_DADOS)
+    args = parser.parse_args()
+
+    dados = carga_dados.carregar_dados(args.dados)
+    inicio = time.perf_counter()
+    tabela = bootstrap_criticidade(dados, args.replicas, processos=args.processos, amostra_pns=args.amostra_pns)
+    print(tabela.to_string(index=False))
+    print(f"\n{args.replicas:,} replicações em {time.perf_counter() - inicio:.2f} s")
@@ -0,0 +1,182 @@
+import atexit
+import functools
+import itertools
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Arquivo JSON lines opcional onde cada medição é anexada (para o coletor local)
+ARQUIVO_METRICAS = os.environ.get("CANCER_MAMA_METRICAS")
+
+# Últimas medições de todas as sessões, para exportação
+MAX_REGISTROS = 5_000
+
+_local = threading.local()
+_trava = threading.Lock()
+_historico = deque(maxlen=MAX_REGISTROS)
+_totais = {}
+_ids_execucao = itertools.count(1)
+
+# Gravação do ARQUIVO_METRICAS: uma única thread com o arquivo aberto consome a fila,
+# fora da trava e fora do caminho das sessões
+_fila_metricas = queue.SimpleQueue()
+_escritor = {'thread': None}
+
+def rss_mb():
+    """Memória residente atual do processo em MB (0 se indisponível)"""
+    try:
+        with open("/proc/self/statm", encoding="utf-8") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, AttributeError):
+        return 0.0
+
+def _registros_execucao():
+    if not hasattr(_local, 'registros'):
+        iniciar_execucao(tipo=None)
+    return _local.registros
+
+def iniciar_execucao(tipo="completa"):
+    """Começa uma nova execução (rerun): zera as medições da thread atual.
+
+    Cada medição leva o id e o tipo da execução; uma execução "completa" fica aberta até
+    finalizar_execucao, e os fragmentos chamados nela continuam registrando nela.
+    """
+    _local.registros = []
+    _local.misses = {}
+    _local.execucao = {'id': next(_ids_execucao), 'tipo': tipo, 'aberta': tipo == "completa"}
+
+def finalizar_execucao():
+    """Fim da execução completa: a próxima re-execução de fragmento abre uma execução própria"""
+    _registros_execucao()
+    _local.execucao['aberta'] = False
+
+def iniciar_fragmento(nome):
+    """Chamado no topo de um @st.fragment.
+
+    Dentro de uma execução completa não faz nada; numa re-execução só do fragmento começa
+    uma nova execução do tipo "fragmento:<nome>", em vez de somar à anterior.
+    """
+    execucao = getattr(_local, 'execucao', None)
+    if execucao is None or not execucao['aberta']:
+        iniciar_execucao(tipo=f"fragmento:{nome}")
+
+def registros_execucao():
+    """Medições feitas na execução atual desta thread"""
+    return list(_registros_execucao())
+
+def marcar_miss(etapa):
+    """Chamado dentro de funções em cache: indica que o corpo executou (miss)"""
+    _registros_execucao()
+    _local.misses[etapa] = _local.misses.get(etapa, 0) + 1
+
+def _gravar_metricas(caminho):
+    """Thread escritora: anexa os registros da fila ao arquivo e faz um flush por rajada"""
+    with open(caminho, "a", encoding="utf-8") as f:
+        while True:
+            registro = _fila_metricas.get()
+            while registro is not None:
+                f.write(json.dumps(registro, ensure_ascii=False) + "\n")
+                try:
+                    registro = _fila_metricas.get_nowait()
+                except queue.Empty:
+                    break
+            f.flush()
+            if registro is None:
+                return
+
+def _parar_escritor():
+    """Na saída do processo: grava o que restou na fila e fecha o arquivo"""
+    thread = _escritor['thread']
+    if thread is not None:
+        _fila_metricas.put(None)
+        thread.join(timeout=5)
+
+def _enfileirar_metricas(registro):
+    if _escritor['thread'] is None:
+        with _trava:
+            if _escritor['thread'] is None:
+                _escritor['thread'] = threading.Thread(
+                    target=_gravar_metricas, args=(ARQUIVO_METRICAS,), name="metricas", daemon=True
+                )
+                _escritor['thread'].start()
+                atexit.register(_parar_escritor)
+    _fila_metricas.put(registro)
+
+def _registrar(registro):
+    _registros_execucao().append(registro)
+    with _trava:
+        _historico.append(registro)
+        total = _totais.setdefault(registro['etapa'], {'execucoes': 0, 'segundos': 0.0, 'hits': 0, 'misses': 0})
+        total['execucoes'] += 1
+        total['segundos'] += registro['segundos']
+        if registro['cache'] == 'hit':
+            total['hits'] += 1
+        elif registro['cache'] == 'miss':
+            total['misses'] += 1
+    if ARQUIVO_METRICAS:
+        _enfileirar_metricas(registro)
+
+@contextmanager
+def medir(etapa, cache=False):
+    """Mede tempo de parede, variação de RSS e (com cache=True) se houve hit ou miss"""
+    _registros_execucao()
+    misses_antes = _local.misses.get(etapa, 0)
+    rss_antes = rss_mb()
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        registro = {
+            'etapa': etapa,
+            'inicio': time.time(),
+            'segundos': time.perf_counter() - inicio,
+            'memoria_delta_mb': rss_mb() - rss_antes,
+            'cache': None,
+            'execucao': _local.execucao['id'],
+            'tipo_execucao': _local.execucao['tipo'],
+        }
+        if cache:
+            registro['cache'] = 'miss' if _local.misses.get(etapa, 0) > misses_antes else 'hit'
+        _registrar(registro)
+
+def instrumentar(etapa, cache=False):
+    """Decorador que mede cada chamada da função com medir(etapa, cache)"""
+    def decorador(funcao):
+        @functools.wraps(funcao)
+        def envolvida(*args, **kwargs):
+            with medir(etapa, cache):
+                return funcao(*args, **kwargs)
+        return envolvida
+    return decorador
+
+def exportar_jsonl(registros=None):
+    """Medições em JSON lines (padrão: histórico de todas as sessões)"""
+    if registros is None:
+        with _trava:
+            registros = list(_historico)
+    return "".join(json.dumps(registro, ensure_ascii=False) + "\n" for registro in registros)
+
+def exportar_prometheus():
+    """Totais acumulados por etapa no formato texto do Prometheus"""
+    with _trava:
+        totais = {etapa: dict(total) for etapa, total in _totais.items()}
+
+    linhas = [
+        "# HELP dashboard_etapa_execucoes_total Execuções de cada etapa.",
+        "# TYPE dashboard_etapa_execucoes_total counter",
+        *(f'dashboard_etapa_execucoes_total{{etapa="{etapa}"}} {t["execucoes"]}' for etapa, t in totais.items()),
+        "# HELP dashboard_etapa_segundos_total Tempo de parede acumulado por etapa.",
+        "# TYPE dashboard_etapa_segundos_total counter",
+        *(f'dashboard_etapa_segundos_total{{etapa="{etapa}"}} {t["segundos"]:.6f}' for etapa, t in totais.items()),
+        "# HELP dashboard_cache_total Consultas a cache por etapa e resultado.",
+        "# TYPE dashboard_cache_total counter",
+    ]
+    for etapa, total in totais.items():
+        if total['hits'] or total['misses']:
+            linhas.append(f'dashboard_cache_total{{etapa="{etapa}",resultado="hit"}} {total["hits"]}')
+            linhas.append(f'dashboard_cache_total{{etapa="{etapa}",resultado="miss"}} {total["misses"]}')
+    return "\n".join(linhas) + "\n"
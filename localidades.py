@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+
+# Dimensão de localidades: (código IBGE, sigla, nome, região)
+LOCALIDADES = [
+    (11, 'RO', 'Rondônia', 'Norte'),
+    (12, 'AC', 'Acre', 'Norte'),
+    (13, 'AM', 'Amazonas', 'Norte'),
+    (14, 'RR', 'Roraima', 'Norte'),
+    (15, 'PA', 'Pará', 'Norte'),
+    (16, 'AP', 'Amapá', 'Norte'),
+    (17, 'TO', 'Tocantins', 'Norte'),
+    (21, 'MA', 'Maranhão', 'Nordeste'),
+    (22, 'PI', 'Piauí', 'Nordeste'),
+    (23, 'CE', 'Ceará', 'Nordeste'),
+    (24, 'RN', 'Rio Grande do Norte', 'Nordeste'),
+    (25, 'PB', 'Paraíba', 'Nordeste'),
+    (26, 'PE', 'Pernambuco', 'Nordeste'),
+    (27, 'AL', 'Alagoas', 'Nordeste'),
+    (28, 'SE', 'Sergipe', 'Nordeste'),
+    (29, 'BA', 'Bahia', 'Nordeste'),
+    (31, 'MG', 'Minas Gerais', 'Sudeste'),
+    (32, 'ES', 'Espírito Santo', 'Sudeste'),
+    (33, 'RJ', 'Rio de Janeiro', 'Sudeste'),
+    (35, 'SP', 'São Paulo', 'Sudeste'),
+    (41, 'PR', 'Paraná', 'Sul'),
+    (42, 'SC', 'Santa Catarina', 'Sul'),
+    (43, 'RS', 'Rio Grande do Sul', 'Sul'),
+    (50, 'MS', 'Mato Grosso do Sul', 'Centro-oeste'),
+    (51, 'MT', 'Mato Grosso', 'Centro-oeste'),
+    (52, 'GO', 'Goiás', 'Centro-oeste'),
+    (53, 'DF', 'Distrito Federal', 'Centro-oeste'),
+]
+
+def tabela_localidades(localidades=LOCALIDADES):
+    """Dimensão de localidades como DataFrame (Cod_IBGE, Sigla, UF, Regiao)"""
+    tabela = pd.DataFrame(localidades, columns=['Cod_IBGE', 'Sigla', 'UF', 'Regiao'])
+    return tabela.astype({'Cod_IBGE': 'int32', 'Sigla': 'category', 'UF': 'category', 'Regiao': 'category'})
+
+def normalizar_nomes(serie):
+    """Chaves de comparação: sem acentos, em minúsculas e com espaços simples (vetorizado)"""
+    return (
+        serie.astype(str)
+        .str.normalize("NFKD").str.encode("ascii", "ignore").str.decode("ascii")
+        .str.lower().str.replace(r"\s+", " ", regex=True).str.strip()
+    )
+
+def normalizar_nome(texto):
+    """Chave de comparação de um único nome"""
+    return normalizar_nomes(pd.Series([texto])).iloc[0]
+
+def _chaves(tabela):
+    """Índice de chaves normalizadas -> código IBGE, aceitando nome, sigla ou o próprio código"""
+    codigos = tabela['Cod_IBGE'].to_numpy()
+    chaves = pd.Series(
+        np.concatenate([codigos, codigos, codigos]),
+        index=normalizar_nomes(pd.concat([tabela['UF'], tabela['Sigla'], tabela['Cod_IBGE'].astype(str)])),
+    )
+    return chaves[~chaves.index.duplicated()]
+
+def codificar_localidades(serie, tabela=None):
+    """Converte nomes/siglas de localidades em códigos IBGE.
+
+    Só os valores distintos são resolvidos: primeiro por igualdade exata com o nome
+    canônico e, para os que sobrarem, pela chave normalizada (acentos, caixa, sigla).
+    Retorna (códigos Int32 com <NA> nos não reconhecidos, lista dos não reconhecidos).
+    """
+    tabela = tabela_localidades() if tabela is None else tabela
+
+    rotulos, unicos = pd.factorize(serie)
+    codigos = tabela['Cod_IBGE'].to_numpy()
+    posicoes = pd.Index(tabela['UF']).get_indexer(unicos)
+    codigos_unicos = pd.array(codigos[posicoes], dtype='Int32')
+
+    faltam = np.flatnonzero(posicoes < 0)
+    if len(faltam):
+        chaves = _chaves(tabela)
+        posicoes_chave = chaves.index.get_indexer(normalizar_nomes(pd.Series(unicos[faltam])))
+        codigos_unicos[faltam] = pd.array(chaves.to_numpy()[posicoes_chave], dtype='Int32')
+        codigos_unicos[faltam[posicoes_chave < 0]] = pd.NA
+
+    desconhecidas = [str(valor) for valor in unicos[codigos_unicos.isna()]]
+    if (rotulos < 0).any():
+        desconhecidas.append("<vazio>")
+
+    return pd.Series(codigos_unicos.take(rotulos, allow_fill=True), index=serie.index, name='Cod_IBGE'), desconhecidas
+
+def codigo_localidade(texto, tabela=None):
+    """Código IBGE de uma localidade (nome ou sigla); None se não reconhecida"""
+    tabela = tabela_localidades() if tabela is None else tabela
+    codigo = _chaves(tabela).get(normalizar_nome(texto))
+    return None if codigo is None else int(codigo)
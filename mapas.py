@@ -0,0 +1,278 @@
+import argparse
+import json
+import os
+
+import numpy as np
+import plotly.graph_objects as go
+
+import carga_dados
+
+# Geometrias simplificadas (geradas offline com este script) ficam versionadas junto com os dados
+DIRETORIO_GEOMETRIAS = os.path.join(carga_dados.DIRETORIO_DADOS, "geometrias")
+
+# Níveis de detalhe: tolerância de Douglas-Peucker em graus (maior = mais simples e mais leve)
+NIVEIS_SIMPLIFICACAO = {
+    'baixo': 0.08,
+    'medio': 0.02,
+    'alto': 0.005,
+}
+
+# Resolução da grade de quantização (como o "quantization" do TopoJSON)
+QUANTIZACAO = 100_000
+
+# Campos onde o código IBGE costuma vir nos arquivos de malha (API do IBGE, shapefiles convertidos)
+CAMPOS_CODIGO = ['codarea', 'CD_UF', 'CD_MUN', 'CD_GEOCODI', 'id']
+
+# Posições (coluna, linha) de cada UF no mapa em grade, usado quando não há geometrias
+GRADE_UF = {
+    'RR': (2, 0), 'AP': (4, 0),
+    'AM': (1, 1), 'PA': (3, 1), 'MA': (4, 1), 'CE': (5, 1), 'RN': (6, 1),
+    'AC': (0, 2), 'RO': (1, 2), 'MT': (2, 2), 'TO': (3, 2), 'PI': (4, 2), 'PE': (5, 2), 'PB': (6, 2),
+    'MS': (1, 3), 'GO': (2, 3), 'DF': (3, 3), 'BA': (4, 3), 'SE': (5, 3), 'AL': (6, 3),
+    'PR': (1, 4), 'SP': (2, 4), 'MG': (3, 4), 'ES': (4, 4),
+    'SC': (1, 5), 'RJ': (3, 5),
+    'RS': (1, 6),
+}
+
+def simplificar_anel(pontos, tolerancia):
+    """Douglas-Peucker iterativo sobre um anel (array n x 2); mantém primeiro e último pontos"""
+    n = len(pontos)
+    if n <= 4:
+        return pontos
+
+    manter = np.zeros(n, dtype=bool)
+    manter[[0, -1]] = True
+    pilha = [(0, n - 1)]
+    while pilha:
+        inicio, fim = pilha.pop()
+        if fim <= inicio + 1:
+            continue
+        a, b = pontos[inicio], pontos[fim]
+        trecho = pontos[inicio + 1:fim]
+        direcao = b - a
+        norma = np.hypot(*direcao)
+        if norma == 0:  # Anel fechado: distância ao ponto inicial
+            distancias = np.hypot(*(trecho - a).T)
+        else:
+            distancias = np.abs(direcao[0] * (trecho[:, 1] - a[1]) - direcao[1] * (trecho[:, 0] - a[0])) / norma
+        maior = int(distancias.argmax())
+        if distancias[maior] > tolerancia:
+            meio = inicio + 1 + maior
+            manter[meio] = True
+            pilha.extend([(inicio, meio), (meio, fim)])
+
+    return pontos[manter]
+
+def _poligonos(geometria):
+    """Lista de polígonos (cada um, lista de anéis) de um Polygon ou MultiPolygon GeoJSON"""
+    if geometria['type'] == 'Polygon':
+        return [geometria['coordinates']]
+    if geometria['type'] == 'MultiPolygon':
+        return geometria['coordinates']
+    raise ValueError(f"Geometria não suportada: {geometria['type']}")
+
+def _codigo(feature):
+    """Código IBGE de uma feature, procurado em id e nos campos usuais das malhas"""
+    propriedades = feature.get('properties') or {}
+    for campo in CAMPOS_CODIGO:
+        valor = propriedades.get(campo, feature.get(campo))
+        if valor is not None:
+            return str(valor)
+    raise ValueError(f"Feature sem código IBGE (campos procurados: {', '.join(CAMPOS_CODIGO)})")
+
+def construir_topologia(geojson, tolerancia, nome_camada, quantizacao=QUANTIZACAO):
+    """Simplifica e quantiza uma FeatureCollection em TopoJSON (um arco por anel, coordenadas delta).
+
+    Anéis que colapsam na simplificação (ilhas menores que a tolerância) são descartados,
+    mas cada feature mantém pelo menos o anel externo do seu maior polígono.
+    """
+    features = [(_codigo(feature), _poligonos(feature['geometry'])) for feature in geojson['features']]
+
+    todos = np.concatenate([
+        np.asarray(anel, dtype=float)[:, :2] for _, poligonos in features for poligono in poligonos for anel in poligono
+    ])
+    minimo, maximo = todos.min(axis=0), todos.max(axis=0)
+    escala = (maximo - minimo) / (quantizacao - 1)
+    escala[escala == 0] = 1.0
+
+    arcos, geometrias = [], []
+    for codigo, poligonos in features:
+        poligonos_quantizados = []
+        for poligono in poligonos:
+            aneis = []
+            for anel in poligono:
+                simplificado = simplificar_anel(np.asarray(anel, dtype=float)[:, :2], tolerancia)
+                quantizado = np.round((simplificado - minimo) / escala).astype(np.int64)
+                # Pontos que caem na mesma célula da grade viram um só
+                repetido = np.r_[False, (np.diff(quantizado, axis=0) == 0).all(axis=1)]
+                quantizado = quantizado[~repetido]
+                if len(quantizado) >= 4:
+                    aneis.append(quantizado)
+                elif not aneis:
+                    break  # Anel externo colapsou: o polígono inteiro é descartado
+            if aneis:
+                poligonos_quantizados.append(aneis)
+
+        if not poligonos_quantizados:
+            maior = max(poligonos, key=lambda poligono: len(poligono[0]))[0]
+            externo = np.asarray(maior, dtype=float)[:, :2]
+            indices = np.linspace(0, len(externo) - 1, 5).astype(int)
+            poligonos_quantizados = [[np.round((externo[indices] - minimo) / escala).astype(np.int64)]]
+
+        referencias = []
+        for aneis in poligonos_quantizados:
+            referencias_poligono = []
+            for anel in aneis:
+                referencias_poligono.append([len(arcos)])
+                arcos.append(np.vstack([anel[:1], np.diff(anel, axis=0)]).tolist())
+            referencias.append(referencias_poligono)
+        geometrias.append({'type': 'MultiPolygon', 'id': codigo, 'arcs': referencias})
+
+    return {
+        'type': 'Topology',
+        'transform': {'scale': escala.tolist(), 'translate': minimo.tolist()},
+        'objects': {nome_camada: {'type': 'GeometryCollection', 'geometries': geometrias}},
+        'arcs': arcos,
+    }
+
+def topologia_para_geojson(topologia, nome_camada, casas=5):
+    """Converte a topologia quantizada de volta em FeatureCollection GeoJSON (id = código IBGE)"""
+    escala = np.asarray(topologia['transform']['scale'])
+    translacao = np.asarray(topologia['transform']['translate'])
+    coordenadas = [
+        (np.cumsum(np.asarray(arco), axis=0) * escala + translacao).round(casas).tolist()
+        for arco in topologia['arcs']
+    ]
+
+    features = []
+    for geometria in topologia['objects'][nome_camada]['geometries']:
+        poligonos = [[coordenadas[arcos[0]] for arcos in poligono] for poligono in geometria['arcs']]
+        features.append({
+            'type': 'Feature',
+            'id': geometria['id'],
+            'properties': {},
+            'geometry': {'type': 'MultiPolygon', 'coordinates': poligonos},
+        })
+    return {'type': 'FeatureCollection', 'features': features}
+
+def verificar_topologia(geojson, topologia, nome_camada, casas=5):
+    """Confere o ciclo codificar -> decodificar contra a malha original.
+
+    Cada feature precisa voltar com o mesmo código, anéis fechados com ao menos 4 pontos e
+    cada vértice decodificado a no máximo meia célula da grade de quantização (mais o
+    arredondamento em casas decimais) de um vértice original da feature. Levanta ValueError.
+    """
+    escala = np.asarray(topologia['transform']['scale'])
+    translacao = np.asarray(topologia['transform']['translate'])
+    tolerancia = escala / 2 + 0.5 * 10.0 ** -casas + 1e-9
+    decodificadas = {
+        feature['id']: feature for feature in topologia_para_geojson(topologia, nome_camada, casas)['features']
+    }
+
+    for feature in geojson['features']:
+        codigo = _codigo(feature)
+        if codigo not in decodificadas:
+            raise ValueError(f"Feature {codigo} ausente na topologia")
+        originais = np.concatenate([
+            np.asarray(anel, dtype=float)[:, :2] for poligono in _poligonos(feature['geometry']) for anel in poligono
+        ])
+        # Vértices originais pela célula da grade onde caem (a simplificação só remove vértices)
+        por_celula = {
+            tuple(celula): ponto
+            for celula, ponto in zip(np.round((originais - translacao) / escala).astype(np.int64).tolist(), originais)
+        }
+        for poligono in decodificadas[codigo]['geometry']['coordinates']:
+            for anel in poligono:
+                anel = np.asarray(anel, dtype=float)
+                if len(anel) < 4 or not (anel[0] == anel[-1]).all():
+                    raise ValueError(f"Feature {codigo}: anel aberto ou com menos de 4 pontos")
+                celulas = np.round((anel - translacao) / escala).astype(np.int64).tolist()
+                for ponto, celula in zip(anel, celulas):
+                    original = por_celula.get(tuple(celula))
+                    if original is None or (np.abs(ponto - original) > tolerancia).any():
+                        raise ValueError(f"Feature {codigo}: vértice {ponto.tolist()} fora da tolerância de quantização")
+
+def caminho_topologia(camada, nivel, diretorio=DIRETORIO_GEOMETRIAS):
+    """Arquivo TopoJSON de uma camada (uf, municipio) em um nível de detalhe"""
+    return os.path.join(diretorio, f"{camada}_{nivel}.topojson")
+
+def niveis_disponiveis(camada, diretorio=DIRETORIO_GEOMETRIAS):
+    """Níveis de detalhe já gerados para a camada, do mais leve ao mais detalhado"""
+    return [nivel for nivel in NIVEIS_SIMPLIFICACAO if os.path.exists(caminho_topologia(camada, nivel, diretorio))]
+
+def carregar_geojson(camada, nivel, diretorio=DIRETORIO_GEOMETRIAS):
+    """Lê o TopoJSON de um nível e retorna o GeoJSON pronto para o Plotly"""
+    with open(caminho_topologia(camada, nivel, diretorio), encoding="utf-8") as f:
+        return topologia_para_geojson(json.load(f), camada)
+
+def gerar_niveis(origem, camada, diretorio=DIRETORIO_GEOMETRIAS, niveis=NIVEIS_SIMPLIFICACAO):
+    """Gera um TopoJSON por nível de detalhe a partir da malha GeoJSON completa; retorna os tamanhos (bytes)"""
+    with open(origem, encoding="utf-8") as f:
+        geojson = json.load(f)
+
+    os.makedirs(diretorio, exist_ok=True)
+    tamanhos = {}
+    for nivel, tolerancia in niveis.items():
+        topologia = construir_topologia(geojson, tolerancia, camada)
+        verificar_topologia(geojson, topologia, camada)  # Nunca grava um nível que não decodifica de volta
+        caminho = caminho_topologia(camada, nivel, diretorio)
+        with open(caminho, "w", encoding="utf-8") as f:
+            json.dump(topologia, f, separators=(",", ":"))
+        tamanhos[nivel] = os.path.getsize(caminho)
+    return tamanhos
+
+def figura_mapa(dados, coluna, titulo, geojson=None, estado_selecionado=None):
+    """Coroplético por código IBGE; sem geometrias, usa o mapa em grade das UFs"""
+    valores = carga_dados.para_float64(dados[['Cod_IBGE', 'Sigla', 'UF', coluna]])
+
+    if geojson is not None:
+        fig = go.Figure(go.Choropleth(
+            geojson=geojson,
+            locations=valores['Cod_IBGE'].astype(str),
+            featureidkey='id',
+            z=valores[coluna],
+            text=valores['UF'],
+            colorscale='Reds',
+            marker_line_color='white',
+            marker_line_width=0.5,
+            colorbar_title=titulo,
+            hovertemplate="%{text}: %{z:.1f}<extra></extra>"
+        ))
+        fig.update_geos(fitbounds='locations', visible=False)
+        fig.update_layout(height=600, margin=dict(l=0, r=0, t=40, b=0), title=titulo)
+        return fig
+
+    posicoes = valores['Sigla'].astype(str).map(GRADE_UF)
+    valores = valores[posicoes.notna()]
+    posicoes = posicoes[posicoes.notna()]
+    fig = go.Figure(go.Scatter(
+        x=[coluna_grade for coluna_grade, _ in posicoes],
+        y=[linha for _, linha in posicoes],
+        mode='markers+text',
+        text=valores['Sigla'].astype(str),
+        customdata=valores['UF'],
+        marker=dict(
+            symbol='square', size=52, color=valores[coluna], colorscale='Reds', showscale=True,
+            colorbar=dict(title=titulo),
+            line=dict(width=np.where(valores['UF'] == estado_selecionado, 4, 1), color='black'),
+        ),
+        textfont=dict(color='black', size=14),
+        hovertemplate="%{customdata}: %{marker.color:.1f}<extra></extra>"
+    ))
+    fig.update_xaxes(visible=False, range=[-0.7, 6.7])
+    fig.update_yaxes(visible=False, autorange='reversed', scaleanchor='x')
+    fig.update_layout(height=600, margin=dict(l=0, r=0, t=40, b=0), title=titulo, plot_bgcolor='white')
+    return fig
+
+# Gerar geometrias simplificadas (offline)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera geometrias simplificadas e quantizadas (TopoJSON) por nível")
+    parser.add_argument("--origem", required=True, help="Malha GeoJSON completa (ex.: malha de UFs do IBGE)")
+    parser.add_argument("--camada", default="uf", help="Nome da camada (uf, municipio)")
+    parser.add_argument("--destino", default=DIRETORIO_GEOMETRIAS)
+    args = parser.parse_args()
+
+    tamanho_origem = os.path.getsize(args.origem)
+    print(f"Simplificando {args.origem} ({tamanho_origem / 2**20:.1f} MB)...")
+    for nivel, tamanho in gerar_niveis(args.origem, args.camada, args.destino).items():
+        print(f"   {nivel:.<10} {tamanho / 2**10:>10.1f} KB ({tamanho / tamanho_origem:.1%} do original)")
@@ -0,0 +1,175 @@
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+import carga_dados
+import localidades
+
+# Colunas usadas das declarações de óbito do SIM (arquivos DO<ano>.csv do DATASUS, separados por ';').
+# Causa e sexo como categoria: as comparações de texto são feitas só nas categorias distintas de cada bloco
+COLUNAS_SIM = {
+    'CAUSABAS': 'category',
+    'SEXO': 'category',
+    'IDADE': 'float64',
+    'CODMUNRES': 'float64',
+}
+SEPARADOR_SIM = ";"
+
+# Câncer de mama (CID-10 C50.x) em mulheres (SEXO 2 ou F)
+CID_CANCER_MAMA = "C50"
+SEXO_FEMININO = ['2', 'F']
+
+# Faixas etárias quinquenais (a última aberta) e população padrão mundial (Segi, modificada por Doll),
+# a mesma usada pelo INCA nas taxas ajustadas por idade
+LIMITES_FAIXAS = list(range(0, 85, 5))
+ROTULOS_FAIXAS = [f"{inicio}-{inicio + 4}" for inicio in LIMITES_FAIXAS[:-1]] + ["80+"]
+POPULACAO_PADRAO = np.array([
+    12_000, 10_000, 9_000, 9_000, 8_000, 8_000, 6_000, 6_000, 6_000,
+    6_000, 5_000, 4_000, 4_000, 3_000, 2_000, 1_000, 1_000,
+], dtype=float)
+
+# Linhas por bloco lido do CSV (a memória fica limitada ao bloco, não ao arquivo)
+TAMANHO_BLOCO = 1_000_000
+
+# Códigos de UF vão até 53: a contagem é uma matriz fixa (código x faixa), mais uma coluna para idade ignorada
+CODIGOS_UF = 100
+IDADE_IGNORADA = len(ROTULOS_FAIXAS)
+
+def idade_em_anos(codigos):
+    """Converte o campo IDADE do SIM (unidade + valor: 4xx = anos, 5xx = 100 anos ou mais) em anos.
+
+    Menores de 1 ano (unidades 0 a 3) viram 0; códigos ausentes ou inválidos viram NaN.
+    """
+    codigos = np.asarray(codigos, dtype=float)
+    unidade, valor = codigos // 100, codigos % 100
+    return np.select([unidade <= 3, unidade == 4, unidade == 5], [0.0, valor, 100 + valor], np.nan)
+
+def faixa_etaria(anos):
+    """Índice da faixa etária de cada idade; idades ausentes vão para IDADE_IGNORADA"""
+    anos = np.asarray(anos, dtype=float)
+    faixas = np.searchsorted(LIMITES_FAIXAS, np.nan_to_num(anos, nan=0), side='right') - 1
+    return np.where(np.isnan(anos), IDADE_IGNORADA, faixas)
+
+def codigo_uf_residencia(codmunres):
+    """Código IBGE da UF a partir do município de residência (6 ou 7 dígitos); 0 se ausente"""
+    codigos = np.nan_to_num(np.asarray(codmunres, dtype=float), nan=0).astype(np.int64)
+    return np.where(codigos >= 1_000_000, codigos // 100_000, codigos // 10_000)
+
+def agregar_bloco(bloco):
+    """Óbitos por câncer de mama em mulheres de um bloco, numa matriz (código UF x faixa etária)"""
+    causas = bloco['CAUSABAS'].cat.categories
+    sexos = bloco['SEXO'].cat.categories
+    selecionados = (
+        bloco['CAUSABAS'].cat.codes.isin(np.flatnonzero(causas.str.startswith(CID_CANCER_MAMA))).to_numpy()
+        & bloco['SEXO'].cat.codes.isin(np.flatnonzero(sexos.isin(SEXO_FEMININO))).to_numpy()
+    )
+
+    ufs = codigo_uf_residencia(bloco['CODMUNRES'].to_numpy()[selecionados])
+    faixas = faixa_etaria(idade_em_anos(bloco['IDADE'].to_numpy()[selecionados]))
+    ufs = np.where((ufs > 0) & (ufs < CODIGOS_UF), ufs, 0)  # UF ausente ou inválida fica na linha 0
+    contagem = np.bincount(ufs * (IDADE_IGNORADA + 1) + faixas, minlength=CODIGOS_UF * (IDADE_IGNORADA + 1))
+    return contagem.reshape(CODIGOS_UF, IDADE_IGNORADA + 1), len(bloco)
+
+def agregar_obitos(caminhos, tamanho_bloco=TAMANHO_BLOCO):
+    """Lê os arquivos do SIM em blocos e acumula os óbitos por UF e faixa etária (memória limitada ao bloco).
+
+    Retorna (matriz código UF x faixa, com a última coluna = idade ignorada; registros lidos).
+    """
+    obitos = np.zeros((CODIGOS_UF, IDADE_IGNORADA + 1), dtype=np.int64)
+    registros = 0
+    for caminho in caminhos:
+        blocos = pd.read_csv(
+            caminho, sep=SEPARADOR_SIM, usecols=list(COLUNAS_SIM), dtype=COLUNAS_SIM,
+            chunksize=tamanho_bloco, encoding="latin-1",
+        )
+        for bloco in blocos:
+            contagem, linhas = agregar_bloco(bloco)
+            obitos += contagem
+            registros += linhas
+    return obitos, registros
+
+def ler_populacao(caminho, tabela=None):
+    """População feminina por UF e faixa etária (CSV longo: UF, Faixa_etaria, Populacao) em matriz código x faixa"""
+    populacao = pd.read_csv(caminho, dtype={'UF': 'str', 'Faixa_etaria': 'str', 'Populacao': 'float64'})
+    codigos, desconhecidas = localidades.codificar_localidades(populacao['UF'], tabela)
+    if desconhecidas:
+        raise ValueError(f"Localidades não reconhecidas em {os.path.basename(caminho)}: {', '.join(desconhecidas)}")
+    faixas = pd.Index(ROTULOS_FAIXAS).get_indexer(populacao['Faixa_etaria'].str.strip())
+    if (faixas < 0).any():
+        invalidas = sorted(set(populacao['Faixa_etaria'][faixas < 0]))
+        raise ValueError(f"Faixas etárias inválidas em {os.path.basename(caminho)}: {', '.join(invalidas)} "
+                         f"(esperado: {', '.join(ROTULOS_FAIXAS)})")
+
+    matriz = np.zeros((CODIGOS_UF, len(ROTULOS_FAIXAS)))
+    np.add.at(matriz, (codigos.to_numpy(dtype=np.int64), faixas), populacao['Populacao'].to_numpy())
+    return matriz
+
+def calcular_taxas(obitos, populacao, tabela=None):
+    """Taxas bruta e ajustada por idade (por 100 mil mulheres) de cada UF, no esquema de mortalidade_tabela2.csv.
+
+    Óbitos com idade ignorada entram na taxa bruta e, na ajustada, são redistribuídos
+    proporcionalmente aos óbitos de idade conhecida da própria UF.
+    """
+    tabela = localidades.tabela_localidades() if tabela is None else tabela
+    codigos = tabela['Cod_IBGE'].to_numpy()
+    por_faixa = obitos[codigos, :IDADE_IGNORADA].astype(float)
+    ignorados = obitos[codigos, IDADE_IGNORADA]
+    total = por_faixa.sum(axis=1) + ignorados
+    pop = populacao[codigos]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        fator = np.where(por_faixa.sum(axis=1) > 0, total / por_faixa.sum(axis=1), 1.0)
+        especificas = np.where(pop > 0, por_faixa * fator[:, None] / pop, 0.0)
+        taxa_bruta = total / pop.sum(axis=1) * 100_000
+    taxa_ajustada = especificas @ POPULACAO_PADRAO / POPULACAO_PADRAO.sum() * 100_000
+
+    return pd.DataFrame({
+        'UF': tabela['UF'].astype(str).to_numpy(),
+        'Regiao': tabela['Regiao'].astype(str).to_numpy(),
+        'Obitos': total.astype('int32'),
+        'Taxa_bruta': taxa_bruta.round(1),
+        'Taxa_mortalidade_ajustada': taxa_ajustada.round(1),
+    })
+
+def gerar_tabela_mortalidade(caminhos_sim, caminho_populacao, destino=None, tamanho_bloco=TAMANHO_BLOCO):
+    """Agrega os microdados do SIM e grava (se destino) a tabela no formato de mortalidade_tabela2.csv.
+
+    Retorna (tabela, estatísticas da leitura).
+    """
+    inicio = time.perf_counter()
+    obitos, registros = agregar_obitos(caminhos_sim, tamanho_bloco)
+    tabela = calcular_taxas(obitos, ler_populacao(caminho_populacao))
+    segundos = time.perf_counter() - inicio
+
+    if destino is not None:
+        carga_dados._gravar_atomico(destino, lambda temporario: tabela.to_csv(temporario, index=False))
+
+    estatisticas = {
+        'registros': registros,
+        'obitos_selecionados': int(obitos.sum()),
+        'sem_uf': int(obitos[0].sum()),
+        'idade_ignorada': int(obitos[:, IDADE_IGNORADA].sum()),
+        'segundos': segundos,
+        'registros_por_minuto': registros / segundos * 60 if segundos else 0.0,
+    }
+    return tabela, estatisticas
+
+# Gerar mortalidade_tabela2.csv a partir dos microdados
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Taxas de mortalidade por câncer de mama a partir dos microdados do SIM")
+    parser.add_argument("sim", nargs="+", help="Arquivos DO<ano>.csv do SIM (separados por ';')")
+    parser.add_argument("--populacao", required=True, help="CSV com UF, Faixa_etaria e Populacao (feminina)")
+    parser.add_argument("--saida", default=os.path.join(carga_dados.DIRETORIO_DADOS, carga_dados.ARQUIVOS_FONTE['mortalidade']))
+    parser.add_argument("--bloco", type=int, default=TAMANHO_BLOCO, help="Linhas lidas por bloco")
+    args = parser.parse_args()
+
+    tabela, estatisticas = gerar_tabela_mortalidade(args.sim, args.populacao, args.saida, args.bloco)
+    print(tabela.to_string(index=False))
+    print(f"\n{estatisticas['registros']:,} registros em {estatisticas['segundos']:.1f} s "
+          f"({estatisticas['registros_por_minuto'] / 1e6:.1f} milhões/min); "
+          f"{estatisticas['obitos_selecionados']:,} óbitos por câncer de mama "
+          f"({estatisticas['sem_uf']} sem UF, {estatisticas['idade_ignorada']} com idade ignorada)")
+    print(f"Tabela gravada em {args.saida}")
@@ -0,0 +1,193 @@
+import argparse
+import os
+import time
+
+import numpy as np
+
+import carga_dados
+import ranking
+import score
+
+# Colunas calculadas pelo nó de score (score.aplicar_score)
+COLUNAS_NO_SCORE = [*score.COLUNAS_SCORE, 'Score_Consolidado', 'Criticidade']
+
+def grafo_dependencias():
+    """Grafo do consolidado: {nó: {'depende': [nós], 'colunas': [colunas produzidas]}}, em ordem topológica.
+
+    Cada CSV é um nó 'fonte:<nome>'; cada coluna derivada (carga_dados.COLUNAS_DERIVADAS) e o
+    score dependem dos nós que produzem as colunas que consomem. Agregados, posições e
+    índices do ranking são recalculados só para as colunas que mudaram.
+    """
+    grafo = {f'fonte:{nome}': {'depende': [], 'colunas': colunas} for nome, colunas in carga_dados.COLUNAS_CONSOLIDADO.items()}
+    produtor = {coluna: no for no, definicao in grafo.items() for coluna in definicao['colunas']}
+
+    for coluna, definicao in carga_dados.COLUNAS_DERIVADAS.items():
+        grafo[f'derivada:{coluna}'] = {'depende': sorted({produtor[c] for c in definicao['depende']}), 'colunas': [coluna]}
+        produtor[coluna] = f'derivada:{coluna}'
+
+    grafo['score'] = {'depende': sorted({produtor[c] for c in score.INDICADORES_SCORE}), 'colunas': COLUNAS_NO_SCORE}
+    return grafo
+
+def nos_afetados(grafo, alterados):
+    """Nós alterados e todos os que dependem deles (direta ou indiretamente), em ordem topológica"""
+    afetados = set(alterados)
+    for no, definicao in grafo.items():
+        if afetados.intersection(definicao['depende']):
+            afetados.add(no)
+    return [no for no in grafo if no in afetados]
+
+def assinatura_arquivo(caminho):
+    """mtime e tamanho de um arquivo (mudam sempre que ele é regravado)"""
+    info = os.stat(caminho)
+    return [info.st_mtime_ns, info.st_size]
+
+def _ordem_ranking(dados):
+    """Posições das linhas do mais ao menos crítico (mesma ordenação de score.calcular_score_criticidade)"""
+    ordenado = dados[['Score_Consolidado']].reset_index(drop=True).sort_values('Score_Consolidado', ascending=False)
+    return ordenado.index.to_numpy()
+
+def construir_estado(base_path=carga_dados.DIRETORIO_DADOS):
+    """Estado completo: consolidado com scores, ordem do ranking, agregados, posições e índices de filtro"""
+    caminhos = {nome: os.path.join(base_path, arquivo) for nome, arquivo in carga_dados.ARQUIVOS_FONTE.items()}
+    assinaturas = {nome: assinatura_arquivo(caminho) for nome, caminho in caminhos.items()}
+    hashes = {nome: carga_dados.hash_arquivo(caminho) for nome, caminho in caminhos.items()}
+
+    dados = score.aplicar_score(carga_dados.consolidar_dados(carga_dados.ler_fontes(base_path)))
+    ordem = _ordem_ranking(dados)
+    return {
+        'versao': carga_dados.versao_conteudo(hashes),
+        'base_path': base_path,
+        'assinaturas': assinaturas,
+        'hashes': hashes,
+        'dados': dados,
+        'ordem_ranking': ordem,
+        'agregados': carga_dados.calcular_agregados(dados),
+        'posicoes': ranking.construir_posicoes(dados),
+        'indices_ranking': ranking.construir_indices(dados.iloc[ordem]),
+    }
+
+def fontes_alteradas(estado):
+    """Fontes cujo conteúdo mudou desde o estado (o hash só é refeito quando mtime/tamanho mudam).
+
+    Retorna ({fonte: novo hash}, {fonte: nova assinatura}).
+    """
+    hashes, assinaturas = {}, {}
+    for nome, arquivo in carga_dados.ARQUIVOS_FONTE.items():
+        caminho = os.path.join(estado['base_path'], arquivo)
+        assinatura = assinatura_arquivo(caminho)
+        if assinatura == estado['assinaturas'].get(nome):
+            continue
+        assinaturas[nome] = assinatura
+        novo_hash = carga_dados.hash_arquivo(caminho)
+        if novo_hash != estado['hashes'].get(nome):
+            hashes[nome] = novo_hash
+    return hashes, assinaturas
+
+def substituir_colunas_fonte(dados, fonte, base_path=carga_dados.DIRETORIO_DADOS):
+    """Relê uma única fonte e troca só as suas colunas no consolidado, alinhadas por Cod_IBGE"""
+    caminho = os.path.join(base_path, carga_dados.ARQUIVOS_FONTE[fonte])
+    tabela = carga_dados.codificar_fontes({fonte: carga_dados.ler_csv(caminho, fonte)})[fonte]
+    if tabela['Cod_IBGE'].duplicated().any():
+        raise ValueError(f"Localidades duplicadas em {os.path.basename(caminho)}")
+
+    tabela = tabela.rename(columns=carga_dados.RENOMEAR_COLUNAS).set_index('Cod_IBGE')
+    colunas = carga_dados.COLUNAS_CONSOLIDADO[fonte]
+    # reindex: localidades ausentes na fonte viram NaN, como no merge how='left' do consolidado
+    return dados.assign(**{coluna: tabela[coluna].reindex(dados['Cod_IBGE']).to_numpy() for coluna in colunas})
+
+def codigos_mortalidade(base_path=carga_dados.DIRETORIO_DADOS):
+    """Códigos IBGE da tabela de mortalidade, na ordem das linhas (a ordem do consolidado)"""
+    caminho = os.path.join(base_path, carga_dados.ARQUIVOS_FONTE['mortalidade'])
+    tabela = carga_dados.codificar_fontes({'mortalidade': carga_dados.ler_csv(caminho, 'mortalidade')})['mortalidade']
+    return tabela['Cod_IBGE'].to_numpy()
+
+def atualizar_estado(estado):
+    """Aplica ao estado só as mudanças das fontes alteradas e retorna (novo estado, relatório).
+
+    O estado recebido não é modificado (o novo compartilha as colunas que não mudaram), então
+    leitores concorrentes continuam vendo uma versão consistente. Se a fonte de mortalidade
+    mudar o conjunto de localidades, o estado é reconstruído do zero.
+    """
+    inicio = time.perf_counter()
+    hashes, assinaturas = fontes_alteradas(estado)
+    if not hashes:
+        if assinaturas:  # Só mtime mudou (arquivo regravado com o mesmo conteúdo)
+            estado = {**estado, 'assinaturas': {**estado['assinaturas'], **assinaturas}}
+        return estado, {'fontes': [], 'nos': [], 'colunas': [], 'segundos': time.perf_counter() - inicio}
+
+    base_path = estado['base_path']
+    grafo = grafo_dependencias()
+    nos = nos_afetados(grafo, [f'fonte:{nome}' for nome in hashes])
+
+    # A tabela de mortalidade define as linhas do consolidado: se as localidades mudarem, reconstrói tudo
+    if 'mortalidade' in hashes and not np.array_equal(codigos_mortalidade(base_path), estado['dados']['Cod_IBGE'].to_numpy()):
+        novo = construir_estado(base_path)
+        return novo, {'fontes': sorted(hashes), 'nos': list(grafo), 'colunas': list(novo['dados'].columns),
+                      'segundos': time.perf_counter() - inicio}
+
+    dados = estado['dados']
+    for no in nos:
+        if no.startswith('fonte:'):
+            dados = substituir_colunas_fonte(dados, no[len('fonte:'):], base_path)
+        elif no.startswith('derivada:'):
+            dados = carga_dados.derivar_colunas(dados, [no[len('derivada:'):]])
+        elif no == 'score':
+            dados = score.aplicar_score(dados)
+
+    colunas = [coluna for no in nos for coluna in grafo[no]['colunas']]
+    agregadas = [coluna for coluna in carga_dados.COLUNAS_AGREGADAS if coluna in colunas]
+
+    novo = {
+        **estado,
+        'versao': carga_dados.versao_conteudo({**estado['hashes'], **hashes}),
+        'assinaturas': {**estado['assinaturas'], **assinaturas},
+        'hashes': {**estado['hashes'], **hashes},
+        'dados': dados,
+    }
+    if agregadas:
+        parciais = carga_dados.calcular_agregados(dados[['UF', 'Regiao', *agregadas]])
+        novo['agregados'] = {
+            'n': parciais['n'],
+            **{chave: {**estado['agregados'][chave], **parciais[chave]} for chave in ('media', 'soma', 'media_regiao')},
+        }
+        parciais = ranking.construir_posicoes(dados, colunas=agregadas)
+        novo['posicoes'] = {
+            **estado['posicoes'],
+            **{chave: {**estado['posicoes'][chave], **parciais[chave]}
+               for chave in ('posicao', 'n_validos', 'posicao_regiao', 'n_regiao')},
+        }
+    if 'score' in nos:
+        novo['ordem_ranking'] = _ordem_ranking(dados)
+    # O ranking ordenado é uma visão do consolidado: os índices de filtro só mudam com a ordem ou a criticidade
+    novo['indices_ranking'] = (
+        ranking.construir_indices(dados.iloc[novo['ordem_ranking']]) if 'score' in nos else estado['indices_ranking']
+    )
+
+    return novo, {'fontes': sorted(hashes), 'nos': nos, 'colunas': colunas, 'segundos': time.perf_counter() - inicio}
+
+def ranking_estado(estado):
+    """DataFrame do ranking (mais crítico primeiro) do estado"""
+    return estado['dados'].iloc[estado['ordem_ranking']]
+
+# Mostrar o grafo e medir uma atualização incremental
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Grafo de dependências das fontes e atualização incremental")
+    parser.add_argument("--dados", default=carga_dados.DIRETORIO_DADOS)
+    parser.add_argument("--observar", type=float, default=None,
+                        help="Verifica mudanças a cada N segundos e aplica só o que mudou")
+    args = parser.parse_args()
+
+    for no, definicao in grafo_dependencias().items():
+        origem = f" <- {', '.join(definicao['depende'])}" if definicao['depende'] else ""
+        print(f"{no}{origem}: {', '.join(definicao['colunas'])}")
+
+    inicio = time.perf_counter()
+    estado = construir_estado(args.dados)
+    print(f"\nEstado {estado['versao']} construído em {(time.perf_counter() - inicio) * 1000:.1f} ms")
+
+    while args.observar:
+        time.sleep(args.observar)
+        estado, relatorio = atualizar_estado(estado)
+        if relatorio['fontes']:
+            print(f"Estado {estado['versao']}: {', '.join(relatorio['fontes'])} -> {', '.join(relatorio['nos'])} "
+                  f"({relatorio['segundos'] * 1000:.1f} ms)")
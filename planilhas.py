@@ -0,0 +1,255 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+
+import pandas as pd
+from openpyxl import load_workbook
+from openpyxl.utils.cell import column_index_from_string
+
+import carga_dados
+import localidades
+
+try:
+    import pyarrow.feather as feather
+except ImportError:  # Sem pyarrow as planilhas são relidas a cada carga
+    feather = None
+
+# Onde cada fonte está na planilha original do INCA: arquivo, aba (None = a primeira), intervalo das linhas
+# de dados em notação A1 (sem a linha final = até o fim da aba) e a coluna do esquema de cada coluna do
+# intervalo (None = coluna ignorada). Sobrescrito por um JSON com a mesma estrutura (--mapeamento).
+MAPEAMENTOS = {
+    'mortalidade': {
+        'arquivo': "mortalidade_tabela2.xlsx", 'planilha': None, 'intervalo': "A2:E",
+        'colunas': ['UF', 'Regiao', 'Obitos', 'Taxa_bruta', 'Taxa_mortalidade_ajustada'],
+    },
+    'nunca_mamografia': {
+        'arquivo': "nunca_mamografia_fig15.xlsx", 'planilha': None, 'intervalo': "A2:C",
+        'colunas': ['UF', 'Regiao', 'Percentual_nunca_fez_exame'],
+    },
+    'mamografos_uf': {
+        'arquivo': "mamografos_regiao_tabela10_total.xlsx", 'planilha': None, 'intervalo': "A2:D",
+        'colunas': ['UF', 'Mamografos_existentes', 'Mamografos_em_uso', 'Utilização(%)'],
+    },
+    'mamografos_sus': {
+        'arquivo': "mamografos_regiao_tabela11_SUS.xlsx", 'planilha': None, 'intervalo': "A2:B",
+        'colunas': ['UF', 'Mamografos_SUS'],
+    },
+    'tempo_laudo': {
+        'arquivo': "tempo_laudo_rastreamento_tabela9.xlsx", 'planilha': None, 'intervalo': "A2:F",
+        'colunas': ['UF', 'Regiao', 'Total_exames', 'Ate_30_dias_%', '31_60_dias_%', 'Mais_60_dias_%'],
+    },
+    'casos': {
+        'arquivo': "numero_casos_tabela1.xlsx", 'planilha': None, 'intervalo': "A2:C",
+        'colunas': ['UF', 'Regiao', 'Numero_casos'],
+    },
+}
+
+# Linhas de subtotal das tabelas do INCA (região e país), puladas pelo rótulo da coluna UF
+ROTULOS_AGREGADOS = {'brasil', 'total', *(
+    localidades.normalizar_nome(prefixo + regiao)
+    for regiao in {regiao for *_, regiao in localidades.LOCALIDADES} for prefixo in ("", "Região ")
+)}
+
+# Marcadores de valor ausente usados nas tabelas (células com esses textos viram NaN)
+MARCADORES_AUSENTE = {'', '-', '..', '...', 'x'}
+
+# Linhas convertidas por vez: a planilha é lida linha a linha e só um bloco fica em Python puro
+TAMANHO_BLOCO = 50_000
+
+def carregar_mapeamentos(caminho=None):
+    """Mapeamentos padrão, com as fontes (ou só alguns campos delas) sobrescritas pelo JSON em caminho"""
+    mapeamentos = {fonte: dict(mapeamento) for fonte, mapeamento in MAPEAMENTOS.items()}
+    if caminho is not None:
+        with open(caminho, encoding="utf-8") as f:
+            for fonte, campos in json.load(f).items():
+                if fonte not in mapeamentos:
+                    raise ValueError(f"Fonte desconhecida no mapeamento: {fonte} (use {', '.join(MAPEAMENTOS)})")
+                mapeamentos[fonte].update(campos)
+    return mapeamentos
+
+def hash_planilha(caminho, mapeamento):
+    """Chave do cache: conteúdo da pasta de trabalho, mapeamento declarado e versão do esquema"""
+    h = hashlib.sha256(json.dumps([carga_dados.VERSAO_ESQUEMA, mapeamento], sort_keys=True).encode("utf-8"))
+    with open(caminho, "rb") as f:
+        for bloco in iter(lambda: f.read(1 << 20), b""):
+            h.update(bloco)
+    return h.hexdigest()[:16]
+
+def limites_intervalo(intervalo):
+    """(coluna inicial, linha inicial, coluna final, linha final ou None) de um intervalo como "A5:E31" ou "A5:E" """
+    partes = re.fullmatch(r"\$?([A-Z]{1,3})\$?(\d+):\$?([A-Z]{1,3})\$?(\d*)", intervalo.strip().upper())
+    if partes is None:
+        raise ValueError(f"Intervalo inválido: {intervalo} (use, por exemplo, A5:E31 ou A5:E)")
+    coluna_inicial, linha_inicial, coluna_final, linha_final = partes.groups()
+    return (column_index_from_string(coluna_inicial), int(linha_inicial),
+            column_index_from_string(coluna_final), int(linha_final) if linha_final else None)
+
+def converter_numeros(valores, inteiro):
+    """Converte células numéricas; textos seguem o padrão brasileiro ("2.381", "92,59").
+
+    Em colunas inteiras o ponto é sempre separador de milhar (o erro clássico de "2.381" virar 2,381);
+    em colunas decimais só quando o texto também tem vírgula.
+    """
+    serie = pd.Series(valores, dtype=object)
+    textos = serie.map(type).eq(str).to_numpy()
+    if textos.any():
+        texto = serie[textos].str.strip()
+        texto = texto.mask(texto.isin(MARCADORES_AUSENTE))
+        milhar = texto.str.contains(",", regex=False, na=False) | inteiro
+        texto = texto.mask(milhar, texto.str.replace(".", "", regex=False))
+        serie[textos] = pd.to_numeric(texto.str.replace(",", ".", regex=False))
+    return pd.to_numeric(serie)
+
+def _tipar_bloco(linhas, fonte, colunas):
+    """Bloco de linhas (tuplas de valores) -> DataFrame com os tipos do esquema declarado"""
+    esquema = carga_dados.ESQUEMAS[fonte]
+    valores = list(zip(*linhas)) if linhas else [()] * len(colunas)
+    bloco = {}
+    for posicao, coluna in enumerate(colunas):
+        if coluna is None:
+            continue
+        tipo = esquema[coluna]
+        if tipo in ('str', 'category'):
+            textos = pd.Series(valores[posicao], dtype=object)
+            bloco[coluna] = textos.where(textos.isna(), textos.astype(str).str.strip())
+            continue
+        try:
+            numeros = converter_numeros(valores[posicao], tipo.startswith('int'))
+        except ValueError as e:
+            raise ValueError(f"{fonte}: valor não numérico na coluna {coluna} ({e})") from None
+        if tipo.startswith('int'):
+            if numeros.isna().any() or (numeros % 1 != 0).any():
+                raise ValueError(f"{fonte}: a coluna {coluna} tem valores ausentes ou não inteiros")
+        bloco[coluna] = numeros.astype(tipo)
+    return pd.DataFrame(bloco)
+
+def _linhas_dados(linhas, coluna_uf):
+    """Descarta as linhas sem UF e as de subtotal (região, país) de um bloco"""
+    rotulos = localidades.normalizar_nomes(pd.Series([linha[coluna_uf] for linha in linhas], dtype=object))
+    descartar = rotulos.isin(ROTULOS_AGREGADOS) | rotulos.isin(["", "none"])
+    return [linha for linha, descartada in zip(linhas, descartar) if not descartada]
+
+def ler_planilha(caminho, fonte, mapeamento, tamanho_bloco=TAMANHO_BLOCO):
+    """Lê uma fonte de uma planilha XLSX (modo somente leitura do openpyxl, linha a linha).
+
+    Retorna o mesmo DataFrame que carga_dados.ler_csv daria para o CSV extraído: colunas e
+    tipos do esquema declarado, linhas na ordem da planilha, sem linhas vazias e sem
+    subtotais de região/país. Regiao, se não estiver no intervalo, vem da dimensão de localidades.
+    """
+    colunas = mapeamento['colunas']
+    esquema = carga_dados.ESQUEMAS[fonte]
+    faltantes = sorted(set(esquema) - set(colunas) - {'Regiao'})
+    desconhecidas = sorted(set(colunas) - set(esquema) - {None})
+    if faltantes or desconhecidas:
+        raise ValueError(f"Mapeamento de {fonte}: faltam {faltantes}, desconhecidas {desconhecidas}")
+    coluna_uf = colunas.index('UF')
+
+    min_col, min_row, max_col, max_row = limites_intervalo(mapeamento['intervalo'])
+    if max_col - min_col + 1 != len(colunas):
+        raise ValueError(f"Mapeamento de {fonte}: o intervalo {mapeamento['intervalo']} tem "
+                         f"{max_col - min_col + 1} colunas e foram declaradas {len(colunas)}")
+
+    pasta = load_workbook(caminho, read_only=True, data_only=True)
+    try:
+        nome_planilha = mapeamento.get('planilha') or pasta.sheetnames[0]
+        if nome_planilha not in pasta.sheetnames:
+            raise ValueError(f"Aba '{nome_planilha}' não encontrada em {os.path.basename(caminho)} "
+                             f"(abas: {', '.join(pasta.sheetnames)})")
+        planilha = pasta[nome_planilha]
+        if max_row is None:
+            planilha.reset_dimensions()  # Intervalo aberto: vai até a última linha, mesmo com dimensão errada no arquivo
+        linhas_planilha = planilha.iter_rows(
+            min_row=min_row, max_row=max_row, min_col=min_col, max_col=max_col, values_only=True
+        )
+
+        blocos, linhas = [], []
+        for linha in linhas_planilha:
+            linhas.append(linha)
+            if len(linhas) == tamanho_bloco:
+                blocos.append(_tipar_bloco(_linhas_dados(linhas, coluna_uf), fonte, colunas))
+                linhas = []
+        if linhas or not blocos:
+            blocos.append(_tipar_bloco(_linhas_dados(linhas, coluna_uf), fonte, colunas))
+    finally:
+        pasta.close()
+
+    tabela = pd.concat(blocos, ignore_index=True)
+    if 'Regiao' in esquema and 'Regiao' not in tabela:
+        dimensao = localidades.tabela_localidades()
+        codigos, _ = localidades.codificar_localidades(tabela['UF'], dimensao)
+        regioes = dimensao.set_index('Cod_IBGE')['Regiao'].astype(str)
+        tabela['Regiao'] = regioes.reindex(codigos).to_numpy()
+    return tabela[list(esquema)].astype({coluna: 'category' for coluna, tipo in esquema.items() if tipo == 'category'})
+
+def caminho_cache(fonte, chave, base_path=carga_dados.DIRETORIO_DADOS):
+    """Arquivo Feather com a fonte já lida de uma versão da planilha"""
+    return os.path.join(carga_dados.diretorio_cache(base_path), f"planilha_{fonte}_{chave}.feather")
+
+def carregar_planilha(caminho, fonte, mapeamento, base_path=carga_dados.DIRETORIO_DADOS):
+    """ler_planilha com cache em Feather pela chave hash_planilha (só relê se a pasta ou o mapeamento mudar)"""
+    if feather is None:
+        return ler_planilha(caminho, fonte, mapeamento)
+
+    chave = hash_planilha(caminho, mapeamento)
+    destino = caminho_cache(fonte, chave, base_path)
+    if os.path.exists(destino):
+        try:
+            return feather.read_table(destino).to_pandas()
+        except OSError:
+            pass
+
+    tabela = ler_planilha(caminho, fonte, mapeamento)
+    try:
+        cache = carga_dados.diretorio_cache(base_path)
+        os.makedirs(cache, exist_ok=True)
+        carga_dados._gravar_atomico(destino, lambda tmp: feather.write_feather(tabela, tmp))
+        prefixo = f"planilha_{fonte}_"
+        for arquivo in os.listdir(cache):
+            if arquivo.startswith(prefixo) and arquivo.endswith(".feather") and arquivo != os.path.basename(destino):
+                os.remove(os.path.join(cache, arquivo))
+    except OSError:
+        pass  # Diretório somente leitura: segue sem cache
+    return tabela
+
+def ler_planilhas(diretorio, mapeamentos=None, base_path=carga_dados.DIRETORIO_DADOS):
+    """Lê todas as fontes das planilhas: dicionário nome -> DataFrame, como carga_dados.ler_fontes"""
+    mapeamentos = MAPEAMENTOS if mapeamentos is None else mapeamentos
+    return {
+        fonte: carregar_planilha(os.path.join(diretorio, mapeamento['arquivo']), fonte, mapeamento, base_path)
+        for fonte, mapeamento in mapeamentos.items()
+    }
+
+def gravar_csvs(fontes, base_path=carga_dados.DIRETORIO_DADOS):
+    """Grava cada fonte no CSV de origem (carga_dados.ARQUIVOS_FONTE), de forma atômica.
+
+    Os decimais saem sem resíduo do float32 e Total_exames sem separador de milhar
+    (a leitura aceita os dois formatos).
+    """
+    caminhos = []
+    for fonte, tabela in fontes.items():
+        caminho = os.path.join(base_path, carga_dados.ARQUIVOS_FONTE[fonte])
+        saida = carga_dados.para_float64(tabela)
+        carga_dados._gravar_atomico(caminho, lambda tmp: saida.to_csv(tmp, index=False))
+        caminhos.append(caminho)
+    return caminhos
+
+# Extrair os CSVs das planilhas originais do INCA
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Lê as planilhas XLSX originais do INCA e gera os CSVs de origem")
+    parser.add_argument("planilhas", help="Diretório com as pastas de trabalho .xlsx")
+    parser.add_argument("--mapeamento", default=None, help="JSON com aba/intervalo/colunas por fonte")
+    parser.add_argument("--fontes", nargs="+", choices=list(MAPEAMENTOS), default=list(MAPEAMENTOS))
+    parser.add_argument("--dados", default=carga_dados.DIRETORIO_DADOS, help="Destino dos CSVs")
+    parser.add_argument("--gravar", action="store_true", help="Grava os CSVs (sem isso só mostra as tabelas)")
+    args = parser.parse_args()
+
+    mapeamentos = carregar_mapeamentos(args.mapeamento)
+    fontes = ler_planilhas(args.planilhas, {fonte: mapeamentos[fonte] for fonte in args.fontes}, args.dados)
+    carga_dados.codificar_fontes(fontes)  # Falha aqui, com a lista das localidades não reconhecidas
+    for fonte, tabela in fontes.items():
+        print(f"== {fonte} ({len(tabela)} linhas)\n{tabela.to_string(index=False)}\n")
+    if args.gravar:
+        for caminho in gravar_csvs(fontes, args.dados):
+            print(f"Gravado {caminho}")
@@ -0,0 +1,252 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+import carga_dados
+import score
+
+# Opções do filtro de criticidade da aba de ranking
+NIVEIS_FILTRO = ['Todos', 'Crítico (≥80)', 'Alto (60-79)', 'Médio (40-59)', 'Baixo (20-39)', 'Muito Baixo (<20)']
+
+# Faixa de score.NIVEIS_CRITICIDADE correspondente a cada opção do filtro (intervalos [início, fim), sem lacunas)
+FAIXA_POR_FILTRO = dict(zip(NIVEIS_FILTRO[1:], reversed(score.NIVEIS_CRITICIDADE)))
+
+# Tamanho padrão do Top-K (uma página da tabela de ranking)
+LINHAS_TOP_K = 50
+
+# Colunas com índice bitmap: nome do filtro -> coluna de dados_score
+COLUNAS_INDICE = {
+    'regiao': 'Regiao',
+    'criticidade': 'Criticidade',
+}
+
+def indice_bitmap(valores):
+    """Índice bitmap de uma coluna: {valor: bits compactados (np.packbits) das linhas com esse valor}"""
+    codigos, unicos = pd.factorize(valores)
+    return {valor: np.packbits(codigos == codigo) for codigo, valor in enumerate(unicos)}
+
+def indice_faixas(valores, limites, rotulos):
+    """Índice bitmap de uma coluna numérica discretizada em faixas [início, fim)"""
+    faixas = pd.cut(np.asarray(valores), limites, labels=rotulos, right=False)
+    return {rotulo: np.packbits(faixas == rotulo) for rotulo in rotulos}
+
+def construir_indices(dados_score, colunas=COLUNAS_INDICE):
+    """Índices bitmap por filtro, construídos uma vez por versão dos scores.
+
+    Retorna {'n': linhas, 'bitmaps': {filtro: {valor: bits}}}. Novos filtros (ano, UF,
+    faixa de participação do SUS) entram como mais uma entrada em 'bitmaps'.
+    """
+    return {
+        'n': len(dados_score),
+        'bitmaps': {filtro: indice_bitmap(dados_score[coluna]) for filtro, coluna in colunas.items()},
+    }
+
+def resolver_filtros(indices, filtros):
+    """Posições (iloc) das linhas que atendem a todos os filtros {filtro: valor}, por interseção de bitmaps.
+
+    Valores None não filtram; um valor ausente do índice não seleciona nenhuma linha.
+    """
+    selecao = None
+    for filtro, valor in filtros.items():
+        if valor is None:
+            continue
+        bits = indices['bitmaps'][filtro].get(valor)
+        if bits is None:
+            return np.empty(0, dtype=np.intp)
+        selecao = bits if selecao is None else np.bitwise_and(selecao, bits)
+
+    if selecao is None:
+        return np.arange(indices['n'])
+    return np.flatnonzero(np.unpackbits(selecao, count=indices['n']))
+
+def filtrar_ranking(dados_score, regiao_filtro='Todas', nivel_criticidade='Todos', indices=None):
+    """Aplica os filtros de região e nível de criticidade da aba de ranking.
+
+    Com indices (de construir_indices sobre o mesmo dados_score) o filtro é só a interseção
+    dos bitmaps; sem eles, os índices são construídos na hora.
+    """
+    if indices is None:
+        indices = construir_indices(dados_score)
+
+    posicoes = resolver_filtros(indices, {
+        'regiao': None if regiao_filtro == 'Todas' else regiao_filtro,
+        'criticidade': FAIXA_POR_FILTRO.get(nivel_criticidade),
+    })
+    if len(posicoes) == len(dados_score):
+        return dados_score
+    return dados_score.iloc[posicoes]
+
+def top_k(valores, k):
+    """Posições das k maiores linhas, em ordem decrescente, sem ordenar o vetor inteiro.
+
+    Seleção parcial (np.argpartition, O(n)) seguida da ordenação só das k escolhidas;
+    empates seguem a ordem original das linhas e NaN fica por último.
+    """
+    valores = np.asarray(valores, dtype=float)
+    valores = np.where(np.isnan(valores), -np.inf, valores)
+    k = min(k, len(valores))
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+
+    if k < len(valores):
+        limite = np.partition(valores, len(valores) - k)[len(valores) - k]
+        # Todas as linhas acima do limite e, entre as empatadas no limite, as primeiras
+        candidatas = np.flatnonzero(valores >= limite)
+    else:
+        candidatas = np.arange(len(valores))
+    escolhidas = candidatas[np.lexsort((candidatas, -valores[candidatas]))]
+    return escolhidas[:k]
+
+def top_k_criticidade(dados_score, k=LINHAS_TOP_K):
+    """As k UFs/municípios mais críticos (dados de score.aplicar_score, em qualquer ordem)"""
+    return dados_score.iloc[top_k(dados_score['Score_Consolidado'].to_numpy(), k)]
+
+def posicoes(valores, grupos=None):
+    """Posição de cada linha (1 = maior valor), dentro de cada grupo se grupos for dado.
+
+    Vetorizado com uma única ordenação (np.lexsort por grupo e valor); empates recebem a
+    média das posições, como rank(ascending=False). NaN fica sem posição.
+    Retorna (posições float64, tamanho do grupo de cada linha).
+    """
+    valores = np.asarray(valores, dtype=float)
+    n = len(valores)
+    validos = ~np.isnan(valores)
+    grupos = np.zeros(n, dtype=np.intp) if grupos is None else pd.factorize(grupos)[0]
+    # NaN vai para um grupo próprio, que não é contado
+    grupos = np.where(validos, grupos, -1)
+
+    ordem = np.lexsort((-valores, grupos))
+    grupos_ordenados, valores_ordenados = grupos[ordem], valores[ordem]
+    inicio_grupo = np.r_[True, grupos_ordenados[1:] != grupos_ordenados[:-1]]
+    inicio_empate = inicio_grupo | np.r_[True, valores_ordenados[1:] != valores_ordenados[:-1]]
+
+    indices = np.arange(n)
+    primeira_do_grupo = np.maximum.accumulate(np.where(inicio_grupo, indices, 0))
+    bloco_empate = np.cumsum(inicio_empate) - 1
+    primeira_do_empate = indices[inicio_empate][bloco_empate]
+    ultima_do_empate = np.r_[indices[inicio_empate][1:] - 1, n - 1][bloco_empate]
+    tamanho_ordenado = np.diff(np.r_[indices[inicio_grupo], n])[np.cumsum(inicio_grupo) - 1]
+
+    resultado, tamanho = np.empty(n), np.empty(n, dtype=np.int64)
+    resultado[ordem] = (primeira_do_empate + ultima_do_empate) / 2 - primeira_do_grupo + 1
+    tamanho[ordem] = tamanho_ordenado
+    resultado[~validos] = np.nan
+    return resultado, tamanho
+
+def construir_posicoes(dados, colunas=carga_dados.COLUNAS_AGREGADAS, chave='UF', regiao='Regiao'):
+    """Posições nacionais e regionais de cada coluna, calculadas uma vez por versão dos dados.
+
+    Retorna {'n', 'linha': {chave: linha}, 'posicao': {coluna: array}, 'n_validos': {coluna: int},
+    'posicao_regiao': {coluna: array}, 'n_regiao': {coluna: array}}; as consultas de uma
+    entidade (posicao_entidade, percentil_entidade) são acesso direto por linha.
+    """
+    numericas = carga_dados.para_float64(dados[[coluna for coluna in colunas if coluna in dados.columns]])
+    regioes = dados[regiao].to_numpy()
+
+    motor = {
+        'n': len(dados),
+        'linha': {valor: linha for linha, valor in enumerate(dados[chave].tolist())},
+        'posicao': {}, 'n_validos': {}, 'posicao_regiao': {}, 'n_regiao': {},
+    }
+    for coluna in numericas.columns:
+        valores = numericas[coluna].to_numpy()
+        motor['posicao'][coluna], _ = posicoes(valores)
+        motor['n_validos'][coluna] = int((~np.isnan(valores)).sum())
+        motor['posicao_regiao'][coluna], motor['n_regiao'][coluna] = posicoes(valores, regioes)
+    return motor
+
+def caminho_posicoes(versao, base_path=carga_dados.DIRETORIO_DADOS):
+    """Arquivo .npz com as posições de uma versão (e dos parâmetros do score, que também é ranqueado)"""
+    return os.path.join(carga_dados.diretorio_cache(base_path), f"posicoes_{versao}_{score.assinatura_parametros()}.npz")
+
+def carregar_posicoes(dados, versao, base_path=carga_dados.DIRETORIO_DADOS, chave='UF'):
+    """Posições da versão, lidas do cache em disco (.npz) ou calculadas e persistidas"""
+    caminho = caminho_posicoes(versao, base_path)
+    try:
+        with np.load(caminho, allow_pickle=False) as arquivo:
+            colunas = [str(coluna) for coluna in arquivo['colunas']]
+            return {
+                'n': int(arquivo['n']),
+                'linha': {valor: linha for linha, valor in enumerate(dados[chave].tolist())},
+                'posicao': {coluna: arquivo[f'posicao/{coluna}'] for coluna in colunas},
+                'n_validos': {coluna: int(n) for coluna, n in zip(colunas, arquivo['n_validos'])},
+                'posicao_regiao': {coluna: arquivo[f'posicao_regiao/{coluna}'] for coluna in colunas},
+                'n_regiao': {coluna: arquivo[f'n_regiao/{coluna}'] for coluna in colunas},
+            }
+    except (OSError, KeyError, ValueError):
+        pass
+
+    motor = construir_posicoes(dados, chave=chave)
+    salvar_posicoes(motor, versao, base_path)
+    return motor
+
+def salvar_posicoes(motor, versao, base_path=carga_dados.DIRETORIO_DADOS):
+    """Persiste posições já calculadas (ex.: as mantidas pelo pipeline) e remove versões antigas"""
+    caminho = caminho_posicoes(versao, base_path)
+    colunas = list(motor['posicao'])
+    try:
+        os.makedirs(carga_dados.diretorio_cache(base_path), exist_ok=True)
+
+        def escrever(temporario):
+            with open(temporario, "wb") as f:
+                np.savez(
+                    f, n=motor['n'], colunas=np.array(colunas),
+                    n_validos=np.array([motor['n_validos'][coluna] for coluna in colunas]),
+                    **{f'{tipo}/{coluna}': motor[tipo][coluna]
+                       for tipo in ('posicao', 'posicao_regiao', 'n_regiao') for coluna in colunas},
+                )
+
+        carga_dados._gravar_atomico(caminho, escrever)
+        for arquivo in os.listdir(carga_dados.diretorio_cache(base_path)):
+            if arquivo.startswith("posicoes_") and arquivo != os.path.basename(caminho):
+                os.remove(os.path.join(carga_dados.diretorio_cache(base_path), arquivo))
+    except OSError:
+        pass  # Sem cache em disco: as posições ainda ficam em memória
+
+def posicao_entidade(motor, coluna, valor_chave, regional=False):
+    """Posição de uma entidade (1 = maior valor) na coluna, nacional ou dentro da região — O(1)"""
+    linha = motor['linha'][valor_chave]
+    return float(motor['posicao_regiao' if regional else 'posicao'][coluna][linha])
+
+def total_comparado(motor, coluna, valor_chave, regional=False):
+    """Quantas entidades entram na comparação (com valor), no país ou na região da entidade"""
+    if regional:
+        return int(motor['n_regiao'][coluna][motor['linha'][valor_chave]])
+    return motor['n_validos'][coluna]
+
+def percentil_entidade(motor, coluna, valor_chave, regional=False):
+    """Percentil (0-1, maior = maior valor) da entidade, igual a rank(pct=True)"""
+    total = total_comparado(motor, coluna, valor_chave, regional)
+    return (total + 1 - posicao_entidade(motor, coluna, valor_chave, regional)) / total
+
+def montar_tabela(dados_score, estado_selecionado=None, intervalos=None, primeira_posicao=1):
+    """Monta a tabela de exibição do ranking, coluna a coluna.
+
+    Com intervalos (tabela de incerteza.bootstrap_criticidade) inclui o intervalo de 95%
+    da posição nacional de cada UF (vazio para UFs que não estão nos intervalos, como os de
+    outra versão). primeira_posicao numera blocos de uma tabela maior.
+    """
+    tabela = pd.DataFrame({
+        'Posição': np.arange(primeira_posicao, primeira_posicao + len(dados_score)),
+        '📍': np.where(dados_score['UF'].to_numpy() == estado_selecionado, '📍', ''),
+        'UF': dados_score['UF'].to_numpy(),
+        'Região': dados_score['Regiao'].to_numpy(),
+        'Score Crítico': dados_score['Score_Consolidado'].to_numpy(),
+        'Criticidade': dados_score['Criticidade'].to_numpy(),
+        'Mortalidade': dados_score['Taxa_mortalidade_ajustada'].round(1).to_numpy(),
+        '% Não Rastreadas': dados_score['Percentual_nunca_fez_exame'].round(1).to_numpy(),
+        '% Laudos >60d': dados_score['Mais_60_dias_%'].round(1).to_numpy(),
+        'Óbitos': dados_score['Obitos'].to_numpy(),
+    })
+    if intervalos is not None:
+        linhas = pd.Index(intervalos['UF']).get_indexer(dados_score['UF'])
+        # get_indexer devolve -1 para UFs ausentes: sem a máscara, elas mostrariam o intervalo da última linha
+        encontradas = linhas >= 0
+        inferior = intervalos['Posicao_p025'].to_numpy()[linhas]
+        superior = intervalos['Posicao_p975'].to_numpy()[linhas]
+        tabela.insert(5, 'IC 95% Posição', [
+            ("" if not encontrada else f"{a}º–{b}º" if a != b else f"{a}º")
+            for encontrada, a, b in zip(encontradas, inferior, superior)
+        ])
+    return tabela
@@ -0,0 +1,150 @@
+import os
+import threading
+import time
+
+import carga_dados
+import pipeline
+import ranking
+
+# Intervalo (s) entre verificações dos CSVs de origem
+INTERVALO_PADRAO = 2.0
+
+# Um observador por diretório de dados, compartilhado por todas as sessões do processo
+_observadores = {}
+_trava = threading.Lock()
+
+def persistir_versao(estado):
+    """Preparador padrão: grava snapshot, agregados e posições da nova versão antes da troca.
+
+    Agregados e posições são os mantidos pelo pipeline (nada é recalculado aqui); assim os outros
+    processos (relatorios.py, CLIs) também encontram os caches da nova versão prontos.
+    """
+    base_path, versao = estado['base_path'], estado['versao']
+    consolidado = estado['dados'].drop(columns=pipeline.COLUNAS_NO_SCORE)
+    carga_dados.salvar_snapshot(consolidado, versao, base_path)
+    carga_dados.salvar_agregados(estado['agregados'], versao, base_path)
+    ranking.salvar_posicoes(estado['posicoes'], versao, base_path)
+
+def _preparar_e_trocar(observador, novo, relatorio):
+    """Roda os preparadores sobre a nova versão e só então a publica (uma única atribuição).
+
+    Tudo sob a trava de troca do observador: um preparador registrado depois (observar) nunca
+    roda sobre a versão anterior enquanto esta troca acontece e termina por último.
+    """
+    with observador['trava_troca']:
+        for preparar in observador['preparadores']:
+            preparar(novo)
+        observador['ativo'] = novo
+        observador['trocas'] += 1
+        observador['ultima_troca'] = {**relatorio, 'versao': novo['versao'], 'quando': time.time()}
+
+def verificar(observador):
+    """Uma verificação: aplica as fontes alteradas (incrementalmente) e troca a versão se ela mudou.
+
+    Uma fonte só é aplicada quando mtime/tamanho ficam iguais entre duas verificações seguidas,
+    para não ler um arquivo ainda sendo copiado. Em caso de erro (de leitura, de validação ou de
+    um preparador) a versão anterior continua ativa, o erro fica registrado e a thread segue verificando.
+    """
+    base_path = observador['base_path']
+    ativo = observador['ativo']
+    try:
+        if ativo is None:
+            inicio = time.perf_counter()
+            novo = pipeline.construir_estado(base_path)
+            _preparar_e_trocar(observador, novo, {'fontes': list(novo['hashes']), 'segundos': time.perf_counter() - inicio})
+        else:
+            assinaturas = {
+                nome: pipeline.assinatura_arquivo(os.path.join(base_path, arquivo))
+                for nome, arquivo in carga_dados.ARQUIVOS_FONTE.items()
+            }
+            estavel = assinaturas == observador['assinaturas_vistas']
+            observador['assinaturas_vistas'] = assinaturas
+            if assinaturas != ativo['assinaturas'] and estavel:
+                novo, relatorio = pipeline.atualizar_estado(ativo)
+                if novo['versao'] != ativo['versao']:
+                    _preparar_e_trocar(observador, novo, relatorio)
+                else:
+                    observador['ativo'] = novo  # Só as assinaturas mudaram
+        observador['erro'] = None
+    except Exception as e:  # Qualquer falha: uma exceção não tratada mataria a thread em silêncio
+        observador['erro'] = f"{type(e).__name__}: {e}"
+    observador['verificado_em'] = time.time()
+
+def _ciclo(observador):
+    while not observador['parar'].wait(observador['intervalo']):
+        verificar(observador)
+
+def observar(base_path=carga_dados.DIRETORIO_DADOS, intervalo=INTERVALO_PADRAO, preparar=None):
+    """Inicia (uma vez por diretório) o observador dos CSVs em segundo plano e retorna seu estado.
+
+    A primeira versão é construída na chamada; as seguintes são montadas na thread do observador,
+    fora do caminho das requisições. preparar(estado) roda para cada nova versão antes da troca
+    (e, ao ser registrado, sobre a versão já ativa).
+    """
+    with _trava:
+        observador = _observadores.get(base_path)
+        if observador is None:
+            observador = {
+                'base_path': base_path,
+                'intervalo': intervalo,
+                'preparadores': [persistir_versao],
+                'ativo': None,
+                'assinaturas_vistas': None,
+                'trocas': 0,
+                'ultima_troca': None,
+                'erro': None,
+                'verificado_em': None,
+                'parar': threading.Event(),
+                'trava_troca': threading.Lock(),
+            }
+            verificar(observador)
+            observador['thread'] = threading.Thread(
+                target=_ciclo, args=(observador,), name=f"recarga:{base_path}", daemon=True
+            )
+            observador['thread'].start()
+            _observadores[base_path] = observador
+
+        if preparar is not None:
+            # Mesma trava da troca: o preparador vê a versão ativa e, depois dele, só versões mais novas
+            with observador['trava_troca']:
+                if preparar not in observador['preparadores']:
+                    observador['preparadores'].append(preparar)
+                    if observador['ativo'] is not None:
+                        preparar(observador['ativo'])
+    return observador
+
+def parar(base_path=carga_dados.DIRETORIO_DADOS):
+    """Encerra o observador de um diretório (a versão ativa deixa de ser atualizada)"""
+    with _trava:
+        observador = _observadores.pop(base_path, None)
+    if observador is not None:
+        observador['parar'].set()
+        observador['thread'].join()
+
+def estado_ativo(base_path=carga_dados.DIRETORIO_DADOS):
+    """Estado da versão ativa (pipeline.construir_estado); None se nenhuma versão carregou"""
+    observador = _observadores.get(base_path)
+    return None if observador is None else observador['ativo']
+
+def estado_da_versao(versao, base_path=carga_dados.DIRETORIO_DADOS):
+    """Estado ativo se ele for da versão pedida; None se a versão já foi trocada (ou nada carregou)"""
+    estado = estado_ativo(base_path)
+    return estado if estado is not None and estado['versao'] == versao else None
+
+def versao_ativa(base_path=carga_dados.DIRETORIO_DADOS):
+    """Id da versão ativa: chave dos caches por versão; None se nenhuma versão carregou"""
+    estado = estado_ativo(base_path)
+    return None if estado is None else estado['versao']
+
+def situacao(base_path=carga_dados.DIRETORIO_DADOS):
+    """Resumo do observador para depuração: versão ativa, trocas, última troca e último erro"""
+    observador = _observadores.get(base_path)
+    if observador is None:
+        return None
+    return {
+        'versao': versao_ativa(base_path),
+        'trocas': observador['trocas'],
+        'ultima_troca': observador['ultima_troca'],
+        'erro': observador['erro'],
+        'verificado_em': observador['verificado_em'],
+    }
@@ -0,0 +1,177 @@
+import argparse
+import hashlib
+import html
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import carga_dados
+import figuras
+import localidades
+import ranking
+import score
+
+# Alterar quando o layout do relatório mudar, para forçar a regeneração
+VERSAO_MODELO = "1"
+
+DIRETORIO_RELATORIOS = os.path.join(carga_dados.DIRETORIO_DADOS, "relatorios")
+
+# Indicadores exibidos no relatório: (coluna, rótulo, formato)
+INDICADORES_RELATORIO = [
+    ('Taxa_mortalidade_ajustada', "Taxa de mortalidade ajustada (por 100 mil)", "{:.1f}"),
+    ('Taxa_bruta', "Taxa bruta de mortalidade (por 100 mil)", "{:.1f}"),
+    ('Obitos', "Óbitos registrados (2022)", "{:.0f}"),
+    ('Percentual_nunca_fez_exame', "Mulheres 50-69 anos que nunca fizeram mamografia", "{:.1f}%"),
+    ('Mais_60_dias_%', "Laudos com mais de 60 dias", "{:.1f}%"),
+    ('Utilizacao_%', "Utilização de mamógrafos", "{:.1f}%"),
+    ('Mamografos_SUS', "Mamógrafos do SUS", "{:.0f}"),
+]
+
+# Estado do processo worker (carregado uma vez por processo)
+_contexto = {}
+
+def _iniciar_worker(base_path, versao):
+    """Carrega dados, scores, agregados e posições uma única vez em cada processo do pool"""
+    dados = score.aplicar_score(carga_dados.carregar_dados(base_path, versao))
+    _contexto['dados'] = dados
+    _contexto['indice'] = carga_dados.construir_indice_estados(dados)
+    _contexto['agregados'] = carga_dados.carregar_agregados(dados, versao, base_path)
+    _contexto['posicoes'] = ranking.carregar_posicoes(dados, versao, base_path)
+
+def nome_arquivo(uf):
+    """Nome do arquivo HTML do relatório de uma UF"""
+    return "relatorio_" + "".join(c if c.isalnum() else "_" for c in uf.lower()) + ".html"
+
+def impressao_digital(uf, dados, indice, agregados, posicoes):
+    """Hash das entradas de um relatório: registro do estado, médias BR e taxas usadas no gráfico"""
+    entradas = {
+        'modelo': VERSAO_MODELO,
+        'registro': indice['registro'][uf],
+        'media': agregados['media'],
+        'posicao': {coluna: ranking.posicao_entidade(posicoes, coluna, uf) for coluna in posicoes['posicao']},
+        'taxas': carga_dados.para_float64(dados[['UF', 'Taxa_mortalidade_ajustada']]).to_numpy().tolist(),
+    }
+    conteudo = json.dumps(entradas, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(conteudo.encode("utf-8")).hexdigest()
+
+def montar_relatorio(uf, dados, indice, agregados, posicoes):
+    """Monta o HTML do relatório de uma UF reaproveitando as figuras do dashboard"""
+    estado_data = indice['registro'][uf]
+    score_estado = estado_data['Score_Consolidado']
+    nivel = estado_data['Criticidade']
+    posicao = int(ranking.posicao_entidade(posicoes, 'Score_Consolidado', uf))
+
+    linhas = "".join(
+        f"<tr><td>{html.escape(rotulo)}</td><td>{formato.format(estado_data[coluna])}</td>"
+        f"<td>{formato.format(agregados['media'][coluna])}</td></tr>"
+        for coluna, rotulo, formato in INDICADORES_RELATORIO
+    )
+
+    graficos = [
+        figuras.figura_consolidada(estado_data, agregados, uf),
+        figuras.figura_mortalidade(dados, agregados, uf),
+        figuras.figura_tempo_laudo(estado_data),
+    ]
+    # plotly.js incluído uma vez (CDN), no primeiro gráfico
+    html_graficos = "".join(
+        fig.to_html(full_html=False, include_plotlyjs="cdn" if i == 0 else False)
+        for i, fig in enumerate(graficos)
+    )
+
+    return f"""<!DOCTYPE html>
+<html lang="pt-BR">
+<head><meta charset="utf-8"><title>Câncer de Mama - {html.escape(uf)}</title>
+<style>body{{font-family:sans-serif;max-width:1000px;margin:auto}}table{{border-collapse:collapse}}td,th{{border:1px solid #ccc;padding:4px 8px}}</style>
+</head>
+<body>
+<h1>🎀 Câncer de Mama - {html.escape(uf)}</h1>
+<p><b>Score de criticidade:</b> {score_estado:.1f}/100 ({html.escape(str(nivel))}) — {posicao}º de {agregados['n']} estados</p>
+<table><tr><th>Indicador</th><th>{html.escape(uf)}</th><th>Média BR</th></tr>{linhas}</table>
+{html_graficos}
+<p><b>Fonte</b>: INCA - Instituto Nacional de Câncer (Dados 2022-2024)</p>
+</body>
+</html>
+"""
+
+def gerar_relatorio(uf, destino):
+    """Tarefa do pool: gera e grava o relatório de uma UF (usa o contexto do worker)"""
+    conteudo = montar_relatorio(uf, _contexto['dados'], _contexto['indice'], _contexto['agregados'], _contexto['posicoes'])
+    caminho = os.path.join(destino, nome_arquivo(uf))
+    with open(caminho, "w", encoding="utf-8") as f:
+        f.write(conteudo)
+    return uf
+
+def resolver_estados(estados, indice):
+    """Nomes das UFs pedidas (nome, sigla ou código IBGE, com ou sem acentos) pela dimensão de localidades.
+
+    Levanta ValueError com os valores válidos se algum não for reconhecido.
+    """
+    tabela = localidades.tabela_localidades()
+    nomes = dict(zip(tabela['Cod_IBGE'].tolist(), tabela['UF'].tolist()))
+    resolvidos, desconhecidos = [], []
+    for texto in estados:
+        codigo = localidades.codigo_localidade(texto, tabela)
+        if codigo is None or nomes[codigo] not in indice['registro']:
+            desconhecidos.append(texto)
+        else:
+            resolvidos.append(nomes[codigo])
+    if desconhecidos:
+        raise ValueError(f"UFs não reconhecidas: {', '.join(desconhecidos)} "
+                         f"(use o nome, a sigla ou o código IBGE: {', '.join(tabela['Sigla'].tolist())})")
+    return list(dict.fromkeys(resolvidos))
+
+def gerar_relatorios(estados=None, destino=DIRETORIO_RELATORIOS, base_path=carga_dados.DIRETORIO_DADOS,
+                     processos=None, forcar=False):
+    """Gera os relatórios por UF em paralelo, pulando os que não mudaram desde a última execução"""
+    versao = carga_dados.hash_fontes(base_path)
+    _iniciar_worker(base_path, versao)
+    dados, indice, agregados, posicoes = (
+        _contexto['dados'], _contexto['indice'], _contexto['agregados'], _contexto['posicoes']
+    )
+
+    os.makedirs(destino, exist_ok=True)
+    caminho_manifesto = os.path.join(destino, "manifesto.json")
+    manifesto = carga_dados.ler_json(caminho_manifesto)
+
+    estados = list(indice['registro']) if estados is None else resolver_estados(estados, indice)
+    digitais = {uf: impressao_digital(uf, dados, indice, agregados, posicoes) for uf in estados}
+    pendentes = [
+        uf for uf in estados
+        if forcar or manifesto.get(uf) != digitais[uf] or not os.path.exists(os.path.join(destino, nome_arquivo(uf)))
+    ]
+
+    inicio = time.perf_counter()
+    if pendentes:
+        with ProcessPoolExecutor(max_workers=processos, initializer=_iniciar_worker,
+                                 initargs=(base_path, versao)) as executor:
+            for uf in executor.map(gerar_relatorio, pendentes, [destino] * len(pendentes)):
+                manifesto[uf] = digitais[uf]
+    duracao = time.perf_counter() - inicio
+
+    with open(caminho_manifesto, "w", encoding="utf-8") as f:
+        json.dump(manifesto, f, ensure_ascii=False, indent=1)
+
+    return {
+        'gerados': len(pendentes),
+        'ignorados': len(estados) - len(pendentes),
+        'segundos': duracao,
+        'relatorios_por_segundo': len(pendentes) / duracao if duracao > 0 else 0.0,
+    }
+
+# Executar geração em lote
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera um relatório HTML por UF")
+    parser.add_argument("--destino", default=DIRETORIO_RELATORIOS)
+    parser.add_argument("--estados", nargs="*", help="UFs a gerar: nome, sigla ou código IBGE (padrão: todas)")
+    parser.add_argument("--processos", type=int, default=None)
+    parser.add_argument("--forcar", action="store_true", help="Regenera mesmo sem mudanças")
+    args = parser.parse_args()
+
+    print("Gerando relatórios por estado...")
+    try:
+        resultado = gerar_relatorios(args.estados, args.destino, processos=args.processos, forcar=args.forcar)
+    except ValueError as e:
+        parser.error(str(e))
+    print(f"✅ {resultado['gerados']} gerados, {resultado['ignorados']} sem alterações "
+          f"({resultado['segundos']:.2f}s, {resultado['relatorios_por_segundo']:.1f} relatórios/s)")
@@ -0,0 +1,167 @@
+import hashlib
+import json
+
+import numpy as np
+import pandas as pd
+
+import carga_dados
+
+# Indicadores que compõem o score de criticidade, na ordem dos pesos
+INDICADORES_SCORE = ['Taxa_mortalidade_ajustada', 'Percentual_nunca_fez_exame', 'Mais_60_dias_%']
+COLUNAS_SCORE = ['Score_Mortalidade', 'Score_Nao_Rastreadas', 'Score_Laudos_Lentos']
+
+# Pesos: Mortalidade 35%, Não rastreadas 35%, Laudos lentos 30%
+PESOS_PADRAO = np.array([0.35, 0.35, 0.30])
+
+# Faixas de criticidade do Score_Consolidado (intervalos [início, fim), sem lacunas)
+LIMITES_CRITICIDADE = [-np.inf, 20, 40, 60, 80, np.inf]
+NIVEIS_CRITICIDADE = ['🟢 Muito Baixo', '🟢 Baixo', '🟡 Médio', '🟠 Alto', '🔴 Crítico']
+
+# Máximo de classes por entidade nos histogramas de posições (entidades x classes). Até este número
+# de entidades cada classe é uma posição (quantis exatos); acima, as posições são agrupadas para a
+# memória ficar em entidades x MAX_CLASSES_POSICAO (~45 MB para os 5.570 municípios, e não ~250 MB)
+MAX_CLASSES_POSICAO = 1024
+
+def assinatura_parametros():
+    """Hash dos pesos e das faixas de criticidade: entra na chave dos caches com valores derivados do score"""
+    parametros = [PESOS_PADRAO.tolist(), [str(limite) for limite in LIMITES_CRITICIDADE], NIVEIS_CRITICIDADE]
+    return hashlib.sha256(json.dumps(parametros, ensure_ascii=False).encode("utf-8")).hexdigest()[:8]
+
+def normalizar_max(indicadores):
+    """Normaliza cada coluna (indicador) para a escala 0-100 dividindo pelo máximo"""
+    indicadores = np.asarray(indicadores, dtype=float)
+    return indicadores / np.nanmax(indicadores, axis=0) * 100
+
+def ranquear(scores):
+    """Posição de cada entidade (1 = mais crítica) em cada linha de scores (cenário x entidade)"""
+    scores = np.atleast_2d(scores)
+    ordem = np.argsort(-scores, axis=1, kind='stable')
+    posicoes = np.empty_like(ordem)
+    np.put_along_axis(posicoes, ordem, np.arange(1, scores.shape[1] + 1), axis=1)
+    return posicoes
+
+def largura_classe_posicao(n_entidades, max_classes=MAX_CLASSES_POSICAO):
+    """Posições agrupadas em cada classe do histograma de posições (1 = uma classe por posição)"""
+    return max(1, -(-n_entidades // max_classes))
+
+def histograma_posicoes(n_entidades, max_classes=MAX_CLASSES_POSICAO):
+    """Histograma vazio entidades x classes de posição e a largura (em posições) de cada classe"""
+    largura = largura_classe_posicao(n_entidades, max_classes)
+    return np.zeros((n_entidades, -(-n_entidades // largura)), dtype=np.int64), largura
+
+def acumular_posicoes(contagem, posicoes, largura):
+    """Soma ao histograma as posições (base 1) de um lote de cenários (cenários x entidades)"""
+    n_entidades, n_classes = contagem.shape
+    chaves = np.arange(n_entidades) * n_classes + (posicoes - 1) // largura
+    contagem += np.bincount(chaves.ravel(), minlength=contagem.size).reshape(contagem.shape)
+
+def quantil_posicoes(contagem, total, probabilidade, largura):
+    """Posição (base 1) do quantil de cada entidade a partir do histograma de posições.
+
+    Com classes de uma posição o resultado é exato. Com classes maiores, quantis abaixo da
+    mediana usam a primeira posição da classe e acima dela a última (o intervalo nunca fica
+    mais estreito que o exato); a mediana usa o centro da classe.
+    """
+    n_entidades = contagem.shape[0]
+    classe = (contagem.cumsum(axis=1) >= probabilidade * total).argmax(axis=1)
+    primeira = classe * largura + 1
+    ultima = np.minimum((classe + 1) * largura, n_entidades)
+    if probabilidade < 0.5:
+        return primeira
+    if probabilidade > 0.5:
+        return ultima
+    return (primeira + ultima) // 2
+
+def classificar_criticidade(scores):
+    """Faixa de criticidade de cada score como coluna categórica (vetorizado com pd.cut)"""
+    return pd.cut(scores, LIMITES_CRITICIDADE, labels=NIVEIS_CRITICIDADE, right=False)
+
+def calcular_scores(indicadores, pesos=PESOS_PADRAO, arredondar=False, normalizar=True):
+    """Avalia vários vetores de pesos de uma vez.
+
+    indicadores: matriz (entidades x indicadores); pesos: matriz (cenários x indicadores)
+    ou vetor único. Retorna (scores, posicoes), ambos (cenários x entidades).
+    Com arredondar=True reproduz o arredondamento a 1 casa usado no dashboard.
+    """
+    normalizados = normalizar_max(indicadores) if normalizar else np.asarray(indicadores, dtype=float)
+    if arredondar:
+        normalizados = normalizados.round(1)
+
+    pesos = np.atleast_2d(np.asarray(pesos, dtype=float))
+    scores = pesos @ normalizados.T
+    if arredondar:
+        scores = scores.round(1)
+
+    return scores, ranquear(scores)
+
+def aplicar_score(dados, pesos=PESOS_PADRAO):
+    """Adiciona os scores normalizados e o Score_Consolidado ao DataFrame, preservando a ordem das linhas"""
+    # Cópia rasa: as colunas originais continuam compartilhadas, só as novas são alocadas
+    dados_score = dados.copy(deep=False)
+
+    normalizados = normalizar_max(carga_dados.para_float64(dados_score[INDICADORES_SCORE]).to_numpy()).round(1)
+    dados_score[COLUNAS_SCORE] = normalizados
+
+    scores, _ = calcular_scores(normalizados, pesos, arredondar=True, normalizar=False)
+    dados_score['Score_Consolidado'] = scores[0]
+    # Faixa de criticidade atribuída uma vez por cálculo (usada pela tabela e pelos índices de filtro)
+    dados_score['Criticidade'] = classificar_criticidade(scores[0])
+
+    return dados_score
+
+def calcular_score_criticidade(dados, pesos=PESOS_PADRAO):
+    """Calcula score de criticidade para cada estado, ordenado do mais para o menos crítico"""
+    return aplicar_score(dados, pesos).sort_values('Score_Consolidado', ascending=False)
+
+def sortear_pesos(n_cenarios, n_indicadores=len(PESOS_PADRAO), rng=None, concentracao=None):
+    """Sorteia vetores de pesos no simplex (soma 1) via Dirichlet.
+
+    Sem concentracao a distribuição é uniforme; com concentracao os pesos
+    ficam em torno de PESOS_PADRAO (quanto maior, mais próximos).
+    """
+    rng = np.random.default_rng(rng)
+    alfa = np.ones(n_indicadores) if concentracao is None else PESOS_PADRAO * concentracao
+    return rng.dirichlet(alfa, size=n_cenarios)
+
+def analise_sensibilidade(indicadores, n_cenarios=10_000, seed=0, concentracao=None, tamanho_lote=5_000):
+    """Distribuição das posições de cada entidade sob n_cenarios vetores de pesos aleatórios.
+
+    Os cenários são avaliados em lotes vetorizados; as posições são acumuladas num histograma
+    entidade x classe de posição (histograma_posicoes), então a memória não cresce com n_cenarios
+    e fica limitada a MAX_CLASSES_POSICAO classes por entidade. Mínimo, máximo e média são exatos;
+    os quantis são aproximados por classe acima de MAX_CLASSES_POSICAO entidades (quantil_posicoes).
+    """
+    normalizados = normalizar_max(indicadores)
+    n_entidades, n_indicadores = normalizados.shape
+    rng = np.random.default_rng(seed)
+
+    contagem, largura = histograma_posicoes(n_entidades)
+    minimo = np.full(n_entidades, n_entidades, dtype=np.int64)
+    maximo = np.ones(n_entidades, dtype=np.int64)
+    soma = np.zeros(n_entidades, dtype=np.int64)
+    for inicio in range(0, n_cenarios, tamanho_lote):
+        pesos = sortear_pesos(min(tamanho_lote, n_cenarios - inicio), n_indicadores, rng, concentracao)
+        _, posicoes = calcular_scores(normalizados, pesos, normalizar=False)
+        acumular_posicoes(contagem, posicoes, largura)
+        minimo = np.minimum(minimo, posicoes.min(axis=0))
+        maximo = np.maximum(maximo, posicoes.max(axis=0))
+        soma += posicoes.sum(axis=0)
+
+    return {
+        'Posicao_min': minimo,
+        'Posicao_p05': quantil_posicoes(contagem, n_cenarios, 0.05, largura),
+        'Posicao_mediana': quantil_posicoes(contagem, n_cenarios, 0.5, largura),
+        'Posicao_p95': quantil_posicoes(contagem, n_cenarios, 0.95, largura),
+        'Posicao_max': maximo,
+        'Posicao_media': soma / n_cenarios,
+    }
+
+def sensibilidade_ranking(dados, n_cenarios=10_000, seed=0, concentracao=None):
+    """Tabela de estabilidade do ranking por UF sob pesos aleatórios"""
+    indicadores = carga_dados.para_float64(dados[INDICADORES_SCORE]).to_numpy()
+    estatisticas = analise_sensibilidade(indicadores, n_cenarios, seed, concentracao)
+    _, posicao_atual = calcular_scores(indicadores, arredondar=True)
+
+    tabela = pd.DataFrame({'UF': dados['UF'].to_numpy(), 'Posicao_atual': posicao_atual[0], **estatisticas})
+    tabela['Posicao_media'] = tabela['Posicao_media'].round(1)
+    return tabela.sort_values('Posicao_atual')
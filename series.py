@@ -0,0 +1,158 @@
+import hashlib
+import json
+import os
+import re
+
+import pandas as pd
+
+import carga_dados
+import localidades
+
+try:
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # Sem pyarrow não há armazenamento particionado: cada ano é lido direto do CSV
+    ds = pq = None
+
+# Indicadores com série histórica: fonte (esquema em carga_dados.ESQUEMAS), ano do arquivo atual e colunas
+INDICADORES_SERIE = {
+    'mortalidade': {
+        'fonte': 'mortalidade', 'ano_atual': 2022,
+        'colunas': ['Obitos', 'Taxa_bruta', 'Taxa_mortalidade_ajustada'],
+    },
+    'tempo_laudo': {
+        'fonte': 'tempo_laudo', 'ano_atual': 2023,
+        'colunas': ['Ate_30_dias_%', '31_60_dias_%', 'Mais_60_dias_%'],
+    },
+}
+
+# Anos anteriores ficam em historico/<arquivo de origem>_<ano>.csv, no mesmo esquema do arquivo atual
+# (ex.: historico/mortalidade_tabela2_2015.csv)
+DIRETORIO_HISTORICO = "historico"
+
+def arquivos_serie(base_path=carga_dados.DIRETORIO_DADOS):
+    """Arquivos de origem de cada partição: {indicador: {ano: caminho}}"""
+    historico = os.path.join(base_path, DIRETORIO_HISTORICO)
+    nomes_historico = os.listdir(historico) if os.path.isdir(historico) else []
+
+    arquivos = {}
+    for indicador, definicao in INDICADORES_SERIE.items():
+        arquivo_atual = carga_dados.ARQUIVOS_FONTE[definicao['fonte']]
+        padrao = re.compile(re.escape(arquivo_atual[:-len(".csv")]) + r"_(\d{4})\.csv$")
+        anos = {
+            int(correspondencia.group(1)): os.path.join(historico, nome)
+            for nome in nomes_historico if (correspondencia := padrao.match(nome))
+        }
+        anos[definicao['ano_atual']] = os.path.join(base_path, arquivo_atual)
+        arquivos[indicador] = dict(sorted(anos.items()))
+    return arquivos
+
+def diretorio_series(base_path=carga_dados.DIRETORIO_DADOS):
+    """Raiz do armazenamento particionado (indicador=<nome>/ano=<ano>/parte.parquet)"""
+    return os.path.join(carga_dados.diretorio_cache(base_path), "series")
+
+def caminho_particao(indicador, ano, base_path=carga_dados.DIRETORIO_DADOS):
+    """Arquivo Parquet de uma partição (indicador x ano)"""
+    return os.path.join(diretorio_series(base_path), f"indicador={indicador}", f"ano={ano}", "parte.parquet")
+
+def ler_particao_csv(indicador, caminho):
+    """Lê o CSV de um ano com o esquema da fonte e mantém só Cod_IBGE e as colunas da série"""
+    definicao = INDICADORES_SERIE[indicador]
+    tabela = carga_dados.ler_csv(caminho, definicao['fonte'])
+    codigos, desconhecidas = localidades.codificar_localidades(tabela['UF'])
+    if desconhecidas:
+        raise ValueError(f"Localidades não reconhecidas em {os.path.basename(caminho)}: {', '.join(desconhecidas)}")
+    tabela = tabela[definicao['colunas']].assign(Cod_IBGE=codigos.astype('int32'))
+    return tabela[['Cod_IBGE', *definicao['colunas']]].sort_values('Cod_IBGE', ignore_index=True)
+
+def atualizar_series(base_path=carga_dados.DIRETORIO_DADOS):
+    """Grava as partições cujo CSV de origem mudou (mtime/tamanho) e retorna a versão das séries.
+
+    Só os anos alterados são relidos; partições de arquivos removidos são apagadas.
+    A versão muda sempre que alguma partição muda e serve de chave para os caches.
+    """
+    arquivos = arquivos_serie(base_path)
+    assinatura = {
+        indicador: {str(ano): [os.stat(caminho).st_mtime_ns, os.stat(caminho).st_size] for ano, caminho in anos.items()}
+        for indicador, anos in arquivos.items()
+    }
+    versao = hashlib.sha256(
+        json.dumps([carga_dados.VERSAO_ESQUEMA, assinatura], sort_keys=True).encode("utf-8")
+    ).hexdigest()[:16]
+    if pq is None:
+        return versao
+
+    caminho_manifesto = os.path.join(diretorio_series(base_path), "manifesto.json")
+    manifesto = carga_dados.ler_json(caminho_manifesto)
+    if manifesto.get('versao') == versao:
+        return versao
+
+    anteriores = manifesto.get('assinatura', {})
+    try:
+        for indicador, anos in arquivos.items():
+            for ano, caminho in anos.items():
+                destino = caminho_particao(indicador, ano, base_path)
+                if anteriores.get(indicador, {}).get(str(ano)) == assinatura[indicador][str(ano)] and os.path.exists(destino):
+                    continue
+                os.makedirs(os.path.dirname(destino), exist_ok=True)
+                tabela = ler_particao_csv(indicador, caminho)
+                carga_dados._gravar_atomico(destino, lambda tmp: tabela.to_parquet(tmp, index=False))
+
+            for ano in set(anteriores.get(indicador, {})) - set(assinatura[indicador]):
+                removida = caminho_particao(indicador, ano, base_path)
+                if os.path.exists(removida):
+                    os.remove(removida)
+                    os.rmdir(os.path.dirname(removida))
+
+        def escrever(temporario):
+            with open(temporario, "w", encoding="utf-8") as f:
+                json.dump({'versao': versao, 'assinatura': assinatura}, f)
+
+        carga_dados._gravar_atomico(caminho_manifesto, escrever)
+    except OSError:
+        pass  # Diretório somente leitura: as leituras caem no CSV de cada ano
+
+    return versao
+
+def anos_disponiveis(indicador, base_path=carga_dados.DIRETORIO_DADOS):
+    """Anos com dados do indicador (sem ler nenhuma partição)"""
+    return list(arquivos_serie(base_path)[indicador])
+
+def carregar_serie(indicador, anos=None, codigos=None, colunas=None, base_path=carga_dados.DIRETORIO_DADOS):
+    """Lê só as partições dos anos pedidos, com filtro de localidades e colunas aplicado na leitura.
+
+    Retorna um DataFrame longo com Ano, Cod_IBGE e as colunas pedidas. Com pyarrow, o
+    filtro de ano poda partições inteiras e o de Cod_IBGE usa as estatísticas dos row groups.
+    """
+    definicao = INDICADORES_SERIE[indicador]
+    colunas = definicao['colunas'] if colunas is None else colunas
+    arquivos = arquivos_serie(base_path)[indicador]
+    anos = [ano for ano in arquivos if anos is None or ano in anos]
+
+    particoes = [caminho_particao(indicador, ano, base_path) for ano in anos]
+    if ds is not None and anos and all(os.path.exists(caminho) for caminho in particoes):
+        dataset = ds.dataset(
+            os.path.join(diretorio_series(base_path), f"indicador={indicador}"), format="parquet", partitioning="hive"
+        )
+        filtro = ds.field('ano').isin(anos)
+        if codigos is not None:
+            filtro &= ds.field('Cod_IBGE').isin(list(codigos))
+        tabela = dataset.to_table(columns=['ano', 'Cod_IBGE', *colunas], filter=filtro).to_pandas()
+        tabela = tabela.rename(columns={'ano': 'Ano'})
+    else:
+        blocos = []
+        for ano in anos:
+            bloco = ler_particao_csv(indicador, arquivos[ano])
+            if codigos is not None:
+                bloco = bloco[bloco['Cod_IBGE'].isin(codigos)]
+            blocos.append(bloco[['Cod_IBGE', *colunas]].assign(Ano=ano))
+        tabela = pd.concat(blocos, ignore_index=True) if blocos else pd.DataFrame(columns=['Ano', 'Cod_IBGE', *colunas])
+
+    return tabela[['Ano', 'Cod_IBGE', *colunas]].sort_values(['Ano', 'Cod_IBGE'], ignore_index=True)
+
+def tendencia(indicador, coluna, codigo, anos=None, base_path=carga_dados.DIRETORIO_DADOS):
+    """Evolução anual de uma coluna para uma localidade e a média nacional no mesmo período"""
+    serie = carga_dados.para_float64(carregar_serie(indicador, anos, colunas=[coluna], base_path=base_path))
+    media = serie.groupby('Ano')[coluna].mean()
+    estado = serie[serie['Cod_IBGE'] == codigo].set_index('Ano')[coluna]
+    return pd.DataFrame({'Estado': estado, 'Media_BR': media}).rename_axis('Ano').reset_index()
@@ -0,0 +1,109 @@
+import argparse
+import os
+import random
+import resource
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+from streamlit.testing.v1 import AppTest
+
+import carga_dados
+
+CAMINHO_APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+ABAS = ["🚑 Ranking Crítico", "🪦 Mortalidade", "🩺 Rastreamento", "⏱️ Tempo Laudo", "📊 Visão Consolidada", "🗺️ Mapa"]
+
+def rss_mb():
+    """Memória residente atual do processo em MB (Linux), ou o pico como alternativa"""
+    try:
+        with open("/proc/self/status", encoding="utf-8") as f:
+            for linha in f:
+                if linha.startswith("VmRSS:"):
+                    return int(linha.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def simular_sessao(id_sessao, interacoes, estados, timeout):
+    """Simula uma sessão: carga inicial seguida de trocas aleatórias de estado e aba"""
+    rng = random.Random(id_sessao)
+    latencias = []
+
+    inicio = time.perf_counter()
+    at = AppTest.from_file(CAMINHO_APP, default_timeout=timeout).run()
+    latencias.append(time.perf_counter() - inicio)
+
+    for _ in range(interacoes):
+        at.session_state["aba_ativa"] = rng.choice(ABAS)
+        inicio = time.perf_counter()
+        at.sidebar.selectbox[0].select(rng.choice(estados)).run()
+        latencias.append(time.perf_counter() - inicio)
+        if at.exception:
+            raise RuntimeError(at.exception[0].value)
+
+    return latencias, at
+
+def simular_grupo(ids_sessoes, interacoes, estados, timeout):
+    """Simula um grupo de sessões em sequência no mesmo processo.
+
+    As sessões ficam vivas até o fim do grupo para que a memória reflita todas elas.
+    Retorna (latências, RSS inicial, RSS final).
+    """
+    rss_inicial = rss_mb()
+    sessoes = [simular_sessao(i, interacoes, estados, timeout) for i in ids_sessoes]
+    latencias = [latencia for latencias_sessao, _ in sessoes for latencia in latencias_sessao]
+    return latencias, rss_inicial, rss_mb()
+
+def executar_teste_carga(n_sessoes=20, interacoes=5, paralelismo=1, timeout=60):
+    """Executa n_sessoes simuladas e retorna latências (s) e memória residente (MB).
+
+    O AppTest não pode ser usado de várias threads; com paralelismo > 1 as sessões são
+    divididas entre processos (cada um com seu próprio runtime e caches) e a memória é
+    somada entre eles.
+    """
+    estados = carga_dados.carregar_dados()['UF'].tolist()
+    grupos = [list(range(n_sessoes))[i::paralelismo] for i in range(min(paralelismo, n_sessoes))]
+
+    if len(grupos) == 1:
+        resultados = [simular_grupo(grupos[0], interacoes, estados, timeout)]
+    else:
+        with ProcessPoolExecutor(max_workers=len(grupos)) as executor:
+            resultados = list(executor.map(simular_grupo, grupos, repeat(interacoes), repeat(estados), repeat(timeout)))
+
+    latencias = sorted(latencia for latencias_grupo, _, _ in resultados for latencia in latencias_grupo)
+    rss_inicial = sum(inicial for _, inicial, _ in resultados)
+    rss_final = sum(final for _, _, final in resultados)
+
+    return {
+        'sessoes': n_sessoes,
+        'requisicoes': len(latencias),
+        'latencia_p50_ms': statistics.median(latencias) * 1000,
+        'latencia_p95_ms': latencias[int(0.95 * (len(latencias) - 1))] * 1000,
+        'latencia_max_ms': latencias[-1] * 1000,
+        'rss_inicial_mb': rss_inicial,
+        'rss_final_mb': rss_final,
+        'rss_por_sessao_mb': (rss_final - rss_inicial) / n_sessoes,
+    }
+
+# Executar teste de carga
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Teste de carga local do dashboard (sessões simuladas)")
+    parser.add_argument("--sessoes", type=int, default=20)
+    parser.add_argument("--interacoes", type=int, default=5)
+    parser.add_argument("--paralelismo", type=int, default=1,
+                        help="Processos simulando sessões ao mesmo tempo (1 = em sequência)")
+    args = parser.parse_args()
+
+    print(f"Simulando {args.sessoes} sessões ({args.interacoes} interações cada)...")
+    resultado = executar_teste_carga(args.sessoes, args.interacoes, args.paralelismo)
+
+    print("=" * 60)
+    print("📊 RESULTADO DO TESTE DE CARGA")
+    print("=" * 60)
+    print(f"   Requisições: {resultado['requisicoes']}")
+    print(f"   Latência p50: {resultado['latencia_p50_ms']:.0f} ms")
+    print(f"   Latência p95: {resultado['latencia_p95_ms']:.0f} ms")
+    print(f"   Latência máx: {resultado['latencia_max_ms']:.0f} ms")
+    print(f"   RSS: {resultado['rss_inicial_mb']:.0f} MB -> {resultado['rss_final_mb']:.0f} MB "
+          f"({resultado['rss_por_sessao_mb']:.2f} MB/sessão)")
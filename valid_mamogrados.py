@@ -1,19 +1,22 @@
-import pandas as pd
+import numpy as np
 import os
 
-def validar_dados_mamografos_local():
+import carga_dados
+import localidades
+import validacao
+
+def ler_mamografos_uf(base_path=carga_dados.DIRETORIO_DADOS):
+    """Tabela 10 lida com o esquema declarado, com a utilização na coluna Utilizacao_%"""
+    caminho = os.path.join(base_path, carga_dados.ARQUIVOS_FONTE['mamografos_uf'])
+    return carga_dados.ler_csv(caminho, 'mamografos_uf').rename(columns={'Utilização(%)': 'Utilizacao_%'})
+
+def validar_dados_mamografos_local(base_path=carga_dados.DIRETORIO_DADOS):
     """Validação local dos dados de mamógrafos"""
     
-    # Caminho do diretório
-    base_path = "/home/iauser/1.Tiago_Alves/portfolio/cancer_mama/bd"
-    
     try:
-        # Carregar dados
-        mamografos_uf = pd.read_csv(os.path.join(base_path, "mamografos_regiao_tabela10_total.csv"))
-        mamografos_sus = pd.read_csv(os.path.join(base_path, "mamografos_regiao_tabela11_SUS.csv"))
-        
-        # Converter porcentagens para numérico
-        mamografos_uf['Utilizacao_%'] = mamografos_uf['Utilização(%)'].str.replace('%', '').astype(float)
+        # Carregar dados (tipos, inclusive a utilização em %, vêm do esquema declarado)
+        mamografos_uf = ler_mamografos_uf(base_path)
+        mamografos_sus = carga_dados.ler_csv(os.path.join(base_path, carga_dados.ARQUIVOS_FONTE['mamografos_sus']), 'mamografos_sus')
         
         # Juntar dados
         dados_completos = mamografos_uf.merge(mamografos_sus, on='UF', how='left')
@@ -30,15 +33,26 @@ def validar_dados_mamografos_local():
         colunas = ['UF', 'Mamografos_existentes', 'Mamografos_em_uso', 'Utilizacao_%', 'Mamografos_SUS', '%_SUS']
         dados_validacao = dados_completos[colunas].copy()
         
+        # Status de cada UF avaliado de uma vez sobre as colunas inteiras
+        status = np.select(
+            [
+                dados_validacao['Mamografos_em_uso'] > dados_validacao['Mamografos_existentes'],
+                dados_validacao['Utilizacao_%'] > 100,
+            ],
+            ["❌ INCONSISTENTE", "⚠️  SUPERIOR A 100%"],
+            default="✅ OK"
+        )
+        
         # Formatar para display
-        for index, row in dados_validacao.iterrows():
-            status = "✅ OK"
-            if row['Mamografos_em_uso'] > row['Mamografos_existentes']:
-                status = "❌ INCONSISTENTE"
-            elif row['Utilizacao_%'] > 100:
-                status = "⚠️  SUPERIOR A 100%"
-            
-            print(f"{row['UF']:.<25} {row['Mamografos_existentes']:>3} existentes | {row['Mamografos_em_uso']:>3} em uso | {row['Utilizacao_%']:>6.2f}% | {row['Mamografos_SUS']:>3} SUS ({row['%_SUS']:>4.1f}%) {status}")
+        linhas = (
+            dados_validacao['UF'].str.ljust(25, '.') + ' '
+            + dados_validacao['Mamografos_existentes'].astype(str).str.rjust(3) + ' existentes | '
+            + dados_validacao['Mamografos_em_uso'].astype(str).str.rjust(3) + ' em uso | '
+            + dados_validacao['Utilizacao_%'].map('{:>6.2f}%'.format) + ' | '
+            + dados_validacao['Mamografos_SUS'].astype(str).str.rjust(3) + ' SUS ('
+            + dados_validacao['%_SUS'].map('{:>4.1f}%'.format) + ') ' + status
+        )
+        print("\n".join(linhas))
         
         print("\n" + "=" * 100)
         
@@ -54,12 +68,13 @@ def validar_dados_mamografos_local():
         print(f"   Utilização média: {(total_em_uso/total_existentes*100):.1f}%")
         print(f"   Percentual SUS: {(total_sus/total_existentes*100):.1f}%")
         
-        # Problemas identificados
-        problemas = dados_validacao[dados_validacao['Mamografos_em_uso'] > dados_validacao['Mamografos_existentes']]
-        if not problemas.empty:
+        # Problemas identificados (regras declaradas em validacao.py)
+        relatorio = validacao.validar_fonte('mamografos_uf', os.path.join(base_path, carga_dados.ARQUIVOS_FONTE['mamografos_uf']))
+        problemas = [regra for regra in relatorio['regras'] if regra['violacoes']]
+        if problemas:
             print(f"\n🚨 PROBLEMAS IDENTIFICADOS:")
-            for _, problema in problemas.iterrows():
-                print(f"   - {problema['UF']}: {problema['Mamografos_em_uso']} em uso > {problema['Mamografos_existentes']} existentes")
+            for regra in problemas:
+                print(f"   - {regra['descricao']}: {', '.join(regra['exemplos'])}")
         
         return dados_validacao
         
@@ -67,14 +82,11 @@ def validar_dados_mamografos_local():
         print(f"❌ Erro ao carregar dados: {e}")
         return None
 
-def validar_estados_especificos():
+def validar_estados_especificos(base_path=carga_dados.DIRETORIO_DADOS):
     """Validação de estados específicos com problemas conhecidos"""
     
-    base_path = "/home/iauser/1.Tiago_Alves/portfolio/cancer_mama/bd"
-    
     try:
-        mamografos_uf = pd.read_csv(os.path.join(base_path, "mamografos_regiao_tabela10_total.csv"))
-        mamografos_uf['Utilizacao_%'] = mamografos_uf['Utilização(%)'].str.replace('%', '').astype(float)
+        mamografos_uf = ler_mamografos_uf(base_path)
         
         print("\n" + "=" * 80)
         print("🎯 VALIDAÇÃO DE ESTADOS ESPECÍFICOS")
@@ -82,8 +94,10 @@ def validar_estados_especificos():
         
         estados_validar = ['GO', 'PR', 'SP', 'RJ', 'MG']
         
+        # O CSV traz nomes completos: a busca por sigla passa pelo código IBGE
+        codigos, _ = localidades.codificar_localidades(mamografos_uf['UF'])
         for uf in estados_validar:
-            estado_data = mamografos_uf[mamografos_uf['UF'] == uf].iloc[0]
+            estado_data = mamografos_uf[codigos == localidades.codigo_localidade(uf)].iloc[0]
             print(f"{uf}: {estado_data['Utilizacao_%']:.2f}% (CSV)")
         
         print("=" * 80)
@@ -1,20 +1,13 @@
-import pandas as pd
-import os
 
-def validar_score_critico():
+import carga_dados
+from score import NIVEIS_CRITICIDADE, PESOS_PADRAO, aplicar_score
+
+def validar_score_critico(base_path=carga_dados.DIRETORIO_DADOS):
     """Validação completa do cálculo do Score Crítico"""
     
-    base_path = "/home/iauser/1.Tiago_Alves/portfolio/cancer_mama/bd"
-    
     try:
-        # Carregar as 3 tabelas principais do score
-        mortalidade = pd.read_csv(os.path.join(base_path, "mortalidade_tabela2.csv"))
-        nunca_mamografia = pd.read_csv(os.path.join(base_path, "nunca_mamografia_fig15.csv"))
-        tempo_laudo = pd.read_csv(os.path.join(base_path, "tempo_laudo_rastreamento_tabela9.csv"))
-        
-        # Consolidar dados (igual ao app.py)
-        dados = mortalidade.merge(nunca_mamografia, on=['UF', 'Regiao'], how='left')
-        dados = dados.merge(tempo_laudo, on=['UF', 'Regiao'], how='left')
+        # Consolidar dados (igual ao app.py, com junção pelo código IBGE)
+        dados = carga_dados.consolidar_dados(carga_dados.ler_fontes(base_path))
         
         print("=" * 120)
         print("📊 VALIDAÇÃO DO CÁLCULO DO SCORE CRÍTICO")
@@ -24,32 +17,25 @@ def validar_score_critico():
         print("\n1. 📈 DADOS BRUTOS POR ESTADO:")
         print("-" * 120)
         
-        colunas_brutas = ['UF', 'Taxa_mortalidade_ajustada', 'Percentual_nunca_fez_exame', 'Mais_60_dias_%', 'Obitos']
+        colunas_brutas = ['Sigla', 'Taxa_mortalidade_ajustada', 'Percentual_nunca_fez_exame', 'Mais_60_dias_%', 'Obitos']
         dados_brutos = dados[colunas_brutas].copy()
         
-        for index, row in dados_brutos.iterrows():
-            print(f"{row['UF']:.<5} Mortalidade: {row['Taxa_mortalidade_ajustada']:>5.1f} | "
-                  f"Não Rastreadas: {row['Percentual_nunca_fez_exame']:>5.1f}% | "
-                  f"Laudos >60d: {row['Mais_60_dias_%']:>5.1f}% | "
-                  f"Óbitos: {row['Obitos']:>4.0f}")
+        # Linhas formatadas coluna a coluna (sem iterar linha por linha)
+        linhas = (
+            dados_brutos['Sigla'].str.ljust(5, '.')
+            + ' Mortalidade: ' + dados_brutos['Taxa_mortalidade_ajustada'].map('{:>5.1f}'.format)
+            + ' | Não Rastreadas: ' + dados_brutos['Percentual_nunca_fez_exame'].map('{:>5.1f}%'.format)
+            + ' | Laudos >60d: ' + dados_brutos['Mais_60_dias_%'].map('{:>5.1f}%'.format)
+            + ' | Óbitos: ' + dados_brutos['Obitos'].map('{:>4.0f}'.format)
+        )
+        print("\n".join(linhas))
         
         # 2. CÁLCULO DO SCORE (igual ao app.py)
         print("\n2. 🧮 CÁLCULO DO SCORE CRÍTICO:")
         print("-" * 120)
         
-        dados_score = dados.copy()
-        
-        # Normalização para escala 0-100
-        dados_score['Score_Mortalidade'] = (dados_score['Taxa_mortalidade_ajustada'] / dados_score['Taxa_mortalidade_ajustada'].max() * 100).round(1)
-        dados_score['Score_Nao_Rastreadas'] = (dados_score['Percentual_nunca_fez_exame'] / dados_score['Percentual_nunca_fez_exame'].max() * 100).round(1)
-        dados_score['Score_Laudos_Lentos'] = (dados_score['Mais_60_dias_%'] / dados_score['Mais_60_dias_%'].max() * 100).round(1)
-        
-        # Score consolidado com pesos
-        dados_score['Score_Consolidado'] = (
-            dados_score['Score_Mortalidade'] * 0.35 +      # Peso 35%
-            dados_score['Score_Nao_Rastreadas'] * 0.35 +   # Peso 35%
-            dados_score['Score_Laudos_Lentos'] * 0.30      # Peso 30%
-        ).round(1)
+        # Mesmo motor de score usado pelo app.py
+        dados_score = aplicar_score(dados)
         
         # Ordenar por score
         dados_score = dados_score.sort_values('Score_Consolidado', ascending=False)
@@ -61,12 +47,20 @@ def validar_score_critico():
         print("      |             |   (35%)     |     (35%)      |    (30%)      |  M + R + L")
         print("-" * 120)
         
-        for index, row in dados_score.head(10).iterrows():
-            contrib_mortalidade = row['Score_Mortalidade'] * 0.35
-            contrib_rastreamento = row['Score_Nao_Rastreadas'] * 0.35
-            contrib_laudos = row['Score_Laudos_Lentos'] * 0.30
-            
-            print(f"{row['UF']:<5} | {row['Score_Consolidado']:>11.1f} | {row['Score_Mortalidade']:>11.1f} | {row['Score_Nao_Rastreadas']:>14.1f} | {row['Score_Laudos_Lentos']:>13.1f} | {contrib_mortalidade:4.1f} + {contrib_rastreamento:4.1f} + {contrib_laudos:4.1f}")
+        top10 = dados_score.head(10)
+        contribuicoes = top10[['Score_Mortalidade', 'Score_Nao_Rastreadas', 'Score_Laudos_Lentos']] * PESOS_PADRAO
+        
+        linhas = (
+            top10['Sigla'].str.ljust(5)
+            + ' | ' + top10['Score_Consolidado'].map('{:>11.1f}'.format)
+            + ' | ' + top10['Score_Mortalidade'].map('{:>11.1f}'.format)
+            + ' | ' + top10['Score_Nao_Rastreadas'].map('{:>14.1f}'.format)
+            + ' | ' + top10['Score_Laudos_Lentos'].map('{:>13.1f}'.format)
+            + ' | ' + contribuicoes['Score_Mortalidade'].map('{:4.1f}'.format)
+            + ' + ' + contribuicoes['Score_Nao_Rastreadas'].map('{:4.1f}'.format)
+            + ' + ' + contribuicoes['Score_Laudos_Lentos'].map('{:4.1f}'.format)
+        )
+        print("\n".join(linhas))
         
         # 4. ESTATÍSTICAS GERAIS
         print("\n4. 📊 ESTATÍSTICAS DOS INDICADORES:")
@@ -91,12 +85,11 @@ def validar_score_critico():
         print("\n5. 🎨 CLASSIFICAÇÃO FINAL POR CRITICIDADE:")
         print("-" * 120)
         
+        # Mesmas faixas [início, fim) do dashboard, sem lacunas entre elas
+        contagem = dados_score['Criticidade'].value_counts()
+        rotulos = ['🔴 CRÍTICO (80-100)', '🟠 ALTO (60-79)', '🟡 MÉDIO (40-59)', '🟢 BAIXO (20-39)', '🟢 MUITO BAIXO (0-19)']
         classificacao = {
-            '🔴 CRÍTICO (80-100)': len(dados_score[dados_score['Score_Consolidado'] >= 80]),
-            '🟠 ALTO (60-79)': len(dados_score[dados_score['Score_Consolidado'].between(60, 79.9)]),
-            '🟡 MÉDIO (40-59)': len(dados_score[dados_score['Score_Consolidado'].between(40, 59.9)]),
-            '🟢 BAIXO (20-39)': len(dados_score[dados_score['Score_Consolidado'].between(20, 39.9)]),
-            '🟢 MUITO BAIXO (0-19)': len(dados_score[dados_score['Score_Consolidado'] < 20])
+            rotulo: int(contagem.get(nivel, 0)) for rotulo, nivel in zip(rotulos, reversed(NIVEIS_CRITICIDADE))
         }
         
         for categoria, quantidade in classificacao.items():
@@ -114,7 +107,7 @@ def validar_estado_especifico(dados_score, uf):
     """Validação detalhada de um estado específico"""
     
     if dados_score is not None:
-        estado = dados_score[dados_score['UF'] == uf].iloc[0]
+        estado = dados_score[(dados_score['UF'] == uf) | (dados_score['Sigla'] == uf)].iloc[0]
         
         print(f"\n🎯 VALIDAÇÃO DETALHADA - {uf}:")
         print("-" * 80)
@@ -130,9 +123,9 @@ def validar_estado_especifico(dados_score, uf):
         print(f"  • Laudos Lentos: {estado['Score_Laudos_Lentos']:.1f} (de 100)")
         
         print(f"\nContribuições:")
-        contrib_mortalidade = estado['Score_Mortalidade'] * 0.35
-        contrib_rastreamento = estado['Score_Nao_Rastreadas'] * 0.35
-        contrib_laudos = estado['Score_Laudos_Lentos'] * 0.30
+        contrib_mortalidade = estado['Score_Mortalidade'] * PESOS_PADRAO[0]
+        contrib_rastreamento = estado['Score_Nao_Rastreadas'] * PESOS_PADRAO[1]
+        contrib_laudos = estado['Score_Laudos_Lentos'] * PESOS_PADRAO[2]
         
         print(f"  • Mortalidade (35%): {contrib_mortalidade:.1f}")
         print(f"  • Não Rastreadas (35%): {contrib_rastreamento:.1f}")
@@ -0,0 +1,134 @@
+import argparse
+import json
+import os
+import sys
+
+import carga_dados
+import localidades
+
+# Regras declarativas: cada expressão (sintaxe de DataFrame.eval) marca as linhas que VIOLAM a regra.
+# Colunas com caracteres especiais vão entre crases.
+REGRAS = [
+    {'id': 'mamografos_em_uso_maior_que_existentes', 'fonte': 'mamografos_uf', 'severidade': 'erro',
+     'descricao': "Mamógrafos em uso acima dos existentes",
+     'expressao': "Mamografos_em_uso > Mamografos_existentes"},
+    {'id': 'utilizacao_acima_100', 'fonte': 'mamografos_uf', 'severidade': 'alerta',
+     'descricao': "Utilização de mamógrafos superior a 100%",
+     'expressao': "`Utilização(%)` > 100"},
+    {'id': 'mamografos_negativos', 'fonte': 'mamografos_uf', 'severidade': 'erro',
+     'descricao': "Quantidade negativa de mamógrafos",
+     'expressao': "Mamografos_existentes < 0 or Mamografos_em_uso < 0"},
+    {'id': 'mamografos_sus_negativos', 'fonte': 'mamografos_sus', 'severidade': 'alerta',
+     'descricao': "Quantidade negativa de mamógrafos do SUS",
+     'expressao': "Mamografos_SUS < 0"},
+    {'id': 'obitos_negativos', 'fonte': 'mortalidade', 'severidade': 'erro',
+     'descricao': "Número de óbitos negativo",
+     'expressao': "Obitos < 0"},
+    {'id': 'taxas_nao_positivas', 'fonte': 'mortalidade', 'severidade': 'erro',
+     'descricao': "Taxa de mortalidade bruta ou ajustada menor ou igual a zero",
+     'expressao': "Taxa_bruta <= 0 or Taxa_mortalidade_ajustada <= 0"},
+    {'id': 'percentual_nunca_fez_fora_0_100', 'fonte': 'nunca_mamografia', 'severidade': 'erro',
+     'descricao': "Percentual de mulheres sem mamografia fora de 0-100",
+     'expressao': "Percentual_nunca_fez_exame < 0 or Percentual_nunca_fez_exame > 100"},
+    {'id': 'faixas_laudo_nao_somam_100', 'fonte': 'tempo_laudo', 'severidade': 'alerta',
+     'descricao': "Faixas de tempo de laudo não somam 100% (tolerância de 1 p.p.)",
+     'expressao': "abs(`Ate_30_dias_%` + `31_60_dias_%` + `Mais_60_dias_%` - 100) > 1"},
+    {'id': 'casos_negativos', 'fonte': 'casos', 'severidade': 'erro',
+     'descricao': "Número de casos negativo",
+     'expressao': "Numero_casos < 0"},
+]
+
+# Colunas que não podem ter valores ausentes, por fonte
+COLUNAS_OBRIGATORIAS = {
+    'mortalidade': ['UF', 'Obitos', 'Taxa_bruta', 'Taxa_mortalidade_ajustada'],
+    'nunca_mamografia': ['UF', 'Percentual_nunca_fez_exame'],
+    'mamografos_uf': ['UF', 'Mamografos_existentes', 'Mamografos_em_uso', 'Utilização(%)'],
+    'mamografos_sus': ['UF', 'Mamografos_SUS'],
+    'tempo_laudo': ['UF', 'Ate_30_dias_%', '31_60_dias_%', 'Mais_60_dias_%'],
+    'casos': ['UF', 'Numero_casos'],
+}
+
+# Número máximo de exemplos de linhas violadoras guardados por regra
+MAX_EXEMPLOS = 10
+
+def _blocos(fonte, caminho, tamanho_bloco):
+    """Lê um CSV (com o esquema declarado da fonte) inteiro ou em blocos de tamanho_bloco linhas"""
+    if tamanho_bloco is None:
+        yield carga_dados.ler_csv(caminho, fonte, anulavel=True)
+    else:
+        yield from carga_dados.ler_csv(caminho, fonte, tamanho_bloco, anulavel=True)
+
+def validar_fonte(fonte, caminho, regras=REGRAS, tamanho_bloco=None, chave='UF'):
+    """Avalia as regras de uma fonte sobre o arquivo inteiro (ou bloco a bloco) e retorna os resultados"""
+    regras_fonte = [regra for regra in regras if regra['fonte'] == fonte]
+    obrigatorias = COLUNAS_OBRIGATORIAS.get(fonte, [])
+    resultados = {regra['id']: {**regra, 'violacoes': 0, 'exemplos': []} for regra in regras_fonte}
+    ausentes = {coluna: 0 for coluna in obrigatorias}
+    desconhecidas = set()
+    linhas = 0
+
+    for bloco in _blocos(fonte, caminho, tamanho_bloco):
+        for coluna in obrigatorias:
+            ausentes[coluna] += int(bloco[coluna].isna().sum()) if coluna in bloco else len(bloco)
+
+        # Nomes fora da dimensão de localidades quebrariam os merges por código IBGE
+        if chave in bloco:
+            desconhecidas.update(localidades.codificar_localidades(bloco[chave])[1])
+
+        for regra in regras_fonte:
+            # Comparações com valores ausentes não contam como violação (os ausentes são contados à parte)
+            violacoes = bloco.eval(regra['expressao']).fillna(False).astype(bool)
+            resultado = resultados[regra['id']]
+            resultado['violacoes'] += int(violacoes.sum())
+            faltam = MAX_EXEMPLOS - len(resultado['exemplos'])
+            if faltam > 0 and violacoes.any():
+                exemplos = bloco.loc[violacoes, chave] if chave in bloco else bloco.index[violacoes]
+                resultado['exemplos'].extend(str(valor) for valor in exemplos[:faltam])
+
+        linhas += len(bloco)
+
+    return {
+        'fonte': fonte,
+        'arquivo': os.path.basename(caminho),
+        'linhas': linhas,
+        'ausentes': {coluna: n for coluna, n in ausentes.items() if n},
+        'localidades_desconhecidas': sorted(desconhecidas),
+        'regras': list(resultados.values()),
+    }
+
+def validar(base_path=carga_dados.DIRETORIO_DADOS, arquivos=carga_dados.ARQUIVOS_FONTE, regras=REGRAS,
+            tamanho_bloco=None):
+    """Valida todas as fontes e retorna um relatório serializável em JSON"""
+    fontes = [
+        validar_fonte(fonte, os.path.join(base_path, arquivo), regras, tamanho_bloco)
+        for fonte, arquivo in arquivos.items()
+    ]
+    erros = sum(
+        regra['violacoes'] for fonte in fontes for regra in fonte['regras'] if regra['severidade'] == 'erro'
+    ) + sum(n for fonte in fontes for n in fonte['ausentes'].values()) + sum(
+        len(fonte['localidades_desconhecidas']) for fonte in fontes
+    )
+    alertas = sum(
+        regra['violacoes'] for fonte in fontes for regra in fonte['regras'] if regra['severidade'] == 'alerta'
+    )
+    return {'base_path': base_path, 'erros': erros, 'alertas': alertas, 'fontes': fontes}
+
+# Executar validação antes de publicar
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Validação vetorizada dos CSVs de origem")
+    parser.add_argument("--dados", default=carga_dados.DIRETORIO_DADOS, help="Diretório dos CSVs")
+    parser.add_argument("--bloco", type=int, default=None, help="Linhas por bloco (arquivos grandes)")
+    parser.add_argument("--saida", default=None, help="Arquivo JSON do relatório (padrão: stdout)")
+    args = parser.parse_args()
+
+    relatorio = validar(args.dados, tamanho_bloco=args.bloco)
+    conteudo = json.dumps(relatorio, ensure_ascii=False, indent=2)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            f.write(conteudo)
+        print(f"Relatório salvo em {args.saida}: {relatorio['erros']} erros, {relatorio['alertas']} alertas")
+    else:
+        print(conteudo)
+
+    # Código de saída diferente de zero bloqueia a publicação quando há erros
+    sys.exit(1 if relatorio['erros'] else 0)